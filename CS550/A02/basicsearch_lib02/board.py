@@ -6,6 +6,8 @@ class Board(object):
     Represent a two dimensional grid of items
     """
 
+    __slots__ = ("rows", "cols", "displaycol", "empty_symbol", "board")
+
     def __init__(self, rows, cols, displaycol=9, empty_symbol='.'):
         """construct a board with specified rows and cols
         displaytab can be set to display the board with a specified
@@ -1,9 +1,11 @@
 """
-Queues: Stack, FIFOQueue, PriorityQueue
+Queues: Stack, FIFOQueue, PriorityQueue, BucketQueue, BeamQueue
 """
 
 import bisect  # efficient sorted lists
 import collections  # data containers
+import heapq  # binary heaps
+import itertools
 
 
 class Queue:
@@ -11,15 +13,22 @@ class Queue:
         Stack(): A Last In First Out Queue.
         FIFOQueue(): A First In First Out Queue.
         PriorityQueue(order, f): Queue in sorted order (default min-first).
+        BucketQueue(f): Min-first queue for priorities with few values.
+        BeamQueue(width, f): Min-first queue keeping the best width items.
     Each type supports the following methods and functions:
         q.append(item)  -- add an item to the queue
         q.extend(items) -- equivalent to: for item in items: q.append(item)
         q.pop()         -- return the top item from the queue
         len(q)          -- number of items in q (also q.__len())
         item in q       -- does q contain item?
+    Queues ordered by f have a true ordered attribute.  On them, appending
+    an item equal to a queued one keeps the one with the better priority
+    (decrease-key), and q[item] is the queued item equal to item.
     Note that isinstance(Stack(), Queue) is false, because we implement stacks
     as lists.  If Python ever gets interfaces, Queue will be an interface."""
 
+    ordered = False
+
     def __init__(self):
         raise NotImplementedError
 
@@ -68,34 +77,217 @@ class PriorityQueue(Queue):
     """A queue in which the minimum (or maximum) element (as determined by f and
     order) is returned first. If order is min, the item with minimum f(x) is
     returned first; if order is max, then it is the item with maximum f(x).
-    Also supports dict-like lookup."""
+    Also supports dict-like lookup.
+
+    Items are kept in a binary heap alongside a dictionary that maps each
+    queued item to its heap entry, so append and pop are O(log n) and
+    membership, lookup and deletion are O(1).  Items must be hashable.
+
+    Appending an item that is equal to one already queued is a decrease-key:
+    the entry with the better priority is kept and the other one discarded.
+    Deleted and superseded entries are marked and skipped lazily by pop().
+    Items with the same priority are returned in insertion order, for
+    max-first queues too; unlike the sorted list this replaced, items are
+    never compared with each other and need not be orderable."""
+
+    ordered = True
 
     def __init__(self, order=min, f=lambda x: x):
-        self.A = []
+        self.heap = []  # [priority, insertion count, item] entries
+        self.index = dict()  # queued item --> live heap entry
         self.order = order
         self.f = f
+        self.counter = itertools.count()
 
     def append(self, item):
-        bisect.insort(self.A, (self.f(item), item))
+        priority = self.f(item)
+        if self.order != min:
+            priority = _Reversed(priority)
+
+        entry = self.index.get(item)
+        if entry is not None:
+            if not priority < entry[0]:
+                return  # already queued with an equal or better priority
+            entry[-1] = _REMOVED  # decrease-key, supersede the old entry
+
+        entry = [priority, next(self.counter), item]
+        self.index[item] = entry
+        heapq.heappush(self.heap, entry)
+        self.compact()
 
     def __len__(self):
-        return len(self.A)
+        return len(self.index)
 
     def pop(self):
-        if self.order == min:
-            return self.A.pop(0)[1]
+        while self.heap:
+            item = heapq.heappop(self.heap)[-1]
+            if item is not _REMOVED:
+                del self.index[item]
+                return item
+        raise IndexError('pop from empty PriorityQueue')
+
+    def __contains__(self, item):
+        return item in self.index
+
+    def __getitem__(self, key):
+        entry = self.index.get(key)
+        if entry is not None:
+            return entry[-1]
+
+    def __delitem__(self, key):
+        entry = self.index.pop(key, None)
+        if entry is not None:
+            entry[-1] = _REMOVED
+            self.compact()
+
+    def compact(self):
+        """Rebuild the heap once most of its entries are dead"""
+        if len(self.heap) > 2 * len(self.index) + 32:
+            self.heap = [e for e in self.heap if e[-1] is not _REMOVED]
+            heapq.heapify(self.heap)
+
+
+class BucketQueue(Queue):
+    """A min-first queue for priorities f(x) that take few distinct values,
+    such as the integer f values of n-puzzle search nodes.  Items are kept
+    in one FIFO bucket per priority and the priorities of the buckets in a
+    heap, so append and pop are O(1) plus O(log k) when a bucket is made,
+    k being the number of distinct priorities queued.  Priorities need not
+    be integers.  Membership and lookup are O(1), items must be hashable.
+
+    As with PriorityQueue, appending an item equal to a queued one is a
+    decrease-key:  the item with the lower priority is kept."""
+
+    ordered = True
+
+    def __init__(self, f=lambda x: x):
+        self.buckets = dict()  # priority --> [deque of entries, live entries]
+        self.priorities = []  # heap of priorities, some of emptied buckets
+        self.index = dict()  # queued item --> (priority, [item] entry)
+        self.f = f
+
+    def append(self, item):
+        priority = self.f(item)
+        queued = self.index.get(item)
+        if queued is not None:
+            if not priority < queued[0]:
+                return  # already queued with an equal or better priority
+            self.__remove(queued)
+
+        entry = [item]
+        self.index[item] = (priority, entry)
+        bucket = self.buckets.get(priority)
+        if bucket is None:
+            self.buckets[priority] = [collections.deque([entry]), 1]
+            heapq.heappush(self.priorities, priority)
         else:
-            return self.A.pop()[1]
+            bucket[0].append(entry)
+            bucket[1] += 1
+
+    def __remove(self, queued):
+        """Mark a queued (priority, entry) removed, its bucket is dropped
+        once it has no live entries"""
+        (priority, entry) = queued
+        entry[0] = _REMOVED
+        bucket = self.buckets[priority]
+        bucket[1] -= 1
+        if not bucket[1]:
+            del self.buckets[priority]
+
+    def __len__(self):
+        return len(self.index)
+
+    def lowest(self):
+        """Lowest priority of the queued items"""
+        if not self.index:
+            raise IndexError('BucketQueue is empty')
+        while self.priorities[0] not in self.buckets:
+            heapq.heappop(self.priorities)  # bucket was emptied
+        return self.priorities[0]
+
+    def pop(self):
+        priority = self.lowest()
+        (entries, _live) = self.buckets[priority]
+        item = entries.popleft()[0]
+        while item is _REMOVED:
+            item = entries.popleft()[0]
+        self.__remove(self.index.pop(item))
+        return item
 
     def __contains__(self, item):
-        return any(item == pair[1] for pair in self.A)
+        return item in self.index
 
     def __getitem__(self, key):
-        for _, item in self.A:
-            if item == key:
-                return item
+        queued = self.index.get(key)
+        if queued is not None:
+            return queued[1][0]
 
     def __delitem__(self, key):
-        for i, (value, item) in enumerate(self.A):
-            if item == key:
-                self.A.pop(i)
+        queued = self.index.pop(key, None)
+        if queued is not None:
+            self.__remove(queued)
+
+
+class BeamQueue(Queue):
+    """A min-first queue that only keeps the width items with the lowest
+    f(x).  Appending to a full queue drops the worst item, which makes
+    searches using it incomplete but bounds their memory.  Appending an
+    item equal to a queued one is a decrease-key as in PriorityQueue.
+    Items must be hashable."""
+
+    ordered = True
+
+    def __init__(self, width, f=lambda x: x):
+        self.A = []  # (priority, insertion count, item) in sorted order
+        self.index = dict()  # queued item --> its entry in A
+        self.width = width
+        self.f = f
+        self.counter = itertools.count()
+
+    def append(self, item):
+        entry = (self.f(item), next(self.counter), item)
+        queued = self.index.get(item)
+        if queued is not None:
+            if not entry[0] < queued[0]:
+                return  # already queued with an equal or better priority
+            del self.A[bisect.bisect_left(self.A, queued)]
+        bisect.insort(self.A, entry)
+        self.index[item] = entry
+        if len(self.A) > self.width:
+            del self.index[self.A.pop()[-1]]
+
+    def __len__(self):
+        return len(self.A)
+
+    def pop(self):
+        item = self.A.pop(0)[-1]
+        del self.index[item]
+        return item
+
+    def __contains__(self, item):
+        return item in self.index
+
+    def __getitem__(self, key):
+        queued = self.index.get(key)
+        if queued is not None:
+            return queued[-1]
+
+
+# Placeholder for heap entries that were deleted or superseded
+_REMOVED = object()
+
+
+class _Reversed(object):
+    """Priority wrapper that inverts comparisons for max-first queues"""
+
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+    def __eq__(self, other):
+        # Heap entries compare the insertion count of equal priorities
+        return self.value == other.value
@@ -113,9 +113,13 @@ class Node:
     implementation of the cost and heuristic functions to estimate the cost f of
     arriving at the node f and the estimate to the goal node h.
     
-    You will not need to subclass this class.
+    You will not need to subclass this class.  Nodes have no __dict__ to
+    keep them small, the path from the root is only built by path().
     """
 
+    __slots__ = ("problem", "state", "parent", "action", "depth",
+                 "g", "h", "f")
+
     def __init__(self, problem, state, parent=None, action=None):
         """Create a search tree Node, derived from a parent by an action."""
         self.problem = problem  # Save problem representation
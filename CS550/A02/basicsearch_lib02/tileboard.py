@@ -1,11 +1,210 @@
-import copy
 import math
 import random
 
 from .board import Board
 
 
+def inversions(tiles):
+    """inversions(tiles) - Number of pairs of tiles that are out of order
+    Empty cells (None or 0) are ignored.  Counted while merge sorting the
+    tiles, O(n log n).
+    """
+    return _sort_inversions([tile for tile in tiles if tile])[1]
+
+
+def _sort_inversions(tiles):
+    """_sort_inversions(tiles) - (sorted tiles, number of inversions)"""
+    if len(tiles) < 2:
+        return (tiles, 0)
+    middle = len(tiles) // 2
+    (left, count) = _sort_inversions(tiles[:middle])
+    (right, right_count) = _sort_inversions(tiles[middle:])
+    count += right_count
+
+    merged = []
+    i = j = 0
+    while i < len(left) and j < len(right):
+        if right[j] < left[i]:
+            # right[j] is smaller than every tile left in left
+            merged.append(right[j])
+            count += len(left) - i
+            j += 1
+        else:
+            merged.append(left[i])
+            i += 1
+    merged.extend(left[i:])
+    merged.extend(right[j:])
+    return (merged, count)
+
+
+def random_tiles(n, rng=random):
+    """random_tiles(n, rng) - Tiles of a random solvable n puzzle in
+    row-major order, None for the empty cell.  rng is the random number
+    generator, e.g. a seeded random.Random instance.
+    """
+    boardsize = math.isqrt(n + 1)
+    tiles = [val + 1 for val in range(n)]
+    tiles.append(None)
+    rng.shuffle(tiles)  # mix up tiles
+
+    # Compute inversion order
+    # defined as:
+    # for each number in the list of tiles,
+    #    How many following numbers are less than that one
+    #    e.g. [13, 10, 11, 6, 5, 7, 4, 8, 1, 12, 14, 9, 3, 15, 2, None]
+    #    Tiles following 9:  [3, 15, 2, None]
+    #    Two of these are smaller than 9, so the inversion order
+    #        for 9 is 2
+    # A puzzle's inversion order is the sum of the tiles inversion
+    # orders.  For puzzles with even numbers of rows and columns,
+    # the row number on which the blank resides must be added.
+    #
+    # See Wolfram Mathworld for further explanation:
+    #     http://mathworld.wolfram.com/15Puzzle.html
+    # and http://www.cut-the-knot.org/pythagoras/fifteen.shtml
+    #
+    # This lets us know if a problem can be solved.  The inversion
+    # order modulo 2 is invariant across moves.  The solution state
+    # has an even inversion order, so any puzzle with an odd inversion
+    # number cannot be solved.
+    inversionorder = inversions(tiles)
+    # Account for blank.
+    if boardsize % 2 == 0:
+        inversionorder += tiles.index(None) // boardsize + 1
+
+    if inversionorder % 2:
+        # Exchanging two tiles changes the inversion order by an odd
+        # number, which makes the puzzle solvable.  This pairs up the
+        # solvable and unsolvable shuffles, so every solvable puzzle
+        # remains equally likely.
+        (i, j) = [idx for idx in range(3) if tiles[idx]][:2]
+        (tiles[i], tiles[j]) = (tiles[j], tiles[i])
+    return tiles
+
+
+def random_boards(n, count=None, seed=None, multiple_solutions=False):
+    """random_boards(n, count, seed, multiple_solutions) - Generate count
+    random solvable TileBoards for the n puzzle, or an endless stream if
+    count is None.  Streams with the same seed generate the same boards.
+    """
+    rng = random.Random(seed)
+    generated = 0
+    while count is None or generated < count:
+        yield TileBoard(n, multiple_solutions,
+                        force_state=random_tiles(n, rng))
+        generated += 1
+
+
+def random_walks(n, depth, count=None, seed=None, multiple_solutions=False):
+    """random_walks(n, depth, count, seed, multiple_solutions) - Generate
+    count TileBoards for the n puzzle, or an endless stream if count is
+    None, by making depth random moves from the goal.  The empty cell never
+    moves straight back, so boards are usually close to depth moves from
+    the goal and never further.  Streams with the same seed generate the
+    same boards.
+    """
+    rng = random.Random(seed)
+    layout = TileLayout.get(math.isqrt(n + 1))
+    (shifts, mask) = (layout.shifts, layout.mask)
+    generated = 0
+    while count is None or generated < count:
+        (packed, blank, previous) = (layout.goal, layout.goal_blank, None)
+        for _ in range(depth):
+            target = rng.choice([target for (_, target) in layout.actions[blank]
+                                 if target != previous])
+            tile = (packed >> shifts[target]) & mask
+            packed ^= (tile << shifts[target]) ^ (tile << shifts[blank])
+            (blank, previous) = (target, blank)
+        yield TileBoard.from_packed(n, packed, multiple_solutions)
+        generated += 1
+
+
+class TileLayout(object):
+    """TileLayout - Tables shared by every TileBoard of one size
+
+    A board of boardsize x boardsize cells is packed into a single integer
+    with bits per cell, cell i (row-major order) stored at bit offset
+    i * bits and the empty cell stored as 0.  The layout holds what is
+    needed to work on packed boards:  the shift of each cell, the moves
+    available from each position of the empty cell, and the packed goal
+    states.
+
+    Layouts are immutable and cached, use TileLayout.get(boardsize).
+    """
+
+    cache = dict()
+
+    @classmethod
+    def get(cls, boardsize):
+        """get(boardsize) - Return the shared layout for a board size"""
+        try:
+            return cls.cache[boardsize]
+        except KeyError:
+            layout = cls.cache[boardsize] = cls(boardsize)
+            return layout
+
+    def __init__(self, boardsize):
+        self.boardsize = boardsize
+        self.cells = boardsize * boardsize
+        self.bits = (self.cells - 1).bit_length()
+        self.mask = (1 << self.bits) - 1
+        self.shifts = [cell * self.bits for cell in range(self.cells)]
+
+        # Moves of the empty cell from each position as
+        # ([delta_row, delta_col], cell the empty cell moves to)
+        self.actions = []
+        for cell in range(self.cells):
+            (r, c) = divmod(cell, boardsize)
+            moves = []
+            for offset in ([-1, 0], [1, 0], [0, -1], [0, 1]):
+                (rprime, cprime) = (r + offset[0], c + offset[1])
+                if 0 <= rprime < boardsize and 0 <= cprime < boardsize:
+                    moves.append((offset, rprime * boardsize + cprime))
+            self.actions.append(moves)
+
+        # The empty cell of the goal is in the center of odd boards.
+        # Even boards have no center, the empty cell ends up last as in
+        # the classic 15 puzzle which is the goal the solvability check
+        # in TileBoard.__init__ is based on.
+        if boardsize % 2:
+            self.goal_blank = (self.cells - 1) // 2
+        else:
+            self.goal_blank = self.cells - 1
+        self.goal = self.pack(self.goal_tiles(self.goal_blank))
+        # With multiple solutions, the empty cell may be anywhere
+        self.goals = frozenset(self.pack(self.goal_tiles(blank))
+                               for blank in range(self.cells))
+
+    def goal_tiles(self, blank):
+        """goal_tiles(blank) - Tiles in order with the empty cell at blank"""
+        tiles = list(range(1, self.cells))
+        tiles.insert(blank, 0)
+        return tiles
+
+    def pack(self, tiles):
+        """pack(tiles) - Pack a row-major list of tiles (0 or None empty)"""
+        packed = 0
+        for (shift, tile) in zip(self.shifts, tiles):
+            if tile:
+                packed |= tile << shift
+        return packed
+
+    def unpack(self, packed):
+        """unpack(packed) - List of tiles in row-major order, 0 is empty"""
+        mask = self.mask
+        return [(packed >> shift) & mask for shift in self.shifts]
+
+    def __reduce__(self):
+        # Unpickled and copied boards share the cached layout
+        return (TileLayout.get, (self.boardsize,))
+
+
 class TileBoard(Board):
+    # Boards are the states of searches and are created for every node,
+    # slots keep them small
+    __slots__ = ("boardsize", "layout", "hvalues", "parent_hvalues", "moved",
+                 "multiple_solutions", "packed", "blank")
+
     def __init__(self, n, multiple_solutions=False, force_state=None):
         """"tileboard(n, multiple_solutions
         Create a tile board for an n puzzle.
@@ -15,12 +214,23 @@ class TileBoard(Board):
         force_state can be used to initialize an n puzzle to a desired
         configuration.  No error checking is done.  It is specified as
         a list with n+1 elements in it, 1:n and None in the desired order.
+        Otherwise a random solvable configuration is used, see random_tiles.
         """
         self.boardsize = int(math.sqrt(n + 1))
         if math.sqrt(n + 1) != self.boardsize:
             raise ValueError("Bad board size\n" +
                              "Must be one less than an odd perfect square 8, 24, ...")
 
+        self.layout = TileLayout.get(self.boardsize)
+
+        # Heuristic values of this board and of the board it was derived
+        # from, along with the (tile, from_cell, to_cell) move that derived
+        # it.  Heuristic tables use these to evaluate children
+        # incrementally, see heuristics.HeuristicTable.
+        self.hvalues = None
+        self.parent_hvalues = None
+        self.moved = None
+
         # Does the space have to be in the center (False)
         # or are multiple solutions allowed.
         self.multiple_solutions = multiple_solutions
@@ -28,121 +238,75 @@ class TileBoard(Board):
         if force_state:
             tiles = force_state
         else:
-            # Build initial state - all in order
-            tiles = [val + 1 for val in range(n)]
-            tiles.append(None)
-            # Verify problem is solvable
-            solvable = False
-            while not solvable:
-                random.shuffle(tiles)  # mix up tiles
-                # Compute inversion order
-                # defined as:
-                # for each number in the list of tiles,
-                #    How many following numbers are less than that one
-                #    e.g. [13, 10, 11, 6, 5, 7, 4, 8, 1, 12, 14, 9, 3, 15, 2, None]
-                #    Tiles following 9:  [3, 15, 2, None]
-                #    Two of these are smaller than 9, so the inversion order
-                #        for 9 is 2
-                # A puzzle's inversion order is the sum of the tiles inversion
-                # orders.  For puzzles with even numbers of rows and columns,
-                # the row number on which the blank resides must be added.  
-                # Note that we need not worry about 1 as there are
-                # no tiles smaller than one.  
-                # 
-                # See Wolfram Mathworld for further explanation:
-                #     http://mathworld.wolfram.com/15Puzzle.html
-                # and http://www.cut-the-knot.org/pythagoras/fifteen.shtml
-                #
-                # This lets us know if a problem can be solved.  The inversion
-                # order modulo 2 is invariant across moves.  The solution state
-                # has an even inversion order, so any puzzle with an odd inversion
-                # number cannot be solved.
-                inversionorder = 0
-                for value in range(2, len(tiles)):
-                    idx = tiles.index(value)
-                    try:
-                        after = tiles[idx + 1:]  # Remaining tiles
-                    except IndexError:
-                        after = []  # nothing remaining
-                    numtiles = len([x for x in after if x != None and x < value])
-                    inversionorder = inversionorder + numtiles
-                # Account for blank.
-                if self.boardsize % 2 == 0:
-                    inversionorder = inversionorder + \
-                                     math.floor(tiles.index(None) / self.boardsize) + 1
-                # Problem is solvable if inversion order even.
-                solvable = inversionorder % 2 == 0
-
-        # initialize the board
+            tiles = random_tiles(n)
+
+        # initialize the board and populate it
         super(TileBoard, self).__init__(self.boardsize, self.boardsize)
-        # populate it
-        for r in range(self.boardsize):
-            for c in range(self.boardsize):
-                tile = tiles[r * self.boardsize + c]  # next tile
-                if tile:
-                    self.place(r, c, tile)
-                else:
-                    # keep track of empty tile
-                    self.empty = (r, c)
+        self.packed = self.layout.pack(tiles)
+        self.blank = [idx for idx in range(len(tiles)) if not tiles[idx]][0]
+
+    @property
+    def board(self):
+        """board - Rows of the board as lists, None marks the empty cell"""
+        tiles = [tile or None for tile in self.layout.unpack(self.packed)]
+        return [tiles[r * self.boardsize:(r + 1) * self.boardsize]
+                for r in range(self.boardsize)]
+
+    @board.setter
+    def board(self, rows):
+        tiles = [tile for row in rows for tile in row]
+        self.packed = self.layout.pack(tiles)
+        self.blank = [idx for idx in range(len(tiles)) if not tiles[idx]][0]
+        self.hvalues = self.parent_hvalues = self.moved = None
+
+    @property
+    def empty(self):
+        """empty - (row, col) of the empty cell"""
+        return divmod(self.blank, self.boardsize)
+
+    def place(self, row, col, item):
+        """place an item, None or 0 for the empty cell"""
+        shift = self.layout.shifts[row * self.boardsize + col]
+        self.packed = (self.packed & ~(self.layout.mask << shift)) | \
+                      ((item or 0) << shift)
+        if not item:
+            self.blank = row * self.boardsize + col
+        self.hvalues = self.parent_hvalues = self.moved = None
+
+    def get(self, row, col):
+        """get an item, None for the empty cell"""
+        shift = self.layout.shifts[row * self.boardsize + col]
+        return (self.packed >> shift) & self.layout.mask or None
 
     def __hash__(self):
         """__hash__ - Hash the board state"""
 
-        # Convert state to a tuple and hash
-        return hash(self.state_tuple())
+        # The packed state is a plain integer, hashing it is cheap
+        return hash(self.packed)
 
     def __eq__(self, other):
         """"__eq__ - Check if objects equal:  a == b"""
-
-        # Set pairs to be equal to another
-        equal = True  # until we found out otherwise
-        # pair up board items in tuples and compare them
-        for (mystate, otherstate) in zip(self.state_tuple(), other.state_tuple()):
-            equal = mystate == otherstate
-            if not equal:
-                break
-        return equal
+        return isinstance(other, TileBoard) and \
+            self.packed == other.packed and \
+            self.boardsize == other.boardsize
 
     def state_tuple(self):
         """"state_tuple - Return board state as a single tuple"""
-
-        # Iterate over the items in each list, merging them
-        flattened = [item for sublist in self.board
-                     for item in sublist]
-        # convert to tuple (hashable) and return 
-        return (tuple(flattened))
+        return tuple(tile or None for tile in self.layout.unpack(self.packed))
 
     def get_actions(self):
-        """"Return row column offsets of where the empty tile can be moved"""
-
-        actions = []
-        # check row and column, no diagonal moves allowed
-        boarddims = [self.get_rows(), self.get_cols()]
-        for dim in [0, 1]:  # rows, then columns
-            # Append offsets to the actions list, 
-            # e.g. move left --> (-1,0)
-            #      move down --> (0, 1)
-            # Note that when we append to the list of actions,
-            # we use list( ) to make a copy of the list, otherwise
-            # we just get a pointer to it and modification of offset
-            # will change copies in the list.
-            offset = [0, 0]
-            # add if we don't go off the top or left
-            if self.empty[dim] - 1 >= 0:
-                offset[dim] = -1
-                actions.append(list(offset))
-            # append if we don't go off the bottom or right
-            if self.empty[dim] + 1 < boarddims[dim]:
-                offset[dim] = 1
-                actions.append(list(offset))
-
-        return actions
+        """"Return row column offsets of where the empty tile can be moved
+
+        e.g. move up --> [-1, 0], move right --> [0, 1]
+        Offsets are copies, callers may modify them.
+        """
+        return [list(offset) for (offset, _) in self.layout.actions[self.blank]]
 
     def move(self, offset):
         """"move - Move the empty space by [delta_row, delta_col] and return new board"""
 
         # Current row and column of empty space
-        (r, c) = self.empty
+        (r, c) = divmod(self.blank, self.boardsize)
 
         [delta_r, delta_c] = offset
 
@@ -150,47 +314,129 @@ class TileBoard(Board):
         rprime = r + delta_r
         cprime = c + delta_c
         if rprime < 0 or cprime < 0 or \
-                rprime >= self.get_rows() or cprime >= self.get_cols():
+                rprime >= self.boardsize or cprime >= self.boardsize:
             raise ValueError("Illegal move (%d,%d) from (%d,%d)" % (
                 delta_r, delta_c, r, c))
 
-        # Make a copy of the board so that mutating it does not 
-        # modify other copies of the board.  Not the most efficient
-        # way to do this, but it will get the job done.
-        newboard = copy.deepcopy(self)
-        # Slide a tile into the empty slot position
-        newboard.place(r, c, self.get(rprime, cprime))
-        # update empty position
-        newboard.place(rprime, cprime, None)
-        newboard.empty = (rprime, cprime)
+        # Slide the tile into the empty slot.  The empty cell packs as 0,
+        # so exchanging the two cells only requires the moved tile to be
+        # removed from one position and added at the other.
+        target = rprime * self.boardsize + cprime
+        shifts = self.layout.shifts
+        tile = (self.packed >> shifts[target]) & self.layout.mask
+        newboard = self.__class__.__new__(self.__class__)
+        newboard.rows = self.rows
+        newboard.cols = self.cols
+        newboard.displaycol = self.displaycol
+        newboard.empty_symbol = self.empty_symbol
+        newboard.boardsize = self.boardsize
+        newboard.layout = self.layout
+        newboard.multiple_solutions = self.multiple_solutions
+        newboard.packed = self.packed ^ (tile << shifts[target]) ^ \
+                          (tile << shifts[self.blank])
+        newboard.blank = target
+        newboard.hvalues = None
+        newboard.parent_hvalues = self.hvalues
+        newboard.moved = (tile, target, self.blank)
 
         return newboard
 
+    def slide(self, offset):
+        """"slide - Move the empty space by [delta_row, delta_col] in place
+
+        Same as move() without creating a new board.  Returns the offset
+        that slides the empty space back, e.g. for depth first searches
+        that undo moves when backtracking.
+        """
+        [delta_r, delta_c] = offset
+        (r, c) = divmod(self.blank, self.boardsize)
+        rprime = r + delta_r
+        cprime = c + delta_c
+        if rprime < 0 or cprime < 0 or \
+                rprime >= self.boardsize or cprime >= self.boardsize:
+            raise ValueError("Illegal move (%d,%d) from (%d,%d)" % (
+                delta_r, delta_c, r, c))
+
+        target = rprime * self.boardsize + cprime
+        shifts = self.layout.shifts
+        tile = (self.packed >> shifts[target]) & self.layout.mask
+        self.packed ^= (tile << shifts[target]) ^ (tile << shifts[self.blank])
+        self.parent_hvalues = self.hvalues
+        self.hvalues = None
+        self.moved = (tile, target, self.blank)
+        self.blank = target
+
+        return [-delta_r, -delta_c]
+
+    @classmethod
+    def from_packed(cls, n, packed, multiple_solutions=False):
+        """from_packed(n, packed, multiple_solutions) - Board of the n puzzle
+        from its packed state, see TileLayout"""
+        layout = TileLayout.get(math.isqrt(n + 1))
+        return cls(n, multiple_solutions, force_state=layout.unpack(packed))
+
+    def __getstate__(self):
+        """Heuristic caches are not pickled"""
+        state = {name: getattr(self, name) for name in
+                 ("rows", "cols", "displaycol", "empty_symbol") +
+                 TileBoard.__slots__}
+        state['hvalues'] = state['parent_hvalues'] = state['moved'] = None
+        return (None, state)
+
+    # Board.__repr__ formats for each (boardsize, displaycol)
+    templates = dict()
+
+    def __repr__(self):
+        """Same representation as Board, formatted with a single template"""
+        key = (self.boardsize, self.displaycol)
+        try:
+            template = TileBoard.templates[key]
+        except KeyError:
+            template = TileBoard.templates[key] = self.template()
+        return template.format(*[tile or self.empty_symbol for tile in
+                                 self.layout.unpack(self.packed)])
+
+    def template(self):
+        """template() - Format string of Board.__repr__ for this board size"""
+        colentry = "{!s:^%d}" % self.displaycol
+        rowheadersz = int(math.ceil(self.rows / 10.0))
+        lines = [" " * (rowheadersz + 1) +
+                 "".join([colentry.format(idx) for idx in range(self.cols)])]
+        for r in range(self.rows):
+            lines.append(("{:>%dd} " % rowheadersz).format(r) +
+                         colentry * self.cols)
+        return "\n".join(lines)
+
     # def __repr__(self):
     #    """Alternate board representation - as state tuple
     #       Useful for verifying that solutions do not have duplicate
     #       states in path."""
     #    return str(self.state_tuple())
 
+    def parity(self):
+        """parity - Solvability parity of the board (0 or 1)
+        Moves never change it, so a board can only reach boards of the
+        same parity.  See __init__ for details.
+        """
+        order = inversions(self.layout.unpack(self.packed))
+        if self.boardsize % 2 == 0:
+            order += self.blank // self.boardsize + 1
+        return order % 2
+
+    def goal_boards(self):
+        """goal_boards - Solved boards that can be reached from this board"""
+        if self.multiple_solutions:
+            goals = sorted(self.layout.goals)
+        else:
+            goals = [self.layout.goal]
+        boards = [TileBoard(self.layout.cells - 1, self.multiple_solutions,
+                            force_state=self.layout.unpack(goal))
+                  for goal in goals]
+        return [board for board in boards if board.parity() == self.parity()]
+
     def solved(self):
         """"solved - Is the puzzle solved?"""
-        last = 0
-        # Assume solved until we find otherwise.
-        # If only one solution allowed, verify space in center.
         if self.multiple_solutions:
-            solved = True
+            return self.packed in self.layout.goals
         else:
-            middle = (self.boardsize - 1) / 2
-            solved = self.empty == (middle, middle)
-
-        if solved:
-            for item in self.state_tuple():
-                # for items that are not the empty state, check if they
-                # have a value one higher than the last tile observed.
-                if item:
-                    solved = item == last + 1
-                    if not solved:
-                        break
-                    last = item  # update for next check
-
-        return solved
+            return self.packed == self.layout.goal
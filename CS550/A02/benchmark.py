@@ -0,0 +1,192 @@
+"""
+benchmark - Parallel multi-trial comparison of the driver02 solution methods
+
+Boards are generated up front from a seed or read from a corpus file (see
+corpus.py), so a benchmark is reproducible regardless of the number of
+workers or the order in which runs finish.
+Each (board, method) run is solved in its own worker process, which exits
+afterwards so that its peak resident set size belongs to that run alone.
+Every solution is verified and kept in the compact solution.Solution text
+form.  Results are streamed to CSV and/or JSON lines files as runs finish,
+and the driver02 summary table is printed at the end.
+
+Example, all methods on 31 boards with 4 workers:
+    python benchmark.py --trials 31 --workers 4 --csv results.csv
+
+@author: Tom Paulus
+@author: William Fox
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import (ProcessPoolExecutor, as_completed)
+from itertools import islice
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+from basicsearch_lib02.tileboard import random_boards
+from corpus import read_corpus
+from driver02 import (SOLUTION_METHODS, TRIAL_BOARD_SIZE, TRIAL_SIZE,
+                      print_summary)
+from npuzzle import NPuzzle
+from searchstats import SearchStats
+from solution import Solution
+
+SEED = 550
+
+# Fields recorded for every run
+FIELDS = ["trial", "method", "length_of_plan", "nodes_expanded",
+          "max_frontier", "elapsed_ns", "peak_rss", "solution"]
+
+
+def trial_boards(trials, seed=SEED, n=TRIAL_BOARD_SIZE, corpus=None):
+    """trial_boards(trials, seed, n, corpus) - List of board layouts (state
+    tuples) for a benchmark, the first trials boards of a corpus file (see
+    corpus.py) or random boards that are the same for the same seed
+    """
+    if corpus:
+        boards = read_corpus(corpus)
+    else:
+        boards = random_boards(n, seed=seed)
+    return [board.state_tuple() for board in islice(boards, trials)]
+
+
+def peak_rss():
+    """peak_rss() - Peak resident set size of this process in bytes, or
+    None if it is not available"""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return usage if sys.platform == "darwin" else usage * 1024
+
+
+def solve(trial, method, board_layout, n=TRIAL_BOARD_SIZE):
+    """solve(trial, method, board_layout, n) - Solve one board with the
+    named driver02 method, returns a dict of the FIELDS
+    """
+    (_, strategy, search) = [m for m in SOLUTION_METHODS if m[0] == method][0]
+    puzzle = NPuzzle(n, g=strategy.g, h=strategy.h, force_state=board_layout)
+    stats = SearchStats()
+
+    start = time.perf_counter_ns()
+    path, nodes_explored = search(puzzle, stats=stats)
+    elapsed = time.perf_counter_ns() - start
+    if path is None:
+        raise RuntimeError("%s found no solution for trial %d" % (method, trial))
+    solution = Solution.from_path(path)
+    if not solution.verify(puzzle.initial.multiple_solutions):
+        raise RuntimeError("%s found an invalid solution for trial %d: %s" % (
+            method, trial, solution))
+
+    return {"trial": trial,
+            "method": method,
+            "length_of_plan": len(path),
+            "nodes_expanded": nodes_explored,
+            "max_frontier": stats.max_frontier,
+            "elapsed_ns": elapsed,
+            "peak_rss": peak_rss(),
+            "solution": solution.encode()}
+
+
+def benchmark(trials=TRIAL_SIZE, methods=None, seed=SEED, workers=None,
+              n=TRIAL_BOARD_SIZE, csv_path=None, json_path=None, verbose=True,
+              corpus=None):
+    """benchmark(trials, methods, seed, workers, n, csv_path, json_path,
+    verbose, corpus)
+    Solve trials boards, seeded random ones or those of a corpus file, with
+    each of the named methods (all of driver02.SOLUTION_METHODS by default)
+    in worker processes.  Results are written to csv_path and/or json_path
+    (one JSON object per line) as they finish.  Returns the list of result dicts in trial order.
+    """
+    if methods is None:
+        methods = [method for (method, _, _) in SOLUTION_METHODS]
+    boards = trial_boards(trials, seed, n, corpus)
+    if len(boards) < trials:
+        raise ValueError("%s only holds %d boards" % (corpus, len(boards)))
+    if any(len(board) != n + 1 for board in boards):
+        raise ValueError("%s does not hold %d puzzles" % (corpus, n))
+
+    outputs = []
+    writers = []
+    try:
+        if csv_path:
+            handle = open(csv_path, "w", newline="")
+            outputs.append(handle)
+            writer = csv.DictWriter(handle, fieldnames=FIELDS)
+            writer.writeheader()
+            writers.append(writer.writerow)
+        if json_path:
+            handle = open(json_path, "w")
+            outputs.append(handle)
+            writers.append(lambda result, handle=handle:
+                           handle.write(json.dumps(result) + "\n"))
+
+        results = []
+        # A fresh process per run keeps peak RSS measurements separate
+        with ProcessPoolExecutor(max_workers=workers,
+                                 max_tasks_per_child=1) as executor:
+            futures = [executor.submit(solve, trial, method, board, n)
+                       for (trial, board) in enumerate(boards)
+                       for method in methods]
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                for (write, handle) in zip(writers, outputs):
+                    write(result)
+                    handle.flush()
+                if verbose:
+                    print("Trial #%d %s: %d moves, %d nodes, %.3f s" % (
+                        result["trial"] + 1, result["method"],
+                        result["length_of_plan"], result["nodes_expanded"],
+                        result["elapsed_ns"] / 1e9))
+    finally:
+        for handle in outputs:
+            handle.close()
+
+    order = {method: i for (i, method) in enumerate(methods)}
+    results.sort(key=lambda result: (result["trial"], order[result["method"]]))
+    return results
+
+
+def summarize(results, methods=None):
+    """summarize(results, methods) - Print the driver02 summary table of
+    benchmark results"""
+    if methods is None:
+        methods = list(dict.fromkeys(result["method"] for result in results))
+    length_of_plan = {method: [] for method in methods}
+    number_of_nodes = {method: [] for method in methods}
+    elapsed_time = {method: [] for method in methods}
+    for result in results:
+        method = result["method"]
+        length_of_plan[method].append(result["length_of_plan"])
+        number_of_nodes[method].append(result["nodes_expanded"])
+        elapsed_time[method].append(result["elapsed_ns"] / 1e9)
+    print_summary(methods, length_of_plan, number_of_nodes, elapsed_time)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark search methods")
+    parser.add_argument("--trials", type=int, default=TRIAL_SIZE)
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--corpus", help="solve the boards of a corpus file "
+                                         "instead of random ones")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--method", action="append", dest="methods",
+                        choices=[method for (method, _, _) in SOLUTION_METHODS],
+                        help="method to run, may be repeated (default all)")
+    parser.add_argument("--csv", help="stream results to a CSV file")
+    parser.add_argument("--json", help="stream results to a JSON lines file")
+    parser.add_argument("--quiet", action="store_true")
+    args = parser.parse_args()
+    results = benchmark(args.trials, args.methods, args.seed, args.workers,
+                        csv_path=args.csv, json_path=args.json,
+                        verbose=not args.quiet, corpus=args.corpus)
+    summarize(results, args.methods)
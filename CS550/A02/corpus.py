@@ -0,0 +1,99 @@
+"""
+corpus - Binary files of packed TileBoards
+
+Benchmarks reuse the same boards by generating them once and reading them
+back.  A corpus file holds a header (magic, puzzle size, number of boards)
+followed by the packed state of each board (see TileLayout) as a little
+endian integer of a fixed number of bytes.
+
+Generating a million random 8 puzzles, or boards 20 moves from the goal:
+    python corpus.py boards.bin --n 8 --count 1000000 --seed 550
+    python corpus.py walks.bin --n 8 --count 1000 --depth 20
+
+@author: Tom Paulus
+@author: William Fox
+"""
+
+import argparse
+import math
+import os
+import struct
+
+from basicsearch_lib02.tileboard import (TileBoard, TileLayout, random_boards,
+                                         random_walks)
+
+# Header:  magic, puzzle size n, number of boards
+HEADER = struct.Struct("<4sII")
+MAGIC = b"TBC1"
+
+BATCH = 4096  # boards read or written at a time
+
+
+def board_bytes(n):
+    """board_bytes(n) - Bytes used by each packed board of the n puzzle"""
+    layout = TileLayout.get(math.isqrt(n + 1))
+    return (layout.cells * layout.bits + 7) // 8
+
+
+def write_corpus(path, n, boards):
+    """write_corpus(path, n, boards) - Write an iterable of n puzzle boards
+    to path, returns the number of boards written.  The file is replaced
+    atomically once all boards have been written.
+    """
+    width = board_bytes(n)
+    partial = path + ".tmp"
+    count = 0
+    with open(partial, "wb") as handle:
+        handle.write(HEADER.pack(MAGIC, n, 0))
+        chunk = bytearray()
+        for board in boards:
+            chunk += board.packed.to_bytes(width, "little")
+            count += 1
+            if count % BATCH == 0:
+                handle.write(chunk)
+                chunk = bytearray()
+        handle.write(chunk)
+        # The count is only known now
+        handle.seek(0)
+        handle.write(HEADER.pack(MAGIC, n, count))
+    os.replace(partial, path)
+    return count
+
+
+def read_corpus(path, multiple_solutions=False):
+    """read_corpus(path, multiple_solutions) - Generate the TileBoards
+    stored in a corpus file"""
+    with open(path, "rb") as handle:
+        (magic, n, count) = HEADER.unpack(handle.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError("%s is not a board corpus" % path)
+        width = board_bytes(n)
+        remaining = count
+        while remaining:
+            batch = min(remaining, BATCH)
+            chunk = handle.read(batch * width)
+            if len(chunk) != batch * width:
+                raise ValueError("%s is truncated" % path)
+            for offset in range(0, len(chunk), width):
+                packed = int.from_bytes(chunk[offset:offset + width], "little")
+                yield TileBoard.from_packed(n, packed, multiple_solutions)
+            remaining -= batch
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate a board corpus")
+    parser.add_argument("path")
+    parser.add_argument("--n", type=int, default=8,
+                        help="puzzle size (number of tiles)")
+    parser.add_argument("--count", type=int, required=True)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--depth", type=int,
+                        help="random walk length from the goal "
+                             "(default uniformly random boards)")
+    args = parser.parse_args()
+    if args.depth is None:
+        boards = random_boards(args.n, args.count, args.seed)
+    else:
+        boards = random_walks(args.n, args.depth, args.count, args.seed)
+    print("Wrote %d boards to %s" % (write_corpus(args.path, args.n, boards),
+                                     args.path))
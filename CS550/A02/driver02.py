@@ -8,17 +8,32 @@ Created on Feb 12, 2018
 
 import re
 import time
+from functools import partial
 from statistics import (mean, stdev)
 
-from basicsearch_lib02.tileboard import TileBoard
+from basicsearch_lib02.tileboard import (TileBoard, random_boards)
+from corpus import read_corpus
 from basicsearch_lib02.utilsdontneed import print_table
+from heuristics import manhattan_to
 from npuzzle import NPuzzle
-from problemsearch import graph_search
-from searchstrategies import (BreadthFirst, DepthFirst, Manhattan)
+from problemsearch import (bidirectional_search, graph_search, ida_search)
+from searchstrategies import (BreadthFirst, DepthFirst, LinearConflict,
+                              Manhattan, WalkingDistance)
 
 TRIAL_SIZE = 31
 TRIAL_BOARD_SIZE = 8
-SOLUTION_METHODS = [BreadthFirst, DepthFirst, Manhattan]
+# Corpus file of boards to solve (see corpus.py), None for random boards
+CORPUS = None
+# (name, strategy providing g and h, search function)
+SOLUTION_METHODS = [("BreadthFirst", BreadthFirst, graph_search),
+                    ("DepthFirst", DepthFirst, graph_search),
+                    ("Manhattan", Manhattan, graph_search),
+                    ("LinearConflict", LinearConflict, graph_search),
+                    ("WalkingDistance", WalkingDistance, graph_search),
+                    ("IDA* Manhattan", Manhattan, ida_search),
+                    ("Bidirectional BreadthFirst", BreadthFirst, bidirectional_search),
+                    ("Bidirectional Manhattan", Manhattan,
+                     partial(bidirectional_search, heuristic=manhattan_to))]
 
 # Output Configuration
 DEBUG = False
@@ -41,17 +56,22 @@ def driver():
     number_of_nodes = dict()
     elapsed_time = dict()
 
-    for method in SOLUTION_METHODS:
+    for (method, _, _) in SOLUTION_METHODS:
         length_of_plan[method] = list()
         number_of_nodes[method] = list()
         elapsed_time[method] = list()
 
+    if CORPUS:
+        boards = read_corpus(CORPUS)
+    else:
+        boards = random_boards(TRIAL_BOARD_SIZE)
+
     for i in range(TRIAL_SIZE):
         if INFO:
             print('Starting Trial #%d' % (i + 1))
 
         # Standard Config
-        board_layout = TileBoard(TRIAL_BOARD_SIZE).state_tuple()
+        board_layout = next(boards).state_tuple()
 
         # Random Board - For testing
         # board_layout = TileBoard(TRIAL_BOARD_SIZE, force_state=[8, None, 6, 5, 4, 7, 2, 3, 1]).state_tuple()
@@ -67,14 +87,14 @@ def driver():
         # Solvable in ~15 moves
         # board_layout = TileBoard(TRIAL_BOARD_SIZE, force_state=[5, 3, 7, None, 1, 2, 4, 6, 8]).state_tuple()
 
-        for method in SOLUTION_METHODS:
+        for (method, strategy, search) in SOLUTION_METHODS:
             if INFO:
-                print('Solving puzzle via %s' % method.__name__)
+                print('Solving puzzle via %s' % method)
 
-            puzzle = NPuzzle(TRIAL_BOARD_SIZE, g=method.g, h=method.h, force_state=board_layout)
+            puzzle = NPuzzle(TRIAL_BOARD_SIZE, g=strategy.g, h=strategy.h, force_state=board_layout)
 
             start_time = tic()
-            path, nodes_explored = graph_search(puzzle, debug=DEBUG, verbose=VERBOSE)
+            path, nodes_explored = search(puzzle, debug=DEBUG, verbose=VERBOSE)
             duration = tock(start_time)
             assert path is not None
 
@@ -83,13 +103,22 @@ def driver():
             elapsed_time[method].append(duration)
 
             if INFO:
-                print('Solved puzzle via %s in %d seconds' % (method.__name__, duration))
+                print('Solved puzzle via %s in %d seconds' % (method, duration))
 
         print('Finished Trial #%d' % (i + 1))
 
     if INFO or DEBUG or VERBOSE:
         print("\n\n==================================================\n\n\n")
 
+    print_summary([method for (method, _, _) in SOLUTION_METHODS],
+                  length_of_plan, number_of_nodes, elapsed_time)
+
+
+def print_summary(methods, length_of_plan, number_of_nodes, elapsed_time):
+    """print_summary(methods, length_of_plan, number_of_nodes, elapsed_time)
+    Print the mean and standard deviation of each method's results, the
+    results are dicts of lists by method name.
+    """
     header = ["Method / Result   ",
               "Length of Plan (Mean/STDEV)",
               "Number of Nodes (Mean/STDEV)",
@@ -100,8 +129,8 @@ def driver():
     rows.append(['-' * (len(header[i]) + 1) for i in range(len(header))])
 
     # Table Values
-    for method in SOLUTION_METHODS:
-        rows.append([' '.join(re.sub('(?!^)([A-Z][a-z]+)', r' \1', method.__name__).split()),
+    for method in methods:
+        rows.append([' '.join(re.sub('(?!^)([A-Z][a-z]+)', r' \1', method).split()),
                      '{:.3f} / {:.3f}'.format(mean(length_of_plan[method]), stdev(length_of_plan[method])),
                      '{:.3f} / {:.3f}'.format(mean(number_of_nodes[method]), stdev(number_of_nodes[method])),
                      '{:.3f} / {:.3f}'.format(mean(elapsed_time[method]), stdev(elapsed_time[method]))])
@@ -4,6 +4,51 @@ Created on Feb 12, 2018
 @author: Tom Paulus
 @author: William Fox
 """
+import math
+import sys
+from array import array
+
+# Largest state space (number of permutations) given a rank bitset,
+# 9! for the 8 puzzle needs 45 KB
+RANK_LIMIT = 1 << 24
+
+
+def explored_set(state):
+    """explored_set(state) - Empty explored set suited to states like state
+
+    Boards that pack their tiles into an integer (see TileBoard) are kept
+    in a bitset over the permutation rank when the number of permutations
+    is at most RANK_LIMIT, or in a PackedExplored table when the packed
+    value fits in 64 bits.  Other states use a set of states.
+    """
+    layout = getattr(state, "layout", None)
+    if layout is not None and hasattr(state, "packed"):
+        if math.factorial(layout.cells) <= RANK_LIMIT:
+            return PermutationExplored(layout)
+        if layout.cells * layout.bits <= 64:
+            return PackedExplored()
+    return Explored()
+
+
+def popcount(value):
+    """popcount(value) - Number of bits set in a non-negative integer"""
+    return bin(value).count("1")
+
+
+def lehmer_rank(permutation, ones=None):
+    """lehmer_rank(permutation, ones) - Rank of a permutation of 0 .. n-1 in
+    lexicographic order, 0 .. n!-1.  ones, if given, is a table of
+    popcount(i) for i < 2**n."""
+    n = len(permutation)
+    rank = 0
+    used = 0
+    for item in permutation:
+        # Digit is the item's index among the items not used yet
+        below = used & ((1 << item) - 1)
+        rank = rank * n + item - (ones[below] if ones else popcount(below))
+        used |= 1 << item
+        n -= 1
+    return rank
 
 
 class Explored(object):
@@ -12,31 +57,121 @@ class Explored(object):
     def __init__(self):
         """"__init__() - Create an empty explored set"""
 
-        self.hash_map = dict()
+        self.states = set()
 
     def exists(self, state):
         """exists(state) - Has this state already been explored?
         Returns True or False, state must be hashable
         """
 
-        try:
-            return state in self.hash_map[hash(state)]
-        except KeyError:
-            return False
+        return state in self.states
 
     def add(self, state):
-        """add(state) - add given state to the explored set.  
-        state must be hashable and we asssume that it is not already in set
+        """add(state) - add given state to the explored set.
+        state must be hashable
         """
 
-        # The hash function is a Python builtin that generates
-        # a hash value from its argument.  Use this to create
-        # a dictionary key.  Handle collisions by storing 
-        # states that hash to the same key in a bucket list.
-        # Note that when you access a Python dictionary by a
-        # non existant key, it throws a KeyError
+        self.states.add(state)
+
+    __contains__ = exists
+
+    def __len__(self):
+        return len(self.states)
+
+    def memory_usage(self):
+        """memory_usage() - Bytes used by the set, excluding the states"""
+        return sys.getsizeof(self.states)
+
+    def report(self):
+        """report() - Description of the set size and memory usage"""
+        usage = self.memory_usage()
+        return "%s: %d states, %d bytes (%.1f bytes/state)" % (
+            type(self).__name__, len(self), usage, usage / max(len(self), 1))
+
+
+class PermutationExplored(Explored):
+    """PermutationExplored - Explored set of packed boards as one bit per
+    permutation of the tiles, indexed by the Lehmer rank of the board.
+    Memory is fixed at n!/8 bytes for n cells.
+    """
+
+    def __init__(self, layout):
+        self.layout = layout
+        self.bits = bytearray((math.factorial(layout.cells) + 7) // 8)
+        self.ones = bytes(popcount(i) for i in range(1 << layout.cells))
+        self.count = 0
+
+    def rank(self, state):
+        return lehmer_rank(self.layout.unpack(state.packed), self.ones)
+
+    def exists(self, state):
+        rank = self.rank(state)
+        return bool(self.bits[rank >> 3] & (1 << (rank & 7)))
+
+    def add(self, state):
+        rank = self.rank(state)
+        bit = 1 << (rank & 7)
+        if not self.bits[rank >> 3] & bit:
+            self.bits[rank >> 3] |= bit
+            self.count += 1
+
+    __contains__ = exists
+
+    def __len__(self):
+        return self.count
+
+    def memory_usage(self):
+        return sys.getsizeof(self.bits)
+
+
+class PackedExplored(Explored):
+    """PackedExplored - Explored set of boards whose packed value fits in 64
+    bits, stored in an open addressing table with linear probing.  Slots
+    hold the packed values, 0 marks an empty slot:  only the empty cell
+    packs to 0, so no board does.  The table doubles when half full.
+    """
+
+    MULTIPLIER = 0x9E3779B97F4A7C15  # Fibonacci hashing, 2**64 / golden ratio
+    WORD = (1 << 64) - 1
+
+    def __init__(self, capacity_bits=10):
+        self.capacity_bits = capacity_bits
+        self.table = array("Q", bytes(8 << capacity_bits))
+        self.count = 0
+
+    def slot(self, key):
+        """slot(key) - Index of key's slot or of the empty slot it belongs in"""
+        table = self.table
+        mask = len(table) - 1
+        i = ((key * self.MULTIPLIER) & self.WORD) >> (64 - self.capacity_bits)
+        while table[i] and table[i] != key:
+            i = (i + 1) & mask
+        return i
+
+    def exists(self, state):
+        return bool(self.table[self.slot(state.packed)])
+
+    def add(self, state):
+        key = state.packed
+        i = self.slot(key)
+        if not self.table[i]:
+            self.table[i] = key
+            self.count += 1
+            if 2 * self.count > len(self.table):
+                self.grow()
+
+    def grow(self):
+        """grow() - Double the table and reinsert the keys"""
+        keys = [key for key in self.table if key]
+        self.capacity_bits += 1
+        self.table = array("Q", bytes(8 << self.capacity_bits))
+        for key in keys:
+            self.table[self.slot(key)] = key
+
+    __contains__ = exists
 
-        if hash(state) not in self.hash_map.keys():
-            self.hash_map[hash(state)] = set()
-        self.hash_map[hash(state)].add(state)
+    def __len__(self):
+        return self.count
 
+    def memory_usage(self):
+        return sys.getsizeof(self.table)
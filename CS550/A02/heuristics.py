@@ -0,0 +1,358 @@
+"""
+heuristics - Precomputed heuristic tables for TileBoard puzzles
+
+Each table is built once per board size and goal layout and shared by
+every board and NPuzzle instance using it.  Tables evaluate a board from
+scratch, or incrementally from the value of the board it was derived
+from:  TileBoard.move() records the tile that moved and keeps a reference
+to the heuristic values of its parent, so a child only pays for the
+change caused by a single tile.
+
+@author: Tom Paulus
+@author: William Fox
+"""
+
+import itertools
+
+
+class HeuristicTable(object):
+    """HeuristicTable - Base class for incremental heuristic tables
+
+    Subclasses implement value(state) to evaluate a board from scratch and
+    update(value, moved) to derive the value of a child from the value of
+    its parent and the move (tile, from_cell, to_cell) that created it.
+    Values stored by h() may be any object, h() returns score(value).
+    """
+
+    def h(self, state):
+        """h(state) - Heuristic value of state, incremental when possible"""
+        values = state.hvalues
+        if values is None:
+            values = state.hvalues = dict()
+        else:
+            try:
+                return self.score(values[self])
+            except KeyError:
+                pass
+
+        parent = state.parent_hvalues
+        if parent is not None and self in parent:
+            value = self.update(parent[self], state.moved)
+        else:
+            value = self.value(state)
+        values[self] = value
+        return self.score(value)
+
+    def value(self, state):
+        raise NotImplementedError("Subclass must implement")
+
+    def update(self, value, moved):
+        raise NotImplementedError("Subclass must implement")
+
+    @staticmethod
+    def score(value):
+        """score(value) - Heuristic value from a stored value"""
+        return value
+
+
+def manhattan_to(targets):
+    """manhattan_to(targets) - Heuristic function of a state estimating the
+    moves to the closest of the target boards by Manhattan distance,
+    without counting the empty cell.  Suitable for searches in either
+    direction, e.g. problemsearch.bidirectional_search.
+    """
+    return ManhattanTable.get(targets[0].layout,
+                              tuple(target.packed for target in targets)).h
+
+
+class ManhattanTable(HeuristicTable):
+    """ManhattanTable - City block distance of every tile to its goal cell
+
+    distance[tile][cell] is the number of moves tile needs from cell to
+    reach its goal.  When several goal layouts are allowed, the distance to
+    the closest goal cell of the tile is used so the heuristic remains
+    admissible.  The empty cell (tile 0) is only counted if blank is True.
+    """
+
+    tables = dict()
+
+    @classmethod
+    def for_board(cls, state, blank=False):
+        """for_board(state, blank) - Shared table for the goals of a TileBoard"""
+        layout = state.layout
+        if state.multiple_solutions:
+            goals = tuple(sorted(layout.goals))
+        else:
+            goals = (layout.goal,)
+        return cls.get(layout, goals, blank)
+
+    @classmethod
+    def get(cls, layout, goals, blank=False):
+        """get(layout, goals, blank) - Shared table for a tuple of packed goals"""
+        key = (layout.boardsize, goals, blank)
+        try:
+            return cls.tables[key]
+        except KeyError:
+            table = cls.tables[key] = cls(layout, goals, blank)
+            return table
+
+    def __init__(self, layout, goals, blank=False):
+        size = layout.boardsize
+        self.layout = layout
+        # Distances start out further away than any cell of the board
+        # and are lowered to the closest goal
+        far = 2 * size
+        self.distance = [[far] * layout.cells for _ in range(layout.cells)]
+        for goal in goals:
+            for (goalcell, tile) in enumerate(layout.unpack(goal)):
+                (goalrow, goalcol) = divmod(goalcell, size)
+                for cell in range(layout.cells):
+                    (row, col) = divmod(cell, size)
+                    distance = abs(goalrow - row) + abs(goalcol - col)
+                    self.distance[tile][cell] = min(self.distance[tile][cell],
+                                                    distance)
+        if not blank:
+            self.distance[0] = [0] * layout.cells
+
+    def value(self, state):
+        distance = self.distance
+        return sum([distance[tile][cell] for (cell, tile) in
+                    enumerate(self.layout.unpack(state.packed))])
+
+    def update(self, value, moved):
+        # The tile moved from source to destination and the empty cell
+        # the other way around
+        (tile, source, destination) = moved
+        distance = self.distance[tile]
+        empty = self.distance[0]
+        return value - distance[source] + distance[destination] \
+            - empty[destination] + empty[source]
+
+
+def longest_increasing(sequence):
+    """longest_increasing(sequence) - Length of the longest increasing
+    subsequence of a sequence"""
+    lengths = []  # lengths[i] - smallest last item of a run of length i + 1
+    for item in sequence:
+        i = 0
+        while i < len(lengths) and lengths[i] < item:
+            i += 1
+        if i == len(lengths):
+            lengths.append(item)
+        else:
+            lengths[i] = item
+    return len(lengths)
+
+
+class LinearConflictTable(HeuristicTable):
+    """LinearConflictTable - Manhattan distance plus linear conflicts
+
+    Tiles that are in their goal row (column) but in the wrong order
+    cannot pass each other:  all but the longest run of them that is in
+    order must leave the line and come back, two moves more than the
+    Manhattan distance counts.  Only tiles are counted, not the empty cell.
+
+    Stored values are (h, lines), lines holding a tuple for each row and
+    then each column.  A line's tuple has an entry per cell:  one more than
+    the goal position along the line of a tile whose goal is in the line,
+    or 0 for the empty cell and other tiles.  conflicts maps such tuples to
+    their extra moves, it is built once per board size and shared by all
+    lines.  A move only changes the two lines the tile leaves and enters.
+    """
+
+    tables = dict()
+
+    @classmethod
+    def for_board(cls, state):
+        """for_board(state) - Shared table for the goal of a TileBoard"""
+        if state.multiple_solutions:
+            raise ValueError("Linear conflicts require a single goal")
+        try:
+            return cls.tables[state.boardsize]
+        except KeyError:
+            table = cls.tables[state.boardsize] = cls(state.layout)
+            return table
+
+    def __init__(self, layout):
+        size = layout.boardsize
+        self.layout = layout
+        self.manhattan = ManhattanTable.get(layout, (layout.goal,))
+        self.goal = [None] * layout.cells  # (row, col) goal of each tile
+        for (cell, tile) in enumerate(layout.unpack(layout.goal)):
+            self.goal[tile] = divmod(cell, size)
+
+        self.conflicts = dict()
+        for count in range(size + 1):
+            for positions in itertools.combinations(range(size), count):
+                for order in itertools.permutations(range(1, size + 1), count):
+                    line = [0] * size
+                    for (position, entry) in zip(positions, order):
+                        line[position] = entry
+                    self.conflicts[tuple(line)] = \
+                        2 * (count - longest_increasing(order))
+
+    def value(self, state):
+        size = self.layout.boardsize
+        tiles = self.layout.unpack(state.packed)
+        goal = self.goal
+        rows = [tuple([goal[tile][1] + 1 if tile and goal[tile][0] == r else 0
+                       for tile in tiles[r * size:(r + 1) * size]])
+                for r in range(size)]
+        cols = [tuple([goal[tile][0] + 1 if tile and goal[tile][1] == c else 0
+                       for tile in tiles[c::size]])
+                for c in range(size)]
+        lines = tuple(rows + cols)
+        conflicts = self.conflicts
+        return (self.manhattan.value(state) +
+                sum([conflicts[line] for line in lines]), lines)
+
+    def update(self, value, moved):
+        (tile, source, destination) = moved
+        (h, lines) = value
+        size = self.layout.boardsize
+        distance = self.manhattan.distance[tile]
+        h += distance[destination] - distance[source]
+
+        (sr, sc) = divmod(source, size)
+        (dr, dc) = divmod(destination, size)
+        (gr, gc) = self.goal[tile]
+        if sr == dr:
+            # Moving along its row keeps the order of the row, the tile
+            # leaves column sc and enters column dc at index sr
+            (along, swap, index) = (sr, (sc, dc), sr)
+            crossing = ((size + sc, 0), (size + dc, gr + 1 if gc == dc else 0))
+        else:
+            (along, swap, index) = (size + sc, (sr, dr), sc)
+            crossing = ((sr, 0), (dr, gc + 1 if gr == dr else 0))
+
+        lines = list(lines)
+        line = list(lines[along])
+        (line[swap[0]], line[swap[1]]) = (line[swap[1]], line[swap[0]])
+        lines[along] = tuple(line)
+        conflicts = self.conflicts
+        for (crossed, entry) in crossing:
+            old = lines[crossed]
+            new = old[:index] + (entry,) + old[index + 1:]
+            h += conflicts[new] - conflicts[old]
+            lines[crossed] = new
+        return (h, tuple(lines))
+
+    @staticmethod
+    def score(value):
+        return value[0]
+
+
+class WalkingDistanceTable(HeuristicTable):
+    """WalkingDistanceTable - Walking distance of the tiles
+
+    Tiles are only told apart by their goal row.  The vertical walking
+    distance is the number of moves needed to bring every tile to its goal
+    row when any tile of a row next to the empty cell's row may move into
+    it.  It is found by a breadth first search back from the goal over the
+    number of tiles in each row by goal row, and the row of the empty cell.
+    The horizontal walking distance is the same with columns.  Every move
+    changes only one of the two, so their sum is admissible, and it is never
+    below the Manhattan distance.
+
+    Those counts are packed into an integer key, COUNT_BITS per (row, goal
+    row) pair and the empty cell's row above them.  Stored values are the
+    (row key, column key) of a board.  The empty cell of the goal is on the
+    diagonal, so one table of distances serves both.  Tables grow quickly
+    with the board size, boards up to MAX_BOARDSIZE are supported.
+    """
+
+    COUNT_BITS = 3
+    MAX_BOARDSIZE = 4
+
+    tables = dict()
+
+    @classmethod
+    def for_board(cls, state):
+        """for_board(state) - Shared table for the goal of a TileBoard"""
+        if state.multiple_solutions:
+            raise ValueError("Walking distance requires a single goal")
+        if state.boardsize > cls.MAX_BOARDSIZE:
+            raise ValueError("Walking distance supports boards up to %dx%d" % (
+                cls.MAX_BOARDSIZE, cls.MAX_BOARDSIZE))
+        try:
+            return cls.tables[state.boardsize]
+        except KeyError:
+            table = cls.tables[state.boardsize] = cls(state.layout)
+            return table
+
+    def __init__(self, layout):
+        size = layout.boardsize
+        self.layout = layout
+        self.blank_shift = self.COUNT_BITS * size * size
+        self.goal = [None] * layout.cells  # (row, col) goal of each tile
+        for (cell, tile) in enumerate(layout.unpack(layout.goal)):
+            self.goal[tile] = divmod(cell, size)
+        (blank_row, blank_col) = self.goal[0]
+        assert blank_row == blank_col
+
+        # Breadth first search from the goal, every row holds its own
+        # tiles except for the empty cell
+        goal_key = blank_row << self.blank_shift
+        for row in range(size):
+            goal_key += (size - (row == blank_row)) << self.shift(row, row)
+        self.distance = {goal_key: 0}
+        layer = [goal_key]
+        mask = (1 << self.COUNT_BITS) - 1
+        while layer:
+            following = []
+            for key in layer:
+                blank = key >> self.blank_shift
+                for row in (blank - 1, blank + 1):
+                    if not 0 <= row < size:
+                        continue
+                    for goal_row in range(size):
+                        if (key >> self.shift(row, goal_row)) & mask:
+                            # A tile of goal_row moves into the empty row
+                            child = key - (1 << self.shift(row, goal_row)) + \
+                                (1 << self.shift(blank, goal_row)) + \
+                                ((row - blank) << self.blank_shift)
+                            if child not in self.distance:
+                                self.distance[child] = self.distance[key] + 1
+                                following.append(child)
+            layer = following
+
+    def shift(self, line, goal_line):
+        """shift(line, goal_line) - Bit offset of the number of tiles in a
+        line (row or column) whose goal is goal_line"""
+        return self.COUNT_BITS * (line * self.layout.boardsize + goal_line)
+
+    def value(self, state):
+        size = self.layout.boardsize
+        (row_key, col_key) = (0, 0)
+        for (cell, tile) in enumerate(self.layout.unpack(state.packed)):
+            (row, col) = divmod(cell, size)
+            if tile:
+                (goal_row, goal_col) = self.goal[tile]
+                row_key += 1 << self.shift(row, goal_row)
+                col_key += 1 << self.shift(col, goal_col)
+            else:
+                row_key += row << self.blank_shift
+                col_key += col << self.blank_shift
+        return (row_key, col_key)
+
+    def update(self, value, moved):
+        (tile, source, destination) = moved
+        (row_key, col_key) = value
+        size = self.layout.boardsize
+        (sr, sc) = divmod(source, size)
+        (dr, dc) = divmod(destination, size)
+        (goal_row, goal_col) = self.goal[tile]
+        # The empty cell moves from the destination to the source
+        if sr != dr:
+            row_key += (1 << self.shift(dr, goal_row)) - \
+                (1 << self.shift(sr, goal_row)) + \
+                ((sr - dr) << self.blank_shift)
+        else:
+            col_key += (1 << self.shift(dc, goal_col)) - \
+                (1 << self.shift(sc, goal_col)) + \
+                ((sc - dc) << self.blank_shift)
+        return (row_key, col_key)
+
+    def score(self, value):
+        distance = self.distance
+        return distance[value[0]] + distance[value[1]]
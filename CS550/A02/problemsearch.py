@@ -4,17 +4,60 @@ Created on Feb 12, 2018
 @author: Tom Paulus
 @author: William Fox
 """
-from collections import deque
+import copy
+import math
+import time
 
-from basicsearch_lib02.queues import PriorityQueue
+from basicsearch_lib02.queues import (BeamQueue, BucketQueue, FIFOQueue,
+                                      PriorityQueue, Stack)
 from basicsearch_lib02.searchrep import (Node, Problem)
-from explored import Explored
+from basicsearch_lib02.tileboard import TileBoard
+from explored import explored_set
+from searchstats import (TimedProblem, TimedQueue)
+from solution import Solution
 
+BEAM_WIDTH = 1000
 
-def graph_search(problem: Problem, verbose=False, debug=False):
-    """graph_search(problem, verbose, debug) - Given a problem representation
-    (instance of basicsearch_lib02.representation.Problem or derived class),
-    attempt to solve the problem.
+# Frontier factories by name.  Queues pop:
+#   stack - most recently added node first (depth first)
+#   fifo - least recently added node first (breadth first)
+#   priority - lowest f first, binary heap for any f values
+#   bucket - lowest f first, O(1) operations when f takes few values
+#   beam - lowest f first, keeping only the BEAM_WIDTH best nodes
+FRONTIERS = {
+    "stack": Stack,
+    "fifo": FIFOQueue,
+    "priority": lambda: PriorityQueue(f=Node.get_f),
+    "bucket": lambda: BucketQueue(f=Node.get_f),
+    "beam": lambda: BeamQueue(BEAM_WIDTH, f=Node.get_f),
+}
+
+
+def strategy_attribute(problem: Problem, name, default):
+    """strategy_attribute(problem, name, default) - Attribute of the strategy
+    class whose h classmethod the problem uses (see searchstrategies), or
+    default if the problem's h does not come from a strategy class with
+    this attribute.
+    """
+    return getattr(getattr(problem.h, "__self__", None), name, default)
+
+
+def graph_search(problem: Problem, verbose=False, debug=False, frontier=None,
+                 stats=None, tracer=None):
+    """graph_search(problem, verbose, debug, frontier, stats, tracer) - Given
+    a problem representation (instance of
+    basicsearch_lib02.representation.Problem or derived class), attempt to
+    solve the problem.
+
+    frontier selects the order in which nodes are expanded.  It is either
+    the name of one of the FRONTIERS or an empty queue instance.  If None,
+    the frontier attribute of the strategy class that provides problem.h
+    is used (see searchstrategies), defaulting to a priority queue on f.
+
+    If stats is a searchstats.SearchStats, it receives the search's
+    counters, and timers if it was created with timing=True.  If tracer is
+    a searchstats.SearchTracer, the search is sampled every tracer.every
+    expansions.
     
     If debug is True, debugging information will be displayed.
     
@@ -73,66 +116,360 @@ def graph_search(problem: Problem, verbose=False, debug=False):
     nodes_explored - Number of nodes explored (dequeued from frontier)
     """
 
-    frontier = PriorityQueue()
+    if frontier is None:
+        frontier = strategy_attribute(problem, "frontier", "priority")
+    if isinstance(frontier, str):
+        frontier = FRONTIERS[frontier]()
+    # States that are not queued again.  Stacks and FIFO queues record
+    # states as they are queued.  Frontiers ordered by f may reach a queued
+    # state again by a cheaper path, so they record states as they are
+    # explored, and a cheaper path to a queued state replaces its node
+    # (decrease-key, see basicsearch_lib02.queues).
+    ordered = getattr(frontier, "ordered", False)
+    if stats is not None:
+        start = time.perf_counter_ns()
+        if stats.timing:
+            problem = TimedProblem(problem, stats)
+            frontier = TimedQueue(frontier, stats)
+
     frontier.append(Node(problem, problem.initial))
-    node = frontier.pop()
-    right_pop = True
-    if node.expand(node.problem)[0].g < 0:
-        # DFS
-        frontier = deque()
-        frontier.append(Node(problem, problem.initial))
-    elif node.expand(node.problem)[0].h < 2:
-        # BFS
-        right_pop = False
-        frontier = deque()
-        frontier.append(Node(problem, problem.initial))
-    else:
-        # Manhattan
-        frontier.append(node)
-    frontier_hash = Explored()
-    frontier_hash.add(problem.initial.state_tuple())
+    reached = explored_set(problem.initial)
+    if not ordered:
+        reached.add(problem.initial)
     done = False
+    solution_path = None
     nodes_explored = 0
-    explored = Explored()
+    generated = 0
+    duplicates = 0
+    max_frontier = 1
     while not done:
-        if right_pop:
-            node = frontier.pop()  # Manhattan and DFS
-        else:
-            node = frontier.popleft()  # BFS
+        node = frontier.pop()
+        if ordered:
+            reached.add(node.state)
 
         if debug:
             print("Popped Node:", str(node))
 
-        explored.add(node.state.state_tuple())
         nodes_explored += 1
+        if tracer is not None and not nodes_explored % tracer.every:
+            tracer.sample(node, nodes_explored, len(frontier))
 
         if node.state.solved():
             if debug:
                 print("A solution has been found!")
+                print(reached.report())
             solution_path = node.path()
             done = True
-            if verbose:
-                print_solution(solution_path)
-            return solution_path, nodes_explored
         else:
-            for child in node.expand(node.problem):
+            children = node.expand(node.problem)
+            generated += len(children)
+            for child in children:
                 # Add new children to frontier
-                if not explored.exists(child.state.state_tuple()) and not frontier_hash.exists(
-                        child.state.state_tuple()):
+                if child.state in reached:
+                    duplicates += 1
+                    if debug:
+                        print("Skipping Node - not novel", child)
+                elif ordered and child in frontier:
+                    # Keeps whichever of child and the queued node has the
+                    # cheaper path
+                    frontier.append(child)
+                    duplicates += 1
+                    if debug:
+                        print("Node already queued", frontier[child])
+                else:
                     frontier.append(child)
-                    frontier_hash.add(child)
-                elif debug:
-                    print("Skipping Node - not novel", child)
-                    pass
+                    if not ordered:
+                        reached.add(child.state)
+            max_frontier = max(max_frontier, len(frontier))
             done = len(frontier) == 0
         if debug:
             print("")
+
+    if stats is not None:
+        stats.expanded = nodes_explored
+        stats.generated = generated
+        stats.duplicates = duplicates
+        stats.max_frontier = max_frontier
+        stats.explored = len(reached)
+        stats.explored_bytes = reached.memory_usage()
+        stats.elapsed_ns = time.perf_counter_ns() - start
+    if tracer is not None:
+        tracer.record("solved" if solution_path else "failed",
+                      expanded=nodes_explored, frontier=len(frontier),
+                      moves=len(solution_path) - 1 if solution_path else None)
     if verbose:
-        print("No solution found")
-    return None, nodes_explored
+        if solution_path is None:
+            print("No solution found")
+        else:
+            print_solution(solution_path)
+    return solution_path, nodes_explored
+
+
+def ida_search(problem: Problem, verbose=False, debug=False, step_cost=None,
+               iterations=None, stats=None):
+    """ida_search(problem, verbose, debug, step_cost, iterations, stats) -
+    Iterative deepening A* (IDA*) search of a problem.
+
+    Runs depth first searches bounded by f = g + h, raising the bound to
+    the smallest f that exceeded it until a solution is found.  Only the
+    current path is kept, so memory is proportional to the solution depth.
+    The state is modified in place and moves are undone when backtracking,
+    so states must provide slide(action) which applies an action in place
+    and returns the action that undoes it (see TileBoard.slide).  The
+    problem's initial state is not modified.
+
+    g is step_cost times the depth.  If step_cost is None, the step_cost
+    of the strategy class providing problem.h is used (see
+    searchstrategies), or 1 if it has none.  problem.h is used as is.
+
+    verbose and debug behave as in graph_search, debug also reports the
+    number of nodes and the bound of each iteration.  If iterations is a
+    list, (bound, nodes explored) is appended to it for every iteration.
+    If stats is a searchstats.SearchStats, it receives the counters and
+    timers that apply, max_frontier being the largest number of states held
+    on the current path.
+
+    Returns a tuple (path, nodes_explored) as graph_search does.
+    """
+
+    if step_cost is None:
+        step_cost = strategy_attribute(problem, "step_cost", 1)
+    if step_cost <= 0:
+        raise ValueError("IDA* requires a positive step cost")
+    if stats is not None:
+        start = time.perf_counter_ns()
+        if stats.timing:
+            problem = TimedProblem(problem, stats)
+
+    state = copy.copy(problem.initial)
+    actions = []  # actions from the initial state to state
+    found = object()  # marks a solution found by bounded_search
+    nodes_explored = 0
+    max_depth = 0
+
+    def bounded_search(g, bound, undo):
+        """Search below state, return found or the smallest f over bound"""
+        nonlocal nodes_explored, max_depth
+        f = g + problem.h(state)
+        if f > bound:
+            return f
+        nodes_explored += 1
+        max_depth = max(max_depth, len(actions))
+        if problem.goal_test(state):
+            return found
+
+        minimum = math.inf
+        for action in problem.actions(state):
+            if action == undo:
+                continue  # do not move straight back to the parent
+            back = state.slide(action)
+            actions.append(action)
+            result = bounded_search(g + step_cost, bound, back)
+            if result is found:
+                return found
+            minimum = min(minimum, result)
+            actions.pop()
+            state.slide(back)
+        return minimum
+
+    bound = problem.h(state)
+    while True:
+        explored_before = nodes_explored
+        result = bounded_search(0, bound, None)
+        if iterations is not None:
+            iterations.append((bound, nodes_explored - explored_before))
+        if debug:
+            print("Bound %s: %d nodes explored" % (
+                bound, nodes_explored - explored_before))
+
+        if stats is not None:
+            stats.expanded = nodes_explored
+            stats.max_frontier = max_depth + 1
+            stats.elapsed_ns = time.perf_counter_ns() - start
+        if result is found:
+            # Build search nodes for the solution only
+            node = Node(problem, problem.initial)
+            for action in actions:
+                node = node.child_node(action)
+            solution_path = node.path()
+            if verbose:
+                print_solution(solution_path)
+            return solution_path, nodes_explored
+        elif result == math.inf:
+            if verbose:
+                print("No solution found")
+            return None, nodes_explored
+        bound = result
+
+
+def bidirectional_search(problem: Problem, verbose=False, debug=False,
+                         heuristic=None, stats=None):
+    """bidirectional_search(problem, verbose, debug, heuristic, stats) - Search
+    forward from the initial state and backward from the goal states
+    until the two searches meet.
+
+    States must provide goal_boards() listing the goal states reachable
+    from them and actions must be [delta_row, delta_col] offsets that are
+    undone by their negation, as for TileBoard.  Every move costs 1.
+
+    heuristic(targets) returns a function estimating the number of moves
+    from a state to the closest of the target states, e.g.
+    heuristics.manhattan_to.  Each side is then searched with A*, with the
+    other side's roots as targets.  If heuristic is None, both sides are
+    searched breadth first.  Searching stops once no path shorter than
+    the best meeting found can exist:  when its cost is no larger than
+    the lowest f of either frontier, or than the lowest g of both
+    frontiers plus one move.  The plan is therefore optimal if the
+    heuristic is admissible.  If stats is a searchstats.SearchStats, it
+    receives the counters and timers that apply to both sides.
+
+    Returns (path, nodes_explored) as graph_search does, nodes_explored
+    counting the expansions of both sides.
+    """
+
+    if stats is not None:
+        start = time.perf_counter_ns()
+        if stats.timing:
+            problem = TimedProblem(problem, stats)
+
+    goals = problem.initial.goal_boards()
+    sides = [_SearchSide([problem.initial], goals, heuristic),
+             _SearchSide(goals, [problem.initial], heuristic)]
+    best = math.inf  # cost of the best meeting found so far
+    meeting = None
+    nodes_explored = 0
+    generated = 0
+    duplicates = 0
+    max_frontier = len(sides[0].frontier) + len(sides[1].frontier)
+
+    if problem.initial in sides[1].reached:
+        best = 0  # already solved
+        meeting = problem.initial
+
+    while best > 0 and sides[0].frontier and sides[1].frontier:
+        bound = max(sides[0].lowest_f(), sides[1].lowest_f(),
+                    sides[0].lowest_g() + sides[1].lowest_g() + 1)
+        if best <= bound:
+            break
+
+        # Grow the side with the smaller frontier
+        if len(sides[0].frontier) <= len(sides[1].frontier):
+            (side, other) = sides
+        else:
+            (other, side) = sides
+        (g, state) = side.pop()
+        if state is None:
+            duplicates += 1
+            continue  # reached again with a lower g since it was queued
+        nodes_explored += 1
+        if debug:
+            print("Expanding %s side, g=%d:" % (
+                "forward" if side is sides[0] else "backward", g))
+            print(state)
+
+        for action in problem.actions(state):
+            child = problem.result(state, action)
+            generated += 1
+            if not side.add(child, g + 1, state, action):
+                duplicates += 1
+            elif child in other.reached:
+                cost = g + 1 + other.reached[child][0]
+                if cost < best:
+                    best = cost
+                    meeting = child
+        max_frontier = max(max_frontier,
+                           len(sides[0].frontier) + len(sides[1].frontier))
+
+    if stats is not None:
+        stats.expanded = nodes_explored
+        stats.generated = generated
+        stats.duplicates = duplicates
+        stats.max_frontier = max_frontier
+        stats.explored = len(sides[0].reached) + len(sides[1].reached)
+        stats.elapsed_ns = time.perf_counter_ns() - start
+    if meeting is None:
+        if verbose:
+            print("No solution found")
+        return None, nodes_explored
+
+    # Splice the forward path to the meeting state with the reversed
+    # backward path from it
+    actions = sides[0].actions_to(meeting)
+    state = meeting
+    while sides[1].reached[state][1] is not None:
+        (_, parent, action) = sides[1].reached[state]
+        actions.append([-delta for delta in action])
+        state = parent
+
+    node = Node(problem, problem.initial)
+    for action in actions:
+        node = node.child_node(action)
+    solution_path = node.path()
+    if verbose:
+        print_solution(solution_path)
+    return solution_path, nodes_explored
+
+
+class _SearchSide(object):
+    """One direction of a bidirectional search
+
+    reached maps each state seen to (g, parent state, action from parent),
+    the frontier holds (f, g, state) entries with the lowest f first.
+    """
+
+    def __init__(self, roots, targets, heuristic):
+        self.h = heuristic(targets) if heuristic else lambda state: 0
+        self.reached = dict()
+        self.frontier = BucketQueue(f=lambda entry: entry[0])
+        self.open_g = dict()  # g --> number of frontier entries
+        self.low_g = 0
+        for root in roots:
+            self.add(root, 0, None, None)
+
+    def add(self, state, g, parent, action):
+        """Record state if it is new or reached with a lower g"""
+        previous = self.reached.get(state)
+        if previous is not None and previous[0] <= g:
+            return False
+        self.reached[state] = (g, parent, action)
+        self.frontier.append((g + self.h(state), g, state))
+        self.open_g[g] = self.open_g.get(g, 0) + 1
+        self.low_g = min(self.low_g, g)
+        return True
+
+    def pop(self):
+        """(g, state) of the frontier entry with the lowest f, state is
+        None if the entry is stale"""
+        (_, g, state) = self.frontier.pop()
+        self.open_g[g] -= 1
+        if self.reached[state][0] < g:
+            state = None
+        return (g, state)
+
+    def lowest_f(self):
+        return self.frontier.lowest() if self.frontier else math.inf
+
+    def lowest_g(self):
+        while not self.open_g.get(self.low_g):
+            self.low_g += 1
+        return self.low_g
+
+    def actions_to(self, state):
+        """Actions from a root to state"""
+        actions = []
+        while self.reached[state][1] is not None:
+            (_, state, action) = self.reached[state]
+            actions.append(action)
+        actions.reverse()
+        return actions
 
 
 def print_solution(path: tuple):
+    if isinstance(path[0].state, TileBoard):
+        # Boards are rendered from the packed states, see solution.Solution
+        print(Solution.from_path(path).render(initial=path[0]))
+        return
+
     print("Solution in %d moves" % (len(path) - 1))
     print("Initial State")
     print(path[0])
@@ -0,0 +1,166 @@
+"""
+searchstats - Statistics and tracing for the problemsearch searches
+
+Searches fill in a SearchStats passed as their stats argument.  Counting
+is nearly free, so counters are always kept.  Timing h, result and the
+frontier operations requires wrapping the problem and the frontier, which
+only happens for SearchStats(timing=True), so searches without timing run
+the same code as before.
+
+A SearchTracer samples the progress of graph_search every so many
+expansions into a ring buffer and/or a JSON lines file, instead of
+printing every node as debug does.
+
+@author: Tom Paulus
+@author: William Fox
+"""
+
+import collections
+import json
+import time
+
+
+class SearchStats(object):
+    """SearchStats - Counters and timers of a search
+
+    generated - nodes created by expanding nodes
+    expanded - nodes expanded (nodes_explored of the searches)
+    duplicates - generated or popped nodes discarded as their state was
+        already reached
+    max_frontier - largest number of nodes on the frontier
+    explored - states in the explored set when the search ended
+    explored_bytes - memory used by the explored set, if known
+    elapsed_ns - duration of the search
+    h_ns, result_ns, queue_ns - time spent in problem.h, problem.result
+        and frontier operations, only measured if timing is True
+    """
+
+    COUNTERS = ("generated", "expanded", "duplicates", "max_frontier",
+                "explored", "explored_bytes", "elapsed_ns")
+    TIMERS = ("h_ns", "result_ns", "queue_ns")
+
+    def __init__(self, timing=False):
+        self.timing = timing
+        for name in self.COUNTERS + self.TIMERS:
+            setattr(self, name, 0)
+
+    def as_dict(self):
+        """as_dict() - Counters, and timers when timing, by name"""
+        names = self.COUNTERS + (self.TIMERS if self.timing else ())
+        return {name: getattr(self, name) for name in names}
+
+    def report(self):
+        """report() - Multi-line summary of the statistics"""
+        lines = ["%d expanded, %d generated, %d duplicates" % (
+                     self.expanded, self.generated, self.duplicates),
+                 "Peak frontier %d, explored %d (%d bytes)" % (
+                     self.max_frontier, self.explored, self.explored_bytes),
+                 "Elapsed %.3f s" % (self.elapsed_ns / 1e9)]
+        if self.timing:
+            lines.append("h %.3f s, result %.3f s, queue %.3f s" % (
+                self.h_ns / 1e9, self.result_ns / 1e9, self.queue_ns / 1e9))
+        return "\n".join(lines)
+
+    def __repr__(self):
+        return "SearchStats(%s)" % ", ".join(
+            ["%s=%s" % item for item in self.as_dict().items()])
+
+
+class TimedProblem(object):
+    """TimedProblem - Problem wrapper adding the time spent in h and result
+    to a SearchStats, everything else is passed through"""
+
+    def __init__(self, problem, stats):
+        self.problem = problem
+        self.stats = stats
+
+    def __getattr__(self, name):
+        return getattr(self.problem, name)
+
+    def h(self, state):
+        start = time.perf_counter_ns()
+        value = self.problem.h(state)
+        self.stats.h_ns += time.perf_counter_ns() - start
+        return value
+
+    def result(self, state, action):
+        start = time.perf_counter_ns()
+        value = self.problem.result(state, action)
+        self.stats.result_ns += time.perf_counter_ns() - start
+        return value
+
+
+class TimedQueue(object):
+    """TimedQueue - Frontier wrapper adding the time spent in append and
+    pop to a SearchStats"""
+
+    def __init__(self, queue, stats):
+        self.queue = queue
+        self.stats = stats
+
+    def __getattr__(self, name):
+        return getattr(self.queue, name)
+
+    def __len__(self):
+        return len(self.queue)
+
+    def __contains__(self, item):
+        return item in self.queue
+
+    def __getitem__(self, key):
+        return self.queue[key]
+
+    def append(self, item):
+        start = time.perf_counter_ns()
+        self.queue.append(item)
+        self.stats.queue_ns += time.perf_counter_ns() - start
+
+    def pop(self):
+        start = time.perf_counter_ns()
+        item = self.queue.pop()
+        self.stats.queue_ns += time.perf_counter_ns() - start
+        return item
+
+
+class SearchTracer(object):
+    """SearchTracer(every, capacity, path) - Samples of a search's progress
+
+    graph_search records a sample every `every` expansions, and one when
+    it ends.  The last capacity samples are kept in samples, a ring
+    buffer.  If path is given, every sample is also written to it as a
+    line of JSON.  Use close() or a with statement to close the file.
+    """
+
+    def __init__(self, every=1000, capacity=1024, path=None):
+        self.every = every
+        self.samples = collections.deque(maxlen=capacity)
+        self.path = path
+        self.handle = None
+        self.start = time.perf_counter_ns()
+
+    def record(self, event, **fields):
+        """record(event, fields) - Record a sample of an event"""
+        sample = dict(event=event,
+                      time_ns=time.perf_counter_ns() - self.start, **fields)
+        self.samples.append(sample)
+        if self.path is not None:
+            if self.handle is None:
+                self.handle = open(self.path, "a")
+            self.handle.write(json.dumps(sample) + "\n")
+
+    def sample(self, node, expanded, frontier):
+        """sample(node, expanded, frontier) - Record the node being
+        expanded and the search's progress"""
+        self.record("expand", expanded=expanded, frontier=frontier,
+                    depth=node.depth, g=node.g, h=node.h, f=node.f)
+
+    def close(self):
+        if self.handle is not None:
+            self.handle.close()
+            self.handle = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
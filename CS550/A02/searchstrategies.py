@@ -33,13 +33,21 @@ Manhattan - city block heuristic search.  To restrict the complexity of
     When multiple solutions are allowed, the heuristic becomes a little more
     complex as the city block distance must be estimated to each possible solution
     state.
+LinearConflict - Manhattan distance of the tiles plus two moves for each
+    tile that must leave its goal row or column to let others pass.
+WalkingDistance - walking distance heuristic for boards up to 4x4.
+PatternDatabase - additive disjoint pattern database heuristic search, see
+    patterndb for building the databases.
 
 @author: Tom Paulus
 @author: William Fox
 """
 
 # For each of the following classes, create classmethods g and h
-# with the following signatures
+# with the following signatures.  step_cost is the cost g adds for each
+# move, searches that do not build search nodes (problemsearch.ida_search)
+# use it in place of g.  frontier names the problemsearch.FRONTIERS queue
+# graph_search uses for the strategy.
 #       @classmethod
 #       def g(cls, parentnode, action, childnode):
 #               return appropriate g value
@@ -48,17 +56,22 @@ Manhattan - city block heuristic search.  To restrict the complexity of
 #               return appropriate h value
 from basicsearch_lib02.searchrep import Node
 from basicsearch_lib02.tileboard import TileBoard
+from heuristics import (LinearConflictTable, ManhattanTable,
+                        WalkingDistanceTable)
+from patterndb import AdditivePatternDatabase
 
 
 class BreadthFirst:
     """BredthFirst - breadthfirst search"""
 
     k = 0
+    step_cost = 1
+    frontier = "fifo"
 
     @classmethod
     def g(cls, parentnode: Node, action, childnode: Node):
-        # Return Depth
-        return len(childnode.path())
+        # Number of nodes on the path from the root, without building it
+        return childnode.depth + 1
 
     @classmethod
     def h(cls, state):
@@ -69,6 +82,9 @@ class BreadthFirst:
 class DepthFirst:
     """"DepthFirst - depth first search"""
 
+    step_cost = -1
+    frontier = "stack"
+
     @classmethod
     def g(cls, parentnode: Node, action, childnode: Node):
         return (parentnode.depth + 1) * -1
@@ -81,33 +97,79 @@ class DepthFirst:
 class Manhattan:
     """"Manhattan Block Distance heuristic"""
 
+    step_cost = 2
+    frontier = "bucket"
+
     @classmethod
     def g(cls, parentnode, action, childnode: Node):
         return childnode.depth * 2
 
     @classmethod
     def h(cls, state: TileBoard):
-        manhattan_sum = 0
-
-        # Populates Solved State
-        solved = [[None for c in range(state.cols)] for r in range(state.rows)]
-        index = 1
-        for row in range(state.boardsize):
-            for col in range(state.boardsize):
-                if row == state.rows // 2 and col == state.cols // 2:
-                    solved[row][col] = None
-                else:
-                    solved[row][col] = index
-                    index += 1
-
-        # Calculate Displacements
-        for row in range(state.boardsize):
-            for col in range(state.boardsize):
-                item = state.get(row, col)
-                # Find location for solved state
-                for solved_row in range(len(solved)):
-                    if item in solved[solved_row]:
-                        # Adds manhattan distance to manhattan_sum
-                        # If item is at [1, 2] in state and [0, 0] in solved then distance is 1 + 2 = 3
-                        manhattan_sum += abs(solved_row - row) + abs(solved[solved_row].index(item) - col)
-        return manhattan_sum
+        # Distances to the goal cell of each tile are precomputed once per
+        # board size and goal layout.  Children are evaluated from the
+        # value of their parent and the single tile that moved.
+        # As in our original implementation, the empty cell is counted.
+        return ManhattanTable.for_board(state, blank=True).h(state)
+
+
+class LinearConflict:
+    """"LinearConflict - Manhattan distance with linear conflicts
+
+    Unlike Manhattan, the empty cell is not counted so each move costs 1.
+    Requires a single goal.
+    """
+
+    step_cost = 1
+    frontier = "bucket"
+
+    @classmethod
+    def g(cls, parentnode, action, childnode: Node):
+        return childnode.depth
+
+    @classmethod
+    def h(cls, state: TileBoard):
+        return LinearConflictTable.for_board(state).h(state)
+
+
+class WalkingDistance:
+    """"WalkingDistance - Walking distance heuristic
+
+    Requires a single goal and a board of at most 4x4.
+    """
+
+    step_cost = 1
+    frontier = "bucket"
+
+    @classmethod
+    def g(cls, parentnode, action, childnode: Node):
+        return childnode.depth
+
+    @classmethod
+    def h(cls, state: TileBoard):
+        return WalkingDistanceTable.for_board(state).h(state)
+
+
+class PatternDatabase:
+    """"PatternDatabase - Additive disjoint pattern database heuristic
+
+    Tables are loaded from directory, using the default partition of
+    patterndb.PARTITIONS for the board size unless partition is set.
+    Missing tables are only built on demand if build_missing is True,
+    large ones should be built ahead of time with patterndb.py.
+    """
+
+    directory = "pdb"
+    partition = None
+    build_missing = False
+    step_cost = 1
+    frontier = "bucket"
+
+    @classmethod
+    def g(cls, parentnode, action, childnode: Node):
+        return childnode.depth
+
+    @classmethod
+    def h(cls, state: TileBoard):
+        return AdditivePatternDatabase.for_board(
+            state, cls.directory, cls.partition, cls.build_missing).h(state)
@@ -0,0 +1,165 @@
+"""
+solution - Compact n-puzzle solutions that can be verified and replayed
+
+A Solution is the packed initial board (see TileLayout) and a string of
+moves, one letter per move naming the direction the empty cell moves:
+U(p), D(own), L(eft) and R(ight).  Solutions are cheap to keep for large
+batches of results and convert to and from text, e.g. "8:6a3b1c5f:LURDD".
+
+verify() replays the moves on the packed integer without building boards.
+Boards are only created when they are rendered or asked for, so
+displaying a few steps of a long solution does not cost the whole path.
+
+@author: Tom Paulus
+@author: William Fox
+"""
+
+import math
+
+from basicsearch_lib02.tileboard import (TileBoard, TileLayout)
+
+# [delta_row, delta_col] offsets of the empty cell for each move letter
+MOVES = {"U": (-1, 0), "D": (1, 0), "L": (0, -1), "R": (0, 1)}
+LETTERS = {offset: letter for (letter, offset) in MOVES.items()}
+
+TARGETS = dict()  # move_targets() tables by board size
+
+
+def move_targets(layout):
+    """move_targets(layout) - For each cell of the empty cell, a dict of the
+    cell it moves to by move letter"""
+    try:
+        return TARGETS[layout.boardsize]
+    except KeyError:
+        table = TARGETS[layout.boardsize] = [
+            {LETTERS[tuple(offset)]: target for (offset, target) in moves}
+            for moves in layout.actions]
+        return table
+
+
+class Solution(object):
+    """Solution - Initial board and moves of an n-puzzle solution"""
+
+    __slots__ = ("n", "initial", "moves")
+
+    def __init__(self, n, initial, moves):
+        """Solution(n, initial, moves) - Solution of an n puzzle from the
+        packed initial board by a string of U/D/L/R moves"""
+        self.n = n
+        self.initial = initial
+        self.moves = moves
+
+    @classmethod
+    def from_path(cls, path):
+        """from_path(path) - Solution of a list of search nodes from the
+        initial state to the goal, as returned by problemsearch searches"""
+        board = path[0].state
+        moves = "".join([LETTERS[tuple(node.action)] for node in path[1:]])
+        return cls(board.layout.cells - 1, board.packed, moves)
+
+    @classmethod
+    def decode(cls, text):
+        """decode(text) - Solution from the text produced by encode()"""
+        (n, initial, moves) = text.split(":")
+        return cls(int(n), int(initial, 16), moves)
+
+    def encode(self):
+        """encode() - Text form n:packed initial board in hex:moves"""
+        return "%d:%x:%s" % (self.n, self.initial, self.moves)
+
+    __str__ = encode
+
+    def __repr__(self):
+        return "Solution(%d, %#x, %r)" % (self.n, self.initial, self.moves)
+
+    def __eq__(self, other):
+        return isinstance(other, Solution) and \
+            (self.n, self.initial, self.moves) == \
+            (other.n, other.initial, other.moves)
+
+    def __hash__(self):
+        return hash((self.n, self.initial, self.moves))
+
+    def __len__(self):
+        """Number of moves"""
+        return len(self.moves)
+
+    @property
+    def layout(self):
+        return TileLayout.get(math.isqrt(self.n + 1))
+
+    def actions(self):
+        """actions() - Moves as [delta_row, delta_col] offsets"""
+        return [list(MOVES[letter]) for letter in self.moves]
+
+    def replay(self, steps=None):
+        """replay(steps) - Packed board after the first steps moves (all of
+        them if steps is None).  Raises ValueError if the initial board or a
+        move is not valid."""
+        layout = self.layout
+        tiles = layout.unpack(self.initial)
+        if sorted(tiles) != list(range(layout.cells)):
+            raise ValueError("Initial board %#x is not an %d puzzle" % (
+                self.initial, self.n))
+
+        targets = move_targets(layout)
+        (shifts, mask) = (layout.shifts, layout.mask)
+        packed = self.initial
+        blank = tiles.index(0)
+        for (i, letter) in enumerate(self.moves[:steps]):
+            try:
+                target = targets[blank][letter]
+            except KeyError:
+                raise ValueError("Move %d (%s) is not possible" % (i + 1, letter))
+            # The empty cell packs as 0, see TileBoard.move
+            tile = (packed >> shifts[target]) & mask
+            packed ^= (tile << shifts[target]) ^ (tile << shifts[blank])
+            blank = target
+        return packed
+
+    def verify(self, multiple_solutions=False):
+        """verify(multiple_solutions) - Are the moves legal and do they end
+        in the goal?  With multiple_solutions, the empty cell of the goal
+        may be anywhere."""
+        try:
+            packed = self.replay()
+        except ValueError:
+            return False
+        if multiple_solutions:
+            return packed in self.layout.goals
+        return packed == self.layout.goal
+
+    def board(self, step=0, multiple_solutions=False):
+        """board(step, multiple_solutions) - TileBoard after step moves"""
+        return TileBoard.from_packed(self.n, self.replay(step),
+                                     multiple_solutions)
+
+    def boards(self, multiple_solutions=False):
+        """boards(multiple_solutions) - Generate the TileBoard of every step,
+        starting with the initial board"""
+        board = self.board(0, multiple_solutions)
+        yield board
+        for letter in self.moves:
+            board = board.move(MOVES[letter])
+            yield board
+
+    def render(self, steps=None, initial=None):
+        """render(steps, initial) - Text of the initial board and of the
+        boards after each of the given step numbers (every move if None),
+        in the format of problemsearch.print_solution.  initial is shown in
+        place of the initial board if given."""
+        lines = ["Solution in %d moves" % len(self.moves),
+                 "Initial State",
+                 str(self.board(0) if initial is None else initial)]
+        if steps is None:
+            boards = self.boards()
+            next(boards)  # initial board
+            steps = range(1, len(self.moves) + 1)
+        else:
+            boards = (self.board(step) for step in steps)
+        for (step, board) in zip(steps, boards):
+            lines.append("Move %d - %s" % (
+                step, list(MOVES[self.moves[step - 1]])))
+            lines.append(str(board))
+            lines.append("")
+        return "\n".join(lines)
@@ -1,7 +1,32 @@
+import collections
+import copy
+import itertools
+import json
+import os
+import pickle
+import random
+import shutil
+import tempfile
 import unittest
 
-from basicsearch_lib02.queues import PriorityQueue
-from explored import Explored
+from basicsearch_lib02.queues import (BeamQueue, BucketQueue, FIFOQueue,
+                                      PriorityQueue)
+from basicsearch_lib02.searchrep import Node
+from basicsearch_lib02.tileboard import (TileBoard, inversions, random_boards,
+                                         random_walks)
+from benchmark import (FIELDS, solve, trial_boards)
+from corpus import (read_corpus, write_corpus)
+from explored import (Explored, PackedExplored, PermutationExplored,
+                      explored_set, lehmer_rank)
+from heuristics import (LinearConflictTable, ManhattanTable,
+                        WalkingDistanceTable, manhattan_to)
+from npuzzle import NPuzzle
+from patterndb import (AdditivePatternDatabase, PatternTable, build_all)
+from problemsearch import (bidirectional_search, graph_search, ida_search)
+from searchstats import (SearchStats, SearchTracer)
+from searchstrategies import (BreadthFirst, LinearConflict, Manhattan,
+                              WalkingDistance)
+from solution import Solution
 
 
 class TestExplored(unittest.TestCase):
@@ -19,6 +44,26 @@ class TestExplored(unittest.TestCase):
         example_state = 'the quick brown fox jumps over the lazy dog'
         self.assertFalse(self.explored.exists(example_state))
 
+    def test_lehmer_rank(self):
+        ranks = [lehmer_rank(p) for p in itertools.permutations(range(5))]
+        self.assertEqual(ranks, list(range(120)))
+
+    def test_packed_boards(self):
+        random.seed(550)
+        for (n, kind) in ((8, PermutationExplored), (15, PackedExplored)):
+            boards = [TileBoard(n) for _ in range(3000)]
+            explored = explored_set(boards[0])
+            self.assertIsInstance(explored, kind)
+            for board in boards[:2000]:
+                explored.add(board)
+            for board in boards[:2000]:
+                self.assertIn(board, explored)
+            for board in boards[2000:]:
+                self.assertEqual(board in explored, board in boards[:2000])
+            self.assertEqual(len(explored), len(set(boards[:2000])))
+            self.assertLess(explored.memory_usage(), 100000)
+        self.assertIsInstance(explored_set(TileBoard(24)), Explored)
+
 
 class TestPriorityQueue(unittest.TestCase):
     # noinspection PyPep8Naming
@@ -35,6 +80,42 @@ class TestPriorityQueue(unittest.TestCase):
         self.assertEqual(self.pq.pop().value, 2)
         self.assertEqual(self.pq.pop().value, 3)
 
+    def test_decrease_key(self):
+        priorities = {'a': 5, 'b': 3, 'c': 4}
+        pq = PriorityQueue(f=lambda x: priorities[x])
+        pq.extend(['a', 'b', 'c'])
+
+        priorities['a'] = 1
+        pq.append('a')  # better priority replaces the queued entry
+        priorities['c'] = 9
+        pq.append('c')  # worse priority is ignored
+
+        self.assertEqual(len(pq), 3)
+        self.assertEqual([pq.pop(), pq.pop(), pq.pop()], ['a', 'b', 'c'])
+        self.assertEqual(len(pq), 0)
+
+    def test_membership(self):
+        pq = PriorityQueue(order=max)
+        pq.extend([3, 1, 2])
+        self.assertIn(2, pq)
+        self.assertEqual(pq[2], 2)
+
+        del pq[3]
+        self.assertNotIn(3, pq)
+        self.assertEqual(pq.pop(), 2)
+        self.assertEqual(pq.pop(), 1)
+        self.assertRaises(IndexError, pq.pop)
+
+    def test_ties(self):
+        # Equal priorities pop in insertion order, not by comparing items
+        pq = PriorityQueue(f=lambda x: x[0])
+        pq.extend([(1, 'c'), (0, 'z'), (1, 'a'), (1, 'b')])
+        self.assertEqual([pq.pop()[1] for _ in range(4)], ['z', 'c', 'a', 'b'])
+
+        pq = PriorityQueue(order=max, f=lambda x: x[0])
+        pq.extend([(1, 'c'), (2, 'z'), (1, 'a'), (1, 'b')])
+        self.assertEqual([pq.pop()[1] for _ in range(4)], ['z', 'c', 'a', 'b'])
+
     class SampleObj(object):
         def __init__(self, value, priority):
             self.value = value
@@ -44,5 +125,535 @@ class TestPriorityQueue(unittest.TestCase):
             return self.priority < other.priority
 
 
+class TestFrontiers(unittest.TestCase):
+    def test_bucket(self):
+        queue = BucketQueue(f=len)
+        queue.extend(['ccc', 'a', 'bb', 'b', 'dddd'])
+        self.assertEqual(len(queue), 5)
+        self.assertIn('bb', queue)
+        # Lowest priority first, first in first out among equals
+        self.assertEqual([queue.pop() for _ in range(3)], ['a', 'b', 'bb'])
+        queue.append('')
+        self.assertEqual([queue.pop() for _ in range(3)], ['', 'ccc', 'dddd'])
+        self.assertRaises(IndexError, queue.pop)
+
+        # Priorities that are not integers
+        queue = BucketQueue(f=lambda x: x / 2)
+        queue.extend([4, 3, 1])
+        self.assertEqual(queue.lowest(), 0.5)
+        self.assertEqual(queue.pop(), 1)
+        self.assertIn(3, queue)
+        self.assertEqual([queue.pop() for _ in range(2)], [3, 4])
+        self.assertNotIn(3, queue)
+
+    def test_decrease_key(self):
+        priorities = {'a': 5, 'b': 3, 'c': 4}
+        for queue in (BucketQueue(f=lambda x: priorities[x]),
+                      BeamQueue(5, f=lambda x: priorities[x])):
+            priorities.update(a=5, c=4)
+            queue.extend(['a', 'b', 'c'])
+            priorities['a'] = 1
+            queue.append('a')  # better priority replaces the queued entry
+            priorities['c'] = 9
+            queue.append('c')  # worse priority is ignored
+            self.assertEqual(len(queue), 3)
+            self.assertEqual(queue['a'], 'a')
+            self.assertEqual([queue.pop() for _ in range(3)],
+                             ['a', 'b', 'c'])
+            self.assertEqual(len(queue), 0)
+
+    def test_beam(self):
+        queue = BeamQueue(2)
+        queue.extend([5, 1, 4, 2])
+        self.assertEqual(len(queue), 2)
+        self.assertNotIn(4, queue)
+        self.assertEqual([queue.pop(), queue.pop()], [1, 2])
+
+    def test_strategy_frontier(self):
+        layout = [4, 1, 2, None, 5, 3, 6, 7, 8]
+        for frontier in ("fifo", "priority", "bucket"):
+            puzzle = NPuzzle(8, g=Manhattan.g, h=Manhattan.h,
+                             force_state=layout)
+            path, _ = graph_search(puzzle, frontier=frontier)
+            self.assertEqual(len(path), 6)
+        # The strategy's frontier is used unless one is given
+        _, explored = graph_search(NPuzzle(8, g=BreadthFirst.g,
+                                           h=BreadthFirst.h,
+                                           force_state=layout))
+        _, fifo_explored = graph_search(NPuzzle(8, g=Manhattan.g,
+                                                h=Manhattan.h,
+                                                force_state=layout),
+                                        frontier="fifo")
+        self.assertEqual(explored, fifo_explored)
+
+    def test_ordered(self):
+        class FIFOWithF(FIFOQueue):
+            f = Node.get_f  # an f does not make a queue ordered
+
+        self.assertFalse(FIFOWithF.ordered)
+        layout = [4, 1, 2, None, 5, 3, 6, 7, 8]
+        results = [graph_search(NPuzzle(8, g=Manhattan.g, h=Manhattan.h,
+                                         force_state=layout),
+                                frontier=frontier)
+                   for frontier in ("fifo", FIFOWithF())]
+        self.assertEqual(results[0], results[1])
+
+        # Cheaper paths to queued states replace them, plans stay optimal
+        for board in random_boards(8, 2, seed=0):
+            layout = board.state_tuple()
+            (expected, _) = bidirectional_search(
+                NPuzzle(8, g=BreadthFirst.g, h=BreadthFirst.h,
+                        force_state=layout))
+            for frontier in ("priority", "bucket"):
+                puzzle = NPuzzle(8, g=LinearConflict.g, h=LinearConflict.h,
+                                 force_state=layout)
+                stats = SearchStats(timing=True)
+                (path, _) = graph_search(puzzle, frontier=frontier,
+                                         stats=stats)
+                self.assertEqual(len(path), len(expected))
+
+
+class TestTileBoard(unittest.TestCase):
+    def test_move(self):
+        board = TileBoard(8, force_state=[1, None, 3, 4, 2, 5, 6, 7, 8])
+        self.assertEqual(board.empty, (0, 1))
+        self.assertEqual(board.get_actions(), [[1, 0], [0, -1], [0, 1]])
+
+        moved = board.move([1, 0])
+        self.assertEqual(moved.state_tuple(), (1, 2, 3, 4, None, 5, 6, 7, 8))
+        self.assertEqual(moved.get(0, 1), 2)
+        self.assertIsNone(moved.get(1, 1))
+        self.assertTrue(moved.solved())
+        # Original board is not modified
+        self.assertEqual(board.state_tuple(), (1, None, 3, 4, 2, 5, 6, 7, 8))
+        self.assertFalse(board.solved())
+        self.assertRaises(ValueError, board.move, [-1, 0])
+
+    def test_equality(self):
+        board = TileBoard(8, force_state=[1, 2, 3, 4, None, 5, 6, 7, 8])
+        there_and_back = board.move([0, 1]).move([0, -1])
+        self.assertEqual(board, there_and_back)
+        self.assertEqual(hash(board), hash(there_and_back))
+        self.assertNotEqual(board, board.move([0, 1]))
+
+    def test_solved(self):
+        # The empty cell of an even board is solved in the last position
+        board = TileBoard(15, force_state=list(range(1, 16)) + [None])
+        self.assertTrue(board.solved())
+        # Multiple solutions let the empty cell be anywhere
+        board = TileBoard(8, multiple_solutions=True,
+                          force_state=[None, 1, 2, 3, 4, 5, 6, 7, 8])
+        self.assertTrue(board.solved())
+        self.assertFalse(board.move([0, 1]).move([1, 0]).solved())
+
+    def test_generated(self):
+        board = TileBoard(24)
+        self.assertEqual(sorted(board.state_tuple(), key=lambda t: t or 0),
+                         [None] + list(range(1, 25)))
+
+    def test_slots(self):
+        board = TileBoard(8, force_state=[1, 2, 3, 4, None, 5, 6, 7, 8])
+        child = board.move([0, 1])
+        self.assertFalse(hasattr(child, "__dict__"))
+        self.assertEqual((child.rows, child.cols), (3, 3))
+        self.assertEqual(copy.copy(child), child)
+        self.assertEqual(pickle.loads(pickle.dumps(child)), child)
+
+
+class TestGenerator(unittest.TestCase):
+    def test_inversions(self):
+        rng = random.Random(550)
+        for _ in range(100):
+            tiles = list(range(1, 16)) + [None]
+            rng.shuffle(tiles)
+            order = [tile for tile in tiles if tile]
+            expected = sum([1 for i in range(len(order))
+                            for j in range(i + 1, len(order))
+                            if order[j] < order[i]])
+            self.assertEqual(inversions(tiles), expected)
+
+    def test_random_boards(self):
+        for n in (8, 15, 24):
+            boards = list(random_boards(n, 50, seed=n))
+            self.assertEqual(boards, list(random_boards(n, 50, seed=n)))
+            self.assertEqual(len(set(boards)), 50)
+            goal = boards[0].goal_boards()[0]
+            self.assertTrue(all(board.parity() == goal.parity()
+                                for board in boards))
+
+    def test_random_walks(self):
+        walks = list(random_walks(8, 6, 20, seed=1))
+        self.assertEqual(walks, list(random_walks(8, 6, 20, seed=1)))
+        for board in walks:
+            puzzle = NPuzzle(8, g=BreadthFirst.g, h=BreadthFirst.h,
+                             force_state=board.state_tuple())
+            (path, _) = bidirectional_search(puzzle)
+            self.assertLessEqual(len(path) - 1, 6)
+            self.assertEqual((len(path) - 1) % 2, 0)
+
+    def test_corpus(self):
+        directory = tempfile.mkdtemp()
+        try:
+            for n in (8, 24):
+                path = os.path.join(directory, "boards-%d.bin" % n)
+                boards = list(random_boards(n, 5000, seed=1))
+                self.assertEqual(write_corpus(path, n, boards), 5000)
+                self.assertEqual(list(read_corpus(path)), boards)
+        finally:
+            shutil.rmtree(directory)
+
+
+class TestSolution(unittest.TestCase):
+    def setUp(self):
+        board = next(random_boards(8, seed=12))
+        puzzle = NPuzzle(8, g=BreadthFirst.g, h=BreadthFirst.h,
+                         force_state=board.state_tuple())
+        (self.path, _) = bidirectional_search(puzzle)
+        self.solution = Solution.from_path(self.path)
+
+    def test_encode(self):
+        solution = self.solution
+        self.assertEqual(len(solution), len(self.path) - 1)
+        self.assertEqual(Solution.decode(solution.encode()), solution)
+        self.assertEqual(solution.actions(),
+                         [node.action for node in self.path[1:]])
+
+    def test_verify(self):
+        solution = self.solution
+        self.assertTrue(solution.verify())
+        moves = solution.moves
+        # Stopping short, illegal moves and bad letters are rejected
+        self.assertFalse(Solution(8, solution.initial, moves[:-1]).verify())
+        self.assertFalse(Solution(8, solution.initial, moves + "UUUU").verify())
+        self.assertFalse(Solution(8, solution.initial, moves + "X").verify())
+        self.assertFalse(Solution(8, 0, moves).verify())
+        # The empty cell may end anywhere with multiple solutions
+        self.assertTrue(Solution(8, solution.initial, moves + "L").verify(
+            multiple_solutions=True))
+
+    def test_render(self):
+        solution = self.solution
+        boards = list(solution.boards())
+        self.assertEqual(boards, [node.state for node in self.path])
+        self.assertEqual(solution.board(3), self.path[3].state)
+        text = solution.render(steps=[2])
+        self.assertIn(str(self.path[2].state), text)
+        self.assertNotIn(str(self.path[1].state), text)
+        self.assertEqual(solution.render().count("Move "), len(solution))
+
+
+class TestNode(unittest.TestCase):
+    def test_breadth_first_g(self):
+        puzzle = NPuzzle(8, g=BreadthFirst.g, h=BreadthFirst.h)
+        node = Node(puzzle, puzzle.initial)
+        for _ in range(5):
+            node = node.expand(puzzle)[0]
+            self.assertEqual(node.g, len(node.path()))
+        self.assertFalse(hasattr(node, "__dict__"))
+        self.assertEqual(len(node.solution()), 5)
+
+
+class TestIDAStar(unittest.TestCase):
+    def test_slide(self):
+        board = TileBoard(8, force_state=[1, 2, 3, 4, None, 5, 6, 7, 8])
+        back = board.slide([0, 1])
+        self.assertEqual(board, TileBoard(
+            8, force_state=[1, 2, 3, 4, 5, None, 6, 7, 8]))
+        board.slide(back)
+        self.assertTrue(board.solved())
+
+    def test_search(self):
+        layout = [5, 3, 7, None, 1, 2, 4, 6, 8]
+        expected, _ = graph_search(NPuzzle(8, g=BreadthFirst.g, h=BreadthFirst.h,
+                                           force_state=layout))
+        puzzle = NPuzzle(8, g=Manhattan.g, h=Manhattan.h, force_state=layout)
+        iterations = []
+        path, nodes_explored = ida_search(puzzle, iterations=iterations)
+
+        self.assertEqual(len(path), len(expected))
+        self.assertTrue(path[-1].state.solved())
+        self.assertEqual(path[0].state, puzzle.initial)
+        self.assertEqual(sum(n for (_, n) in iterations), nodes_explored)
+        # Bounds only grow
+        bounds = [bound for (bound, _) in iterations]
+        self.assertEqual(bounds, sorted(bounds))
+
+
+class TestBidirectional(unittest.TestCase):
+    def test_search(self):
+        random.seed(560)
+        for _ in range(3):
+            layout = TileBoard(8).state_tuple()
+            expected, explored = graph_search(
+                NPuzzle(8, g=BreadthFirst.g, h=BreadthFirst.h,
+                        force_state=layout))
+            for heuristic in (None, manhattan_to):
+                puzzle = NPuzzle(8, g=BreadthFirst.g, h=BreadthFirst.h,
+                                 force_state=layout)
+                path, nodes_explored = bidirectional_search(
+                    puzzle, heuristic=heuristic)
+                self.assertEqual(len(path), len(expected))
+                self.assertTrue(path[-1].state.solved())
+                self.assertLess(nodes_explored, explored)
+
+    def test_goals(self):
+        board = TileBoard(8, force_state=[1, 2, 3, 4, None, 5, 6, 7, 8])
+        self.assertEqual(board.goal_boards(), [board])
+        # Sliding the empty cell along a row of an odd width board keeps
+        # the parity, every placement of it is a reachable goal
+        board.multiple_solutions = True
+        goals = board.goal_boards()
+        self.assertEqual(len(goals), 9)
+        self.assertTrue(all(goal.parity() == board.parity() for goal in goals))
+
+        puzzle = NPuzzle(8, g=BreadthFirst.g, h=BreadthFirst.h,
+                         force_state=board.state_tuple())
+        path, _ = bidirectional_search(puzzle)
+        self.assertEqual(len(path), 1)
+
+
+class TestSearchStats(unittest.TestCase):
+    def setUp(self):
+        self.layout = next(random_boards(8, seed=14)).state_tuple()
+
+    def puzzle(self, strategy):
+        return NPuzzle(8, g=strategy.g, h=strategy.h, force_state=self.layout)
+
+    def test_counters(self):
+        for strategy in (BreadthFirst, Manhattan):
+            stats = SearchStats()
+            (path, nodes_explored) = graph_search(self.puzzle(strategy),
+                                                  stats=stats)
+            self.assertEqual(stats.expanded, nodes_explored)
+            self.assertGreaterEqual(stats.generated, stats.expanded)
+            self.assertGreater(stats.duplicates, 0)
+            self.assertGreaterEqual(stats.explored, stats.expanded)
+            self.assertGreater(stats.elapsed_ns, 0)
+            self.assertEqual(stats.h_ns, 0)
+            self.assertNotIn("h_ns", stats.as_dict())
+
+        for search in (ida_search, bidirectional_search):
+            stats = SearchStats()
+            (_, nodes_explored) = search(self.puzzle(Manhattan), stats=stats)
+            self.assertEqual(stats.expanded, nodes_explored)
+            self.assertGreater(stats.max_frontier, 0)
+
+    def test_timing(self):
+        stats = SearchStats(timing=True)
+        (path, _) = graph_search(self.puzzle(Manhattan), stats=stats)
+        self.assertEqual(len(path), len(graph_search(
+            self.puzzle(Manhattan))[0]))
+        for name in SearchStats.TIMERS:
+            self.assertGreater(getattr(stats, name), 0)
+        self.assertLess(stats.h_ns + stats.result_ns + stats.queue_ns,
+                        stats.elapsed_ns)
+        self.assertIn("queue", stats.report())
+
+    def test_tracer(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, "trace.jsonl")
+            with SearchTracer(every=100, capacity=5, path=path) as tracer:
+                (_, nodes_explored) = graph_search(self.puzzle(BreadthFirst),
+                                                   tracer=tracer)
+            self.assertEqual(len(tracer.samples), 5)
+            self.assertEqual(tracer.samples[-1]["event"], "solved")
+            with open(path) as handle:
+                samples = [json.loads(line) for line in handle]
+            self.assertEqual(len(samples), nodes_explored // 100 + 1)
+            self.assertEqual(samples[0]["expanded"], 100)
+        finally:
+            shutil.rmtree(directory)
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_boards(self):
+        state = random.getstate()
+        self.assertEqual(trial_boards(5, seed=1), trial_boards(5, seed=1))
+        self.assertNotEqual(trial_boards(5, seed=1), trial_boards(5, seed=2))
+        self.assertEqual(random.getstate(), state)
+
+    def test_solve(self):
+        board = trial_boards(1, seed=1)[0]
+        results = [solve(0, method, board)
+                   for method in ("BreadthFirst", "IDA* Manhattan",
+                                  "Bidirectional BreadthFirst")]
+        for result in results:
+            self.assertEqual(sorted(result), sorted(FIELDS))
+            self.assertEqual(result["length_of_plan"],
+                             results[0]["length_of_plan"])
+            self.assertGreater(result["max_frontier"], 0)
+            self.assertGreater(result["elapsed_ns"], 0)
+
+
+class TestManhattan(unittest.TestCase):
+    def test_value(self):
+        board = TileBoard(8, force_state=[1, 2, 3, 4, None, 5, 6, 7, 8])
+        self.assertEqual(Manhattan.h(board), 0)
+        # The empty cell is counted along with the tile
+        self.assertEqual(Manhattan.h(board.move([0, 1])), 2)
+        table = ManhattanTable.for_board(board)
+        self.assertEqual(table.h(board.move([0, 1]).move([1, 0])), 2)
+
+    def test_incremental(self):
+        random.seed(550)
+        for n, multiple in ((8, False), (15, False), (24, True)):
+            board = TileBoard(n, multiple_solutions=multiple)
+            table = ManhattanTable.for_board(board)
+            table.h(board)
+            for _ in range(50):
+                board = board.move(random.choice(board.get_actions()))
+                scratch = TileBoard(n, multiple_solutions=multiple,
+                                    force_state=board.state_tuple())
+                self.assertEqual(table.h(board), table.value(scratch))
+
+
+class TestConflictAndWalkingDistance(unittest.TestCase):
+    def test_values(self):
+        board = TileBoard(8, force_state=[1, 2, 3, 4, None, 5, 6, 7, 8])
+        for table in (LinearConflictTable.for_board(board),
+                      WalkingDistanceTable.for_board(board)):
+            self.assertEqual(table.h(board), 0)
+        # 2 and 1 are swapped in their goal row
+        board = TileBoard(8, force_state=[2, 1, 3, 4, None, 5, 6, 7, 8])
+        self.assertEqual(LinearConflictTable.for_board(board).h(board), 4)
+
+    def test_incremental(self):
+        rng = random.Random(550)
+        for n in (8, 15):
+            for table_class in (LinearConflictTable, WalkingDistanceTable):
+                board = next(random_boards(n, seed=n))
+                table = table_class.for_board(board)
+                manhattan = ManhattanTable.for_board(board)
+                table.h(board)
+                for _ in range(50):
+                    board = board.move(rng.choice(board.get_actions()))
+                    scratch = TileBoard(n, force_state=board.state_tuple())
+                    self.assertEqual(table.h(board), table.h(scratch))
+                    self.assertGreaterEqual(table.h(board), manhattan.h(board))
+
+    def test_optimal(self):
+        for board in random_boards(8, 5, seed=13):
+            layout = board.state_tuple()
+            (expected, _) = bidirectional_search(
+                NPuzzle(8, g=BreadthFirst.g, h=BreadthFirst.h,
+                        force_state=layout))
+            for strategy in (LinearConflict, WalkingDistance):
+                puzzle = NPuzzle(8, g=strategy.g, h=strategy.h,
+                                 force_state=layout)
+                for search in (graph_search, ida_search):
+                    (path, _) = search(puzzle)
+                    self.assertEqual(len(path), len(expected))
+
+    def test_limits(self):
+        board = TileBoard(8, multiple_solutions=True)
+        self.assertRaises(ValueError, LinearConflictTable.for_board, board)
+        self.assertRaises(ValueError, WalkingDistanceTable.for_board, board)
+        self.assertRaises(ValueError, WalkingDistanceTable.for_board,
+                          TileBoard(24))
+
+
+class TestPatternDatabase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        build_all(8, directory=self.directory)
+        self.board = TileBoard(8, force_state=[5, 3, 7, None, 1, 2, 4, 6, 8])
+        self.database = AdditivePatternDatabase.for_board(self.board,
+                                                          self.directory)
+
+    def tearDown(self):
+        AdditivePatternDatabase.databases.clear()
+        shutil.rmtree(self.directory)
+
+    def test_rank(self):
+        table = self.database.patterns[0]
+        self.assertEqual(table.size, 9 * 8 * 7 * 6)
+        for rank in (0, 1, 1000, table.size - 1):
+            self.assertEqual(table.rank(table.unrank(rank)), rank)
+        rng = random.Random(4)
+        for _ in range(200):
+            rank = rng.randrange(table.size)
+            positions = table.unrank(rank)
+            cell = rng.choice([c for c in range(9) if c not in positions])
+            i = rng.randrange(4)
+            moved = list(positions)
+            moved[i] = cell
+            self.assertEqual(table.rerank(rank, positions, i, cell),
+                             table.rank(moved))
+
+    def test_admissible(self):
+        manhattan = ManhattanTable.for_board(self.board)
+        puzzle = NPuzzle(8, g=BreadthFirst.g, h=BreadthFirst.h,
+                         force_state=self.board.state_tuple())
+        path, _ = graph_search(puzzle)
+        # Dominates Manhattan distance, never exceeds the optimal plan
+        for node in path:
+            h = self.database.h(node.state)
+            self.assertGreaterEqual(h, manhattan.h(node.state))
+            self.assertLessEqual(h, len(path) - 1 - node.depth)
+
+    def test_resume(self):
+        built = self.database.patterns[1]
+
+        class Crash(Exception):
+            pass
+
+        class CrashingTable(PatternTable):
+            checkpoints = 0
+
+            def write_checkpoint(self, *state):
+                super().write_checkpoint(*state)
+                self.checkpoints += 1
+                if self.checkpoints == 20:
+                    raise Crash()
+
+        directory = tempfile.mkdtemp()
+        crashing = CrashingTable(self.board.layout, built.pattern, directory)
+        self.assertRaises(Crash, crashing.build, checkpoint_every=0, chunk=7)
+        # The checkpoint was taken inside a layer
+        (_depth, phase, done, _table, _visited, layer, seeds,
+         _following) = crashing.read_checkpoint()
+        self.assertLess(done, seeds if phase == 0 else len(layer))
+        table = PatternTable(self.board.layout, built.pattern, directory)
+        table.build(chunk=7).load()
+        self.assertEqual(table.table[:], built.table[:])
+        self.assertFalse(os.path.exists(table.checkpoint_path))
+        shutil.rmtree(directory)
+
+    def test_fifteen(self):
+        # A small pattern of the 15 puzzle against a plain BFS over
+        # (pattern cells, empty cell) states
+        layout = TileBoard(15).layout
+        table = PatternTable(layout, (1, 2, 3), self.directory)
+        table.build().load()
+        self.assertEqual(table.size, 16 * 15 * 14)
+        goal = layout.unpack(layout.goal)
+        start = (tuple(goal.index(tile) for tile in table.pattern),
+                 layout.goal_blank)
+        # 0-1 BFS, moves of other tiles are free
+        distances = {start: 0}
+        layer = collections.deque([start])
+        while layer:
+            (positions, blank) = state = layer.popleft()
+            for (_, target) in layout.actions[blank]:
+                moved = tuple(blank if cell == target else cell
+                              for cell in positions)
+                cost = distances[state] + (moved != positions)
+                child = (moved, target)
+                if cost < distances.get(child, 255):
+                    distances[child] = cost
+                    if moved == positions:
+                        layer.appendleft(child)
+                    else:
+                        layer.append(child)
+        expected = dict()
+        for ((positions, _), distance) in distances.items():
+            rank = table.rank(positions)
+            expected[rank] = min(expected.get(rank, 255), distance)
+        self.assertEqual(len(expected), table.size)
+        self.assertEqual(list(table.table[:]),
+                         [expected[rank] for rank in range(table.size)])
+
+
 if __name__ == '__main__':
     unittest.main()
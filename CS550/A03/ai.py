@@ -4,56 +4,137 @@ ai - search & strategy module
 implement a concrete Strategy class and AlphaBetaSearch
 """
 import math
+import random
+import time
 import abstractstrategy
 from checkerboard import *
+from endgame import (DIRECTORY as ENDGAME_DIRECTORY, WIN_SCORE,
+                     load as load_endgame)
+from openingbook import (PATH as BOOK_PATH, load as load_book)
+
+# Bound types of transposition table values
+EXACT, LOWER, UPPER = range(3)
+
+# Values beyond are wins or losses in a number of plies (see endgame.score),
+# stored in transposition tables counting the plies from the position
+# rather than from the root
+WON = WIN_SCORE // 2
+
+# Zobrist keys of the player to move, XORed into the board key
+_side_random = random.Random(20150301)
+SIDE_KEYS = [_side_random.getrandbits(64) for _player in CheckerBoard.pawns]
+
+MOVE_BUDGET = 10.0  # default seconds per move of ai.Strategy
+
+# Move ordering heuristics of AlphaBetaSearch, applied in this order:
+#   pv - the move of the principal variation of the previous depth
+#   tt - the best move stored in the transposition table
+#   captures - captures with more jumps first
+#   killers - moves that caused a cutoff at the same depth
+#   history - moves by how often and how deep they caused cutoffs
+ORDERING = ("pv", "tt", "captures", "killers", "history")
+KILLERS = 2  # killer moves kept per depth
+CHECK_NODES = 64  # nodes between checks of the limits and stop
+
+
+class SearchTimeout(Exception):
+    "Raised by AlphaBetaSearch when its deadline passes or it is stopped"
 
 
 class Strategy(abstractstrategy.Strategy):
     __utility_weights = [100, 10, 1]  # Pieces, Kings, Board Position
 
+    def __init__(self, player, game, maxplies, budget=MOVE_BUDGET,
+                 maxnodes=None, endgame=ENDGAME_DIRECTORY, book=BOOK_PATH):
+        """Strategy(player, game, maxplies, budget, maxnodes, endgame, book)
+        Moves are searched by iterative deepening up to maxplies for at
+        most budget seconds and maxnodes nodes (None for no limit).
+        endgame is an endgame.EndgameDatabase or its directory and book an
+        openingbook.OpeningBook or its file, None for none.  The defaults
+        are used if they have been built.  Book moves are played without
+        searching.
+        """
+        super().__init__(player, game, maxplies)
+        self.budget = budget
+        self.maxnodes = maxnodes
+        if isinstance(endgame, str):
+            endgame = load_endgame(endgame)
+        self.endgame = endgame
+        if isinstance(book, str):
+            book = load_book(book)
+        self.book = book
+        # utility() reads the score of each player from tables, indexed
+        # by player index
+        board = CheckerBoard()
+        self.__tables = [self.__score_tables(board, pawn)
+                         for pawn in CheckerBoard.pawns]
+        self.__maxidx = CheckerBoard.playeridx(self.maxplayer)
+        # Kept across moves, positions searched for one move are often
+        # searched again for the next
+        self.table = TranspositionTable()
+        self.search = None  # search of the last move, None for a book move
+
     def play(self, board: CheckerBoard) -> (CheckerBoard, tuple):
-        search = AlphaBetaSearch(self, self.maxplayer, self.minplayer, self.maxplies)
-        action = search.alphabeta(board)
+        if self.book is not None:
+            action = self.book.choose(board, self.maxplayer)
+            if action is not None:
+                self.search = None
+                return board.move(action), action
+        self.search = IterativeDeepeningSearch(
+            self, self.maxplayer, self.minplayer, self.maxplies,
+            budget=self.budget, maxnodes=self.maxnodes, table=self.table,
+            endgame=self.endgame)
+        action = self.search.search(board)
         # Forfeit
         if action is None:
             return board, None
         return board.move(action), action
 
     def utility(self, board: CheckerBoard) -> int:
-        player_pieces = 0
-        player_kings = 0
-        player_pos_sum = 0
-
-        opponent_pieces = 0
-        opponent_kings = 0
-        opponent_pos_sum = 0
-
-        for (_r, _c, piece) in board:
-            # Find player index and piece type
-            (playerId, kingP) = board.identifypiece(piece)
-            if playerId == board.playeridx(self.maxplayer):
-                # This Player
-                player_pieces += 1
-                if kingP:
-                    player_kings += 1
-                player_pos_sum += self.__evaluate_position(board, self.maxplayer, _r, _c)
-
-            else:
-                # Opponent
-                opponent_pieces += 1
-                if kingP:
-                    opponent_kings += 1
-                opponent_pos_sum += self.__evaluate_position(board, self.minplayer, _r, _c)
-
-        player_features = [player_pieces, player_kings, player_pos_sum]
-        player_score = sum(feature * weight for (feature, weight) in zip(player_features, self.__utility_weights))
+        # Scores are sums of per-square values over the pieces of a mask,
+        # see __score_tables
+        kings = board.kingmask
+        score = self.__score(board.redmask, kings, self.__tables[0]) - \
+            self.__score(board.blackmask, kings, self.__tables[1])
+        return score if self.__maxidx == 0 else -score
 
-        opponent_features = [opponent_pieces, opponent_kings, opponent_pos_sum]
-        opponent_score = sum(feature * weight for (feature, weight) in zip(opponent_features, self.__utility_weights))
+    @staticmethod
+    def __score(mask, kings, tables):
+        "__score - Score of the pieces of a player given the player's tables"
+        (pieces, crowned) = tables
+        kings &= mask
+        return pieces[0][mask & 0xff] + pieces[1][mask >> 8 & 0xff] + \
+            pieces[2][mask >> 16 & 0xff] + pieces[3][mask >> 24] + \
+            crowned[0][kings & 0xff] + crowned[1][kings >> 8 & 0xff] + \
+            crowned[2][kings >> 16 & 0xff] + crowned[3][kings >> 24]
 
-        # print("Utility Calculation - R: {}  B: {}".format(player_score, opponent_score))
+    def __score_tables(self, board: CheckerBoard, player):
+        """__score_tables - Tables of the score of player's pieces by byte
+        of the masks of the board (see CheckerBoard.redmask, ...).
+        Returns (pieces, kings), each a list of four tables, one for each
+        byte of a mask, of the score of the pieces on the squares of the
+        byte given by its bits.  A piece scores its utility weight and
+        its position, a king also scores the king weight.
+        """
+        (piece_weight, king_weight, position_weight) = self.__utility_weights
+        values = [piece_weight + position_weight *
+                  self.__evaluate_position(board, player, r, c)
+                  for (r, c) in SQUARES]
+        return (self.__byte_tables(values),
+                self.__byte_tables([king_weight] * len(SQUARES)))
 
-        return player_score - opponent_score
+    @staticmethod
+    def __byte_tables(values):
+        "__byte_tables - Sums of values over the bits of each mask byte"
+        tables = []
+        for first in range(0, len(values), 8):
+            table = [0] * 256
+            for byte in range(1, 256):
+                low = byte & -byte
+                table[byte] = table[byte ^ low] + \
+                    values[first + low.bit_length() - 1]
+            tables.append(table)
+        return tables
 
     @staticmethod
     def __evaluate_position(board: CheckerBoard, player, x, y) -> int:
@@ -63,6 +144,194 @@ class Strategy(abstractstrategy.Strategy):
         return (5 if is_edge else 3) + board.disttoking(player, y)
 
 
+class TranspositionTable:
+    """TranspositionTable - Fixed size table of search results by position
+
+    Positions are identified by the Zobrist key of the board XORed with
+    the key of the player to move (see SIDE_KEYS).  Each entry holds the
+    draft (number of plies searched below the position), the value, its
+    bound type (EXACT, LOWER or UPPER) and the best move found.
+
+    The table has size buckets of two entries.  The first keeps the result
+    with the deepest draft, unless it is left over from an earlier search
+    (see new_search), and the second always takes the latest result that
+    did not go in the first.  size caps the memory used, roughly 200 bytes
+    per entry.
+
+    Draw detection counters are not part of the key, so a position reached
+    with different counters shares the value of the first one searched.
+    """
+
+    def __init__(self, size=1 << 16):
+        self.size = size
+        self.deep = [None] * size  # depth-preferred entries
+        self.recent = [None] * size  # always-replace entries
+        self.generation = 0
+        self.probes = self.hits = self.cutoffs = 0
+        self.stores = self.overwrites = 0
+
+    def new_search(self):
+        "new_search() - Start a search, older deep entries may be replaced"
+        self.generation += 1
+
+    def probe(self, key):
+        """probe(key) - Entry (key, draft, value, bound, move, generation)
+        stored for a key or None"""
+        self.probes += 1
+        index = key % self.size
+        for entry in (self.deep[index], self.recent[index]):
+            if entry is not None and entry[0] == key:
+                self.hits += 1
+                return entry
+        return None
+
+    def store(self, key, draft, value, bound, move):
+        "store(key, draft, value, bound, move) - Record a search result"
+        self.stores += 1
+        index = key % self.size
+        entry = (key, draft, value, bound, move, self.generation)
+        deep = self.deep[index]
+        if deep is None or deep[0] == key or draft >= deep[1] or \
+                deep[5] != self.generation:
+            if deep is not None and deep[0] != key:
+                # Demote the deep entry rather than losing it
+                self.overwrites += self.recent[index] is not None
+                self.recent[index] = deep
+            self.deep[index] = entry
+        else:
+            self.overwrites += self.recent[index] is not None and \
+                self.recent[index][0] != key
+            self.recent[index] = entry
+
+    def clear(self):
+        "clear() - Remove all entries and reset the statistics"
+        self.__init__(self.size)
+
+    def __len__(self):
+        return sum(entry is not None for entry in self.deep) + \
+            sum(entry is not None for entry in self.recent)
+
+    def report(self):
+        "report() - Summary of the table statistics"
+        return "TT: %d probes, %d hits, %d cutoffs, %d stores, %d overwrites" % (
+            self.probes, self.hits, self.cutoffs, self.stores, self.overwrites)
+
+
+def effective_branching_factor(nodes, depth):
+    """effective_branching_factor(nodes, depth) - Branching factor b* of a
+    uniform tree of the given depth with the same number of nodes, that
+    is N + 1 = 1 + b* + b*^2 + ... + b*^depth (Russell & Norvig)"""
+    if nodes <= depth:
+        return 1.0
+    (low, high) = (1.0, float(nodes))
+    while high - low > 1e-6:
+        b = (low + high) / 2
+        if sum(b ** i for i in range(1, depth + 1)) > nodes:
+            high = b
+        else:
+            low = b
+    return low
+
+
+class IterativeDeepeningSearch:
+    """IterativeDeepeningSearch
+    Alpha beta searches of increasing depth, 1 to maxplies, within a time
+    budget and/or node limit.  The principal variation of each depth is
+    searched first by the next one.  When a limit is reached, the search
+    of the current depth is abandoned and the best move of the last
+    completed depth is used.  The first depth is always completed so that
+    there is a move.  Positions of the endgame database are not searched,
+    its best move is played.
+
+    search = IterativeDeepeningSearch(strategy, 'r', 'b', 8, budget=5)
+    best_move = search.search(some_checker_board)
+    print(search.report())
+    """
+
+    def __init__(self, strategy, maxplayer, minplayer, maxplies=8,
+                 budget=MOVE_BUDGET, verbose=False, table=None,
+                 ordering=ORDERING, maxnodes=None, endgame=None):
+        """IterativeDeepeningSearch - Arguments as for AlphaBetaSearch
+        budget - seconds per search, None for no limit
+        maxnodes - nodes per search over all depths, None for no limit
+        """
+        self.strategy = strategy
+        self.maxplayer = maxplayer
+        self.minplayer = minplayer
+        self.maxplies = maxplies
+        self.budget = budget
+        self.maxnodes = maxnodes
+        self.verbose = verbose
+        self.table = table
+        self.ordering = ordering
+        self.endgame = endgame
+        # Statistics of the last search
+        self.depth = 0  # maxplies of the last completed depth
+        self.nodes = 0  # nodes of all depths, including an abandoned one
+        self.elapsed = 0.0  # seconds
+        self.value = None
+        self.pv = []  # principal variation of the last completed depth
+
+    def search(self, state: CheckerBoard) -> tuple:
+        """search(state) - Best action from state, None if there is none"""
+        start = time.perf_counter()
+        deadline = None if self.budget is None else start + self.budget
+        (self.depth, self.nodes, self.value, self.pv) = (0, 0, None, [])
+
+        actions = state.get_actions(self.maxplayer)
+        if len(actions) < 2:
+            # No move or a forced one, nothing to search
+            self.elapsed = time.perf_counter() - start
+            return actions[0] if actions else None
+        if self.endgame is not None:
+            action = self.endgame.best_action(state, self.maxplayer)
+            if action is not None:
+                self.value = -self.endgame.score(
+                    state.move(action), self.minplayer, 1)
+                self.pv = [action]
+                self.elapsed = time.perf_counter() - start
+                return action
+
+        action = None
+        # History scores of each player, shared by the depths
+        history = [dict() for _player in CheckerBoard.pawns]
+        for depth in range(1, self.maxplies + 1):
+            limited = action is not None
+            maxnodes = None
+            if limited and self.maxnodes is not None:
+                maxnodes = self.maxnodes - self.nodes
+            search = AlphaBetaSearch(
+                self.strategy, self.maxplayer, self.minplayer, depth,
+                table=self.table, deadline=deadline if limited else None,
+                pv=self.pv, ordering=self.ordering, history=history,
+                maxnodes=maxnodes, endgame=self.endgame)
+            try:
+                action = search.alphabeta(state)
+            except SearchTimeout:
+                self.nodes += search.nodes
+                break
+            self.nodes += search.nodes
+            (self.depth, self.value, self.pv) = (depth, search.value, search.pv)
+            if self.verbose:
+                print("Depth {}: value {} pv {}".format(depth, self.value, self.pv))
+            if deadline is not None and time.perf_counter() >= deadline or \
+                    self.maxnodes is not None and self.nodes >= self.maxnodes:
+                break
+        self.elapsed = time.perf_counter() - start
+        if self.verbose:
+            print(self.report())
+        return action
+
+    def nps(self):
+        "nps() - Nodes per second of the last search"
+        return self.nodes / self.elapsed if self.elapsed else 0.0
+
+    def report(self):
+        "report() - Summary of the last search"
+        return "Depth {}, {} nodes in {:.2f} s ({:.0f} nodes/s)".format(
+            self.depth, self.nodes, self.elapsed, self.nps())
+
+
 class AlphaBetaSearch:
     """AlphaBetaSearch
     Conduct alpha beta searches from a given state.
@@ -78,66 +347,317 @@ class AlphaBetaSearch:
     """
 
     def __init__(self, strategy: Strategy, maxplayer, minplayer, maxplies=3,
-                 verbose=False):
+                 verbose=False, table=None, deadline=None, pv=None,
+                 ordering=ORDERING, history=None, stop=None, maxnodes=None,
+                 endgame=None):
         """"AlphaBetaSearch - Initialize a class capable of alphabeta search
         strategy - implementation of AbstractStrategy class
         maxplayer - name of player that will maximize the utility function
         minplayer - name of player that will minimize the utility function
         maxplies- Maximum ply depth to search
         verbose - Output debugging information
+        table - TranspositionTable to use, values must be from the point of
+            view of the same maxplayer.  None for no table.
+        deadline - time.perf_counter() value after which the search raises
+            SearchTimeout, None for no limit
+        pv - principal variation of an earlier search to search first
+        ordering - move ordering heuristics to use, see ORDERING.  () keeps
+            the order of get_actions.
+        history - history heuristic scores of each player by index (see
+            CheckerBoard.playeridx), dicts by the from and to squares of a
+            move (its low 10 bits, see checkerboard.encode_move), may be
+            shared with other searches of the same players
+        stop - Event (threading or multiprocessing) that ends the search
+            with SearchTimeout when set, None if it cannot be stopped
+        maxnodes - nodes after which the search raises SearchTimeout,
+            None for no limit
+        endgame - endgame.EndgameDatabase whose positions are not searched
+            below the root but valued exactly, None for none
         """
         self.__strategy = strategy
         self.__maxplayer = maxplayer
         self.__minplayer = minplayer
         self.__maxplies = maxplies
         self.__verbose = verbose
-
+        self.__table = table
+        self.__maxside = SIDE_KEYS[CheckerBoard.playeridx(maxplayer)]
+        self.__minside = SIDE_KEYS[CheckerBoard.playeridx(minplayer)]
+        self.__deadline = deadline
+        self.__stop = stop
+        self.__maxnodes = maxnodes
+        self.__endgame = endgame
+        self.__limited = deadline is not None or stop is not None or \
+            maxnodes is not None
+        # Moves are searched as integers (see CheckerBoard.generate_moves)
+        # generated into a buffer per depth, actions are only made for the
+        # result
+        self.__pv = [encode_move(action) for action in pv or []]
+        self.__buffers = [[0] * MAXMOVES for _depth in range(maxplies + 2)]
+        self.__follow = False  # on the pv so far?
+        # Best line found below each depth
+        self.__lines = [[] for _depth in range(maxplies + 2)]
+        self.__ordering = frozenset(ordering)
+        unknown = self.__ordering.difference(ORDERING)
+        if unknown:
+            raise ValueError("Unknown move ordering %s" % ", ".join(sorted(unknown)))
+        self.__killers = [[] for _depth in range(maxplies + 2)]
+        self.__history = [dict() for _player in CheckerBoard.pawns] \
+            if history is None else history
+        self.nodes = 0  # positions visited by the last search
+        self.value = None  # value of the last search
+        self.pv = []  # principal variation of the last search
 
     def alphabeta(self, state: CheckerBoard) -> tuple:
         """alphbeta(state) - Run an alphabeta search from the current
        state. Returns best action.
        """
-        return self.max_value(state, -1 * math.inf, math.inf, 0)[1]
+        self.nodes = 0
+        self.__follow = bool(self.__pv) and "pv" in self.__ordering
+        if self.__table is not None:
+            self.__table.new_search()
+        self.value, _ = self.max_value(state, -1 * math.inf, math.inf, 0)
+        self.pv = []
+        for move in self.__lines[0]:
+            self.pv.append(state.decode_move(move))
+            state = state.make_move(move)
+        action = self.pv[0] if self.pv else None
+        if self.__verbose:
+            print("Value {} after {} nodes".format(self.value, self.nodes))
+            if self.__table is not None:
+                print(self.__table.report())
+        return action
+
+    def __probe(self, key, alpha, beta, depth):
+        """__probe - Look up a position in the transposition table
+        Returns (value, move).  value is None unless the stored result is
+        from a deep enough search and settles the position for the alpha,
+        beta window.  Results are not used at the root, which needs a move
+        for every value.  move is the best move stored, None if unknown.
+        """
+        entry = self.__table.probe(key)
+        if entry is None:
+            return None, None
+        (_key, draft, value, bound, move, _generation) = entry
+        if value >= WON:
+            value -= depth
+        elif value <= -WON:
+            value += depth
+        if depth and draft > self.__maxplies - depth and (
+                bound == EXACT or
+                bound == LOWER and value >= beta or
+                bound == UPPER and value <= alpha):
+            self.__table.cutoffs += 1
+            return value, move
+        return None, move
+
+    def __known(self, state, player, depth):
+        """__known - Utility for maxplayer of a position below the root with
+        player to move from the endgame database, None if it is not there"""
+        if not depth or self.__endgame is None:
+            return None
+        score = self.__endgame.score(state, player, depth)
+        if score is None or player == self.__maxplayer:
+            return score
+        return -score
+
+    def __ended(self, state, winner, depth):
+        """__ended - Utility for maxplayer of a position that ends the game.
+        With an endgame database, wins and losses are valued on the scale of
+        its scores so that winning now is not traded for a win it knows."""
+        if self.__endgame is None or winner is None:
+            return self.__strategy.utility(state)
+        if winner == self.__maxplayer:
+            return WIN_SCORE - depth
+        return depth - WIN_SCORE
+
+    def __store(self, key, value, alpha, beta, depth, move):
+        """__store - Record the result of a search between alpha and beta,
+        wins and losses counting plies from the position (see WON)"""
+        if value <= alpha:
+            bound = UPPER
+        elif value >= beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+        if value >= WON:
+            value += depth
+        elif value <= -WON:
+            value -= depth
+        self.__table.store(key, self.__maxplies - depth + 1, value, bound, move)
+
+    def root_actions(self, state: CheckerBoard) -> list:
+        """root_actions(state) - Actions of state in the order alphabeta()
+        would search them, not counting a transposition table move"""
+        self.__follow = bool(self.__pv) and "pv" in self.__ordering
+        moves = self.__moves(state, self.__maxplayer, 0, None)
+        self.__follow = False
+        return [state.decode_move(move) for move in moves]
+
+    def __visit(self):
+        """__visit - Count a node, raise SearchTimeout past the deadline,
+        the node limit or once stopped"""
+        self.nodes += 1
+        if self.__limited and self.nodes % CHECK_NODES == 0:
+            if self.__deadline is not None and \
+                    time.perf_counter() > self.__deadline or \
+                    self.__stop is not None and self.__stop.is_set() or \
+                    self.__maxnodes is not None and \
+                    self.nodes >= self.__maxnodes:
+                raise SearchTimeout()
+
+    def __moves(self, state, player, depth, first):
+        """__moves - Integer moves of player on state in the order to search
+        them, see ORDERING.  first is the move stored in the transposition
+        table, if any."""
+        buffer = self.__buffers[depth]
+        moves = buffer[:state.generate_moves(player, buffer)]
+        ordering = self.__ordering
+        if self.__follow:
+            if depth < len(self.__pv) and self.__pv[depth] in moves:
+                first = self.__pv[depth]
+            else:
+                self.__follow = False
+                if "tt" not in ordering:
+                    first = None
+        elif "tt" not in ordering:
+            first = None
+
+        if len(moves) > 1:
+            # Captures are mandatory, so either all moves are captures
+            # or none are
+            if "captures" in ordering and moves[0] >> 10:
+                moves.sort(key=lambda move: popcount(move >> 10),
+                           reverse=True)
+            elif ordering.intersection(("killers", "history")):
+                killers = self.__killers[depth] if "killers" in ordering else []
+                history = self.__history[CheckerBoard.playeridx(player)] \
+                    if "history" in ordering else {}
+
+                def score(move):
+                    if move in killers:
+                        # Above any history score
+                        return math.inf, -killers.index(move)
+                    return history.get(move & 0x3ff, 0), 0
+                moves.sort(key=score, reverse=True)
+        if first is not None and first in moves:
+            moves.remove(first)
+            moves.insert(0, first)
+        return moves
+
+    def __cutoff(self, move, player, depth):
+        """__cutoff - Note a move of player that caused a cutoff for the
+        killer and history heuristics.  Captures are ordered anyway and are
+        not noted."""
+        if move >> 10:
+            return
+        killers = self.__killers[depth]
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[KILLERS:]
+        fromto = move & 0x3ff
+        draft = self.__maxplies - depth + 1
+        history = self.__history[CheckerBoard.playeridx(player)]
+        history[fromto] = history.get(fromto, 0) + draft * draft
 
-    def max_value(self, state: CheckerBoard, alpha: int, beta: int, depth: int) -> (int, tuple):
+    def max_value(self, state: CheckerBoard, alpha: int, beta: int, depth: int) -> (int, int):
+        self.__visit()
         # Negative Infinity
         value = -1 * math.inf
         best_option = None
 
-        if state.is_terminal()[0] or depth > self.__maxplies:
+        (terminal, winner) = state.is_terminal()
+        known = None if terminal else \
+            self.__known(state, self.__maxplayer, depth)
+        if known is not None:
+            value = known
+            self.__follow = False
+            self.__lines[depth] = []
+        elif terminal:
+            value = self.__ended(state, winner, depth)
+            self.__lines[depth] = []
+        elif depth > self.__maxplies:
             value = self.__strategy.utility(state)
+            self.__lines[depth] = []
         else:
-            for action in state.get_actions(self.__maxplayer):
-                minv, _ = self.min_value(state.move(action), alpha, beta, depth + 1)
+            first = None
+            if self.__table is not None:
+                key = state.key ^ self.__maxside
+                (alpha0, beta0) = (alpha, beta)
+                (stored, first) = self.__probe(key, alpha, beta, depth)
+                if stored is not None:
+                    self.__follow = False
+                    self.__lines[depth] = []
+                    return stored, first
+            moves = self.__moves(state, self.__maxplayer, depth, first)
+            line = []
+            for move in moves:
+                minv, _ = self.min_value(state.make_move(move), alpha, beta,
+                                         depth + 1)
+                self.__follow = False
                 if minv > value:
                     # New Better Option
                     value = minv
-                    best_option = action
+                    best_option = move
+                    line = [move] + self.__lines[depth + 1]
                 if value >= beta:
                     # Prune
+                    self.__cutoff(move, self.__maxplayer, depth)
                     break
                 else:
                     alpha = max(alpha, value)
+            self.__lines[depth] = line
+            if self.__table is not None:
+                self.__store(key, value, alpha0, beta0, depth, best_option)
 
         return value, best_option
 
-    def min_value(self, state: CheckerBoard, alpha: int, beta: int, depth: int) -> (int, tuple):
+    def min_value(self, state: CheckerBoard, alpha: int, beta: int, depth: int) -> (int, int):
+        self.__visit()
         # Infinity
         value = math.inf
         worst_option = None
 
-        if state.is_terminal()[0] or depth > self.__maxplies:
+        (terminal, winner) = state.is_terminal()
+        known = None if terminal else \
+            self.__known(state, self.__minplayer, depth)
+        if known is not None:
+            value = known
+            self.__follow = False
+            self.__lines[depth] = []
+        elif terminal:
+            value = self.__ended(state, winner, depth)
+            self.__lines[depth] = []
+        elif depth > self.__maxplies:
             value = self.__strategy.utility(state)
+            self.__lines[depth] = []
         else:
-            for action in state.get_actions(self.__minplayer):
-                maxv, _ = self.max_value(state.move(action), alpha, beta, depth + 1)
+            first = None
+            if self.__table is not None:
+                key = state.key ^ self.__minside
+                (alpha0, beta0) = (alpha, beta)
+                (stored, first) = self.__probe(key, alpha, beta, depth)
+                if stored is not None:
+                    self.__follow = False
+                    self.__lines[depth] = []
+                    return stored, first
+            moves = self.__moves(state, self.__minplayer, depth, first)
+            line = []
+            for move in moves:
+                maxv, _ = self.max_value(state.make_move(move), alpha, beta,
+                                         depth + 1)
+                self.__follow = False
                 if maxv < value:
                     # New Worst Option
                     value = maxv
-                    worst_option = action
+                    worst_option = move
+                    line = [move] + self.__lines[depth + 1]
                 if value <= alpha:
                     # Prune
+                    self.__cutoff(move, self.__minplayer, depth)
                     break
                 else:
                     beta = min(beta, value)
+            self.__lines[depth] = line
+            if self.__table is not None:
+                self.__store(key, value, alpha0, beta0, depth, worst_option)
         return value, worst_option
@@ -6,8 +6,147 @@ Modified Feb 26, 2018 - Expanded comments
 """
 
 from basicsearch_lib.board import Board
-from copy import copy, deepcopy
 import operator
+import random
+
+# The 32 playable squares are numbered in row major order:  square
+# row * 4 + col // 2 is (row, col) = SQUARES[square].  Bit s of a mask
+# is set when square s is in the mask.
+SQUARES = [(r, 2 * i + (r + 1) % 2) for r in range(8) for i in range(4)]
+FULL = (1 << len(SQUARES)) - 1  # mask of all squares
+
+# Zobrist keys:  a random 64 bit number for each piece on each square.
+# The key of a board is the XOR of the keys of its pieces.  The generator
+# is seeded so keys are the same in every process.
+_zobrist_random = random.Random(20150221)
+ZOBRIST = {piece: [_zobrist_random.getrandbits(64) for _square in SQUARES]
+           for piece in ('r', 'b', 'R', 'B')}
+
+
+def square(row, col):
+    "square(row, col) - Number of a playable square, see SQUARES"
+    return row * 4 + col // 2
+
+
+def popcount(mask):
+    "popcount(mask) - Number of squares in a mask"
+    return bin(mask).count("1")
+
+
+def squares(mask):
+    "squares(mask) - Generate the squares of a mask in increasing order"
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def _neighbors(direction):
+    """_neighbors(direction) - For each square, the square one step away
+    in direction (delta row, delta col) or None if that is off the board"""
+    (dr, dc) = direction
+    return [square(r + dr, c + dc) if 0 <= r + dr < 8 and 0 <= c + dc < 8
+            else None
+            for (r, c) in SQUARES]
+
+
+def _shifts(targets):
+    """_shifts(targets) - Moving the squares of a mask to their neighbors
+    is a shift that only depends on the parity of their row.  Returns
+    [(sources, shift), ...] for even and odd rows where sources is the mask
+    of squares of the row parity that have a neighbor in targets.
+    """
+    shifts = []
+    for parity in (0, 1):
+        (sources, shift) = (0, 0)
+        for (s, t) in enumerate(targets):
+            if t is not None and SQUARES[s][0] % 2 == parity:
+                sources |= 1 << s
+                shift = t - s
+        shifts.append((sources, shift))
+    return shifts
+
+
+def _jumps(targets):
+    """_jumps(targets) - Jumping two squares in a direction is a shift of
+    the same size from every square.  Returns (sources, shift) where
+    sources is the mask of squares from which the jump stays on the board.
+    """
+    (sources, shift) = (0, 0)
+    for (s, t) in enumerate(targets):
+        if t is not None and targets[t] is not None:
+            sources |= 1 << s
+            shift = targets[t] - s
+    return (sources, shift)
+
+
+DIRECTIONS = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+NEIGHBORS = {d: _neighbors(d) for d in DIRECTIONS}
+SHIFTS = {d: _shifts(NEIGHBORS[d]) for d in DIRECTIONS}
+JUMPS = {d: _jumps(NEIGHBORS[d]) for d in DIRECTIONS}
+
+
+def neighbors(mask, direction):
+    """neighbors(mask, direction) - Mask of the squares one step in
+    direction from the squares of mask, those off the board are dropped"""
+    result = 0
+    for (sources, shift) in SHIFTS[direction]:
+        if shift > 0:
+            result |= (mask & sources) << shift
+        else:
+            result |= (mask & sources) >> -shift
+    return result
+
+
+def encode_action(action):
+    """encode_action(action) - Integer for an action (see
+    CheckerBoard.get_actions), 5 bits for each square of its path below a
+    leading 1 bit.  Returns 0 for None or paths too long to fit in 64 bits.
+    """
+    if action is None or len(action) > 12:
+        return 0
+    code = 1
+    for position in reversed(action):
+        code = code << 5 | square(position[0], position[1])
+    return code
+
+
+def decode_action(code):
+    """decode_action(code) - Action of an encode_action code, None for 0.
+    Steps of two rows are captures of the piece in between."""
+    if not code:
+        return None
+    (r, c) = SQUARES[code & 31]
+    action = [(r, c)]
+    code >>= 5
+    while code > 1:
+        (nr, nc) = SQUARES[code & 31]
+        if abs(nr - r) == 2:
+            action.append((nr, nc, ((r + nr) // 2, (c + nc) // 2)))
+        else:
+            action.append((nr, nc))
+        (r, c) = (nr, nc)
+        code >>= 5
+    return action
+
+
+# Moves of CheckerBoard.generate_moves are integers:  the square the piece
+# moves from in bits 0-4, the square it ends on in bits 5-9 and the mask
+# of the squares of the pieces it captures in the bits above.
+MAXMOVES = 64  # length of a move buffer, more than positions have
+# Squares on which pawns are crowned, red moves to row 0
+KINGROWS = sum(1 << square(r, c) for (r, c) in SQUARES if r in (0, 7))
+
+
+def encode_move(action):
+    """encode_move(action) - Integer move of an action (see
+    CheckerBoard.get_actions and generate_moves)"""
+    code = square(action[0][0], action[0][1]) | \
+        square(action[-1][0], action[-1][1]) << 5
+    for step in action[1:]:
+        if len(step) > 2:
+            code |= 1 << (10 + square(step[2][0], step[2][1]))
+    return code
 
 
 class CheckerBoard(Board):
@@ -18,15 +157,11 @@ class CheckerBoard(Board):
     All references to players in that are accessible externally to this
     class should use the pawn names. 
     
-    Note that this implementation is designed for readability, not
-    efficiency.  There are many changes that could be made to
-    improve the speed of this class. As an example, the board could
-    be represented as a single list of 32 positions.  
-
-    You should not be making changes to the design for this
-    assignment, but if you want to have fun later, redesigning
-    it for efficiency could be fun and improve the number of plys
-    that can be efficiently searched.
+    Pieces are kept in bitboards, three 32 bit masks of the playable
+    squares (see SQUARES):  redmask, blackmask and kingmask.  Move
+    generation shifts whole masks to find the pieces that can capture,
+    and move() copies three integers rather than the board.  The board
+    attribute is an 8x8 grid built from the masks for display.
     
     Board notation:
     Board is arranged as with black pieces on top, red pieces on bottom
@@ -167,6 +302,12 @@ class CheckerBoard(Board):
         # locations per row.
         self.locations_per_row = int(self.edgesize / self.step)
 
+        # Masks of the squares holding red pieces, black pieces and kings
+        # and the Zobrist key of the pieces, all kept up to date by place()
+        self.redmask = self.blackmask = self.kingmask = 0
+        self.key = 0
+
+        # Sets board to an empty grid, see the board property
         super(CheckerBoard, self).__init__(self.edgesize, self.edgesize,
                                            displaycol=3)
         # for each row, indicate whether the squares that pieces move
@@ -203,9 +344,6 @@ class CheckerBoard(Board):
                     self.place(row, col * self.step + self.coloffset[row],
                                self.pawns[playeridx])
                     self.pawnsN[playeridx] += 1
-            # Place spaces in illegal positions to make board more readable
-            for col in range(self.locations_per_row):
-                self.board[row][col * self.step + (self.coloffset[row] + 1) % 2] = ' '
 
         self.movecount = 0
         # Counters for draw detection
@@ -240,9 +378,29 @@ class CheckerBoard(Board):
         "get_kingsN - Return counts of kings"
         return self.kingsN
 
+    @property
+    def board(self):
+        """board - Rows of the board as lists of pieces, None for empty
+        playable squares and ' ' for the others.  The grid is built from
+        the masks, so changing it does not change the board, use place().
+        Assigning a grid places its pieces on an empty board.
+        """
+        grid = [[' '] * self.cols for _r in range(self.rows)]
+        for (s, (r, c)) in enumerate(SQUARES):
+            grid[r][c] = self.square_piece(s)
+        return grid
+
+    @board.setter
+    def board(self, grid):
+        self.redmask = self.blackmask = self.kingmask = self.key = 0
+        for (r, row) in enumerate(grid):
+            for (c, piece) in enumerate(row):
+                if piece and piece != ' ':
+                    self.place_square(square(r, c), piece)
+
     def isempty(self, row, col):
         "isempty - Is the specified space empty?"
-        return self.board[row][col] is None
+        return self.get(row, col) is None
 
     def clearboard(self):
         """clearboard - remove all pieces
@@ -250,28 +408,32 @@ class CheckerBoard(Board):
         WARNING:  Piece counts will be incorrect after calling
         this.  Call update_counts() to correct after placing new pieces
         """
-
-        # Iterate over every piece and remove it
-        for (r, c, piece) in self:
-            self.place(r, c, None)
+        self.redmask = self.blackmask = self.kingmask = self.key = 0
 
     def update_counts(self):
         """update_counts - When mucking around with the board, the counts
         of pawns and kings may be corrupted.  This method updates them.  Valid
         moves will not cause any problems, this is mainly for testing. 
         """
-        self.pawnsN = [0, 0]
-        self.kingsN = [0, 0]
-
-        # Iterate through pieces
-        for (_r, _c, piece) in self:
-            # Find player index and piece type
-            (playerId, kingP) = self.identifypiece(piece)
-            # update appropriate player piece count
-            if kingP:
-                self.kingsN[playerId] += 1
-            else:
-                self.pawnsN[playerId] += 1
+        pawns = ~self.kingmask
+        self.pawnsN = [popcount(self.redmask & pawns),
+                       popcount(self.blackmask & pawns)]
+        self.kingsN = [popcount(self.redmask & self.kingmask),
+                       popcount(self.blackmask & self.kingmask)]
+
+    def get(self, row, col):
+        "get(row, col) - piece at a position, None if empty, ' ' if not playable"
+        if (col + self.coloffset[row]) % self.step:
+            return ' '
+        return self.square_piece(square(row, col))
+
+    def square_piece(self, s):
+        "square_piece(s) - piece on playable square s or None if empty"
+        if self.redmask >> s & 1:
+            return self.players[0][self.kingmask >> s & 1]
+        if self.blackmask >> s & 1:
+            return self.players[1][self.kingmask >> s & 1]
+        return None
 
     def place(self, row, col, piece):
         "place(row, col, piece) - put a piece on the board"
@@ -284,7 +446,50 @@ class CheckerBoard(Board):
                 raise ValueError("Column must be odd for row %d" % (row))
             else:
                 raise ValueError("Column must be even for row %d" % (row))
-        self.board[row][col] = piece
+        self.place_square(square(row, col), piece)
+
+    def place_square(self, s, piece):
+        "place_square(s, piece) - put a piece (None to empty) on square s"
+        bit = 1 << s
+        # XOR out the piece that was here and XOR in the new one
+        previous = self.square_piece(s)
+        if previous:
+            self.key ^= ZOBRIST[previous][s]
+            self.redmask &= ~bit
+            self.blackmask &= ~bit
+            self.kingmask &= ~bit
+        if piece:
+            if piece in self.players[0]:
+                self.redmask |= bit
+            elif piece in self.players[1]:
+                self.blackmask |= bit
+            else:
+                raise ValueError("Unknown piece type")
+            if piece in self.kings:
+                self.kingmask |= bit
+            self.key ^= ZOBRIST[piece][s]
+
+    def zobrist_key(self):
+        """zobrist_key - Compute the Zobrist key of the board from scratch.
+        place() and move() maintain it in self.key, this is mainly for testing.
+        """
+        key = 0
+        for (r, c, piece) in self:
+            key ^= ZOBRIST[piece][square(r, c)]
+        return key
+
+    def __hash__(self):
+        "__hash__ - Zobrist key of the board, see place()"
+        return self.key
+
+    def __eq__(self, other):
+        """__eq__ - Do boards have the same pieces on the same squares?
+        Move counters are not compared.  Different keys imply different
+        boards, so the masks are only compared when the keys match.
+        """
+        return isinstance(other, CheckerBoard) and self.key == other.key and \
+            (self.redmask, self.blackmask, self.kingmask) == \
+            (other.redmask, other.blackmask, other.kingmask)
 
     def is_terminal(self):
         """is_terminal - check if game over
@@ -372,59 +577,133 @@ class CheckerBoard(Board):
         to take the one with the most jumps
         """
 
+        buffer = [0] * MAXMOVES
+        actions = []
+        for code in buffer[:self.generate_moves(player, buffer)]:
+            if code >> 10:
+                # A king's tour may take the same pieces in either
+                # direction, both are actions of its move
+                actions.extend(self.__decodings(code))
+            else:
+                actions.append([SQUARES[code & 31], SQUARES[code >> 5]])
+        return actions
+
+    def generate_moves(self, player, buffer):
+        """generate_moves(player, buffer) - Write the moves of player to the
+        start of buffer, a list, and return how many there are.  Moves are
+        integers (see encode_move) in the order of get_actions, a list of
+        MAXMOVES is long enough and is extended if it is not.  Searches
+        keep a buffer per depth so that generating moves does not build
+        lists of tuples, decode_move() gives the action of a move.
+        """
         try:
             pidx = self.pawns.index(player)
         except ValueError:
             raise ValueError("Unknown player")
 
-        # If we see any captures along the way, we will stop looking
-        # for moves that do not capture as they will be filtered out
-        # at the end.
-        moves = []
-
-        # Scan each square
-        for r in range(self.rows):
-            for c in range(self.coloffset[r], self.cols, self.step):
-                piece = self.board[r][c]
-                # If square contains pawn/king of player who will be moving
-                if piece in self.players[pidx]:
-                    # Determine types of moves that can be made
-                    if piece == self.pawns[pidx]:
-                        movepaths = self.pawnmoves[player]
-                    else:
-                        movepaths = self.kingmoves
-                    # Generate moves based on possible directions
-                    newmoves = self.genmoves(r, c, movepaths, pidx)
-                    moves.extend(newmoves)
-
-        # Check if any captures are possible
-        # If so, remove all non-capture moves as player must make
-        # a capture move if one is available.         
-        captureP = False  # capture predicate
-        for a in moves:
-            # each action is
-            #    [(rsrc, csrc), (rdst, cdst)]  (non-capture case)
-            # or [(rsrc, csrc), (rdst, cdst, (rcapture, ccapture), ...]
-            captureP = len(a[1]) > 2
-            if captureP:
-                break
-        if captureP:
-            # Remove non capture moves as player must capture if possible
-            # We only need to check the first destination to see if it
-            # has a capture tuple after the destination row and column
-            moves = [m for m in moves if len(m[1]) > 2]
-
-        return moves
+        (own, opponents) = self.player_masks(pidx)
+        empty = FULL & ~(self.redmask | self.blackmask)
+        kings = self.kingmask
+        pawnpaths = self.pawnmoves[player]
+        kingpaths = self.kingmoves
+
+        count = 0
+        # Captures are mandatory.  Only pieces that can capture need to be
+        # looked at when there are any, and other moves only when there
+        # are none.
+        capturers = self.capturers(pidx)
+        if capturers:
+            for s in squares(capturers):
+                # The capturing piece leaves its square, a king's tour may
+                # end there
+                count = self.__captures(
+                    s, s, kingpaths if kings >> s & 1 else pawnpaths,
+                    opponents, empty | (1 << s), 0, buffer, count)
+        else:
+            for s in squares(own):
+                for m in kingpaths if kings >> s & 1 else pawnpaths:
+                    t = NEIGHBORS[m][s]
+                    if t is not None and empty >> t & 1:
+                        try:
+                            buffer[count] = s | t << 5
+                        except IndexError:
+                            buffer.append(s | t << 5)
+                        count += 1
+        return count
+
+    def decode_move(self, code):
+        """decode_move(code) - Action (see get_actions) of an integer move of
+        this board.  Of the multiple jumps taking the same pieces (king's
+        tours), it is the first get_actions finds.  Raises ValueError if
+        code is not a move."""
+        for action in self.__decodings(code):
+            return action
+        raise ValueError("Not a move of this board")
+
+    def __decodings(self, code):
+        "__decodings - Generate the actions of an integer move"
+        source = code & 31
+        target = code >> 5 & 31
+        captured = code >> 10
+        pidx = 0 if self.redmask >> source & 1 else 1
+        (own, opponents) = self.player_masks(pidx)
+        if not own >> source & 1 or captured & ~opponents:
+            return
+        if self.kingmask >> source & 1:
+            movepaths = self.kingmoves
+        else:
+            movepaths = self.pawnmoves[self.pawns[pidx]]
+        empty = FULL & ~(self.redmask | self.blackmask) | 1 << source
+        if not captured:
+            if empty >> target & 1 and \
+                    any(NEIGHBORS[m][source] == target for m in movepaths):
+                yield [SQUARES[source], SQUARES[target]]
+            return
+        for steps in self.__capture_steps(source, target, captured,
+                                          movepaths, empty):
+            yield [SQUARES[source]] + steps
+
+    def player_masks(self, pidx):
+        "player_masks(pidx) - (mask of player pidx's pieces, opponent's mask)"
+        if pidx:
+            return (self.blackmask, self.redmask)
+        return (self.redmask, self.blackmask)
+
+    def capturers(self, pidx):
+        """capturers(pidx) - Mask of the pieces of player pidx that can
+        capture.  Found by shifting masks in each direction:  a piece can
+        capture in a direction when the next square holds an opponent and
+        the one after it is empty.
+        """
+        (own, opponents) = self.player_masks(pidx)
+        empty = FULL & ~(self.redmask | self.blackmask)
+        pawns = own & ~self.kingmask
+        kings = own & self.kingmask
+        pawnpaths = self.pawnmoves[self.pawns[pidx]]
+
+        found = 0
+        for m in self.kingmoves:
+            pieces = kings | pawns if m in pawnpaths else kings
+            # pieces that a jump in direction m takes to an empty square,
+            # most of the time there are none and the square jumped over
+            # need not be looked at
+            (sources, shift) = JUMPS[m]
+            if shift > 0:
+                jumpers = empty >> shift & sources & pieces
+            else:
+                jumpers = empty << -shift & sources & pieces
+            if jumpers:
+                found |= jumpers & neighbors(opponents, (-m[0], -m[1]))
+        return found
 
     def __iter__(self):
         """iter - Board iterator
         Returns (r, c, piece) for non empty spaces.
         Might be helpful for board evaluation
         """
-        for r in range(self.rows):
-            for c in range(self.coloffset[r], self.cols, self.step):
-                if self.board[r][c]:
-                    yield (r, c, self.board[r][c])
+        for s in squares(self.redmask | self.blackmask):
+            (r, c) = SQUARES[s]
+            yield (r, c, self.square_piece(s))
 
     def move(self, move, validate=[], verbose=False):
         """move - Apply a move and return a new board
@@ -438,72 +717,14 @@ class CheckerBoard(Board):
             if move not in validate:
                 raise ValueError("Invalid move")
 
-        # Only need to copy the board and counter arrays
-        # Everything else is static and can be a shallow copy
-        newboard = copy(self)
-        newboard.pawnsN = copy(self.pawnsN)
-        newboard.kingsN = copy(self.kingsN)
-        newboard.board = deepcopy(self.board)
-        newboard.movecount += 1  # Record new move
-
-        (firstr, firstc) = (lastr, lastc) = move[0]
-        piece = self.get(lastr, lastc)
-        oldpiece = piece  # Just in case we change and want to print
-        newboard.place(lastr, lastc, None)  # Remove from current position
-
-        captures = 0  # number of captures for verbose output and draw detection
-        # Loop through move sequence, removing any 
-        # captured pieces as we go along
-        for item in move[1:]:
-            if len(item) > 2:
-                # Capture, remove captured piece
-                captures = captures + 1
-                posn = item[2]  # captured position
-                capturedpiece = newboard.get(posn[0], posn[1])
-
-                # Remove the piece                
-                newboard.place(posn[0], posn[1], None)
-
-                # Decrement count for captured piece
-                (pieceidx, kingP) = newboard.identifypiece(capturedpiece)
-                if kingP:
-                    newboard.kingsN[pieceidx] -= 1
-                else:
-                    newboard.pawnsN[pieceidx] -= 1
-
-            # update last known location of moving piece, might happen 
-            # more than once in a multiple jump move
-            # In any case, last row and column will represent the final
-            # position of the piece when we finish the loop    
-            (lastr, lastc) = item[0:2]
-
-        if lastr == 0 or lastr + 1 == self.rows:
-            # At end, do we need to crown a pawn?
-            try:
-                # find the appropriate pawn type and crown it
-                playeridx = self.pawns.index(piece)
-                piece = self.players[playeridx][1]  # king
-            except ValueError:
-                pass  # not a pawn
-
-        # Put the piece as the last location of the move sequence
-        newboard.place(lastr, lastc, piece)
-
-        if captures:
-            # Captured something, note the move for draw detection
-            newboard.lastcapture = newboard.movecount
-
-        if self.ispawn(oldpiece):
-            # Advanced a pawn, note move number for draw detection
-            newboard.lastpawnadvance = newboard.movecount
-            if oldpiece != piece:
-                # Kinged, update counts
-                (pieceidx, kingP) = newboard.identifypiece(oldpiece)
-                newboard.pawnsN[pieceidx] -= 1
-                newboard.kingsN[pieceidx] += 1
+        newboard = self.make_move(encode_move(move))
 
         if verbose:
             # Show the move if folks are interested...
+            (firstr, firstc) = move[0]
+            oldpiece = self.square_piece(square(firstr, firstc))
+            piece = newboard.square_piece(square(move[-1][0], move[-1][1]))
+            captures = len(move) - 1 if len(move[1]) > 2 else 0
             print()
             print("Move %s from " % (oldpiece), (firstr, firstc))
             print(self)
@@ -517,6 +738,75 @@ class CheckerBoard(Board):
 
         return newboard
 
+    def make_move(self, code):
+        """make_move(code) - Apply an integer move (see generate_moves) and
+        return a new board.  The move is assumed to be valid.
+        The new board shares the pawn and king count lists of this one
+        unless they change, they are replaced rather than modified.
+        """
+        source = code & 31
+        target = code >> 5 & 31
+        captured = code >> 10
+        bit = 1 << source
+        newbit = 1 << target
+
+        # A shallow copy, the masks are integers and everything else is
+        # static or replaced
+        newboard = object.__new__(type(self))
+        newboard.__dict__.update(self.__dict__)
+        newboard.movecount = movecount = self.movecount + 1  # Record new move
+
+        king = self.kingmask >> source & 1
+        pidx = 0 if self.redmask >> source & 1 else 1
+        crowned = not king and newbit & KINGROWS
+        (pawn, crownedpiece) = self.players[pidx]
+        piece = crownedpiece if king else pawn
+        key = self.key ^ ZOBRIST[piece][source] ^ \
+            ZOBRIST[crownedpiece if king or crowned else pawn][target]
+        kingmask = self.kingmask & ~bit
+        if king or crowned:
+            kingmask |= newbit
+        if pidx:
+            (own, opponents) = (self.blackmask, self.redmask)
+        else:
+            (own, opponents) = (self.redmask, self.blackmask)
+        own = own & ~bit | newbit
+
+        if captured:
+            # Captured something, note the move for draw detection
+            newboard.lastcapture = movecount
+            (opawn, oking) = self.players[1 - pidx]
+            for s in squares(captured):
+                key ^= ZOBRIST[oking if kingmask >> s & 1 else opawn][s]
+            opponents &= ~captured
+            kings = popcount(captured & kingmask)
+            kingmask &= ~captured
+            counts = list(self.pawnsN)
+            counts[1 - pidx] -= popcount(captured) - kings
+            newboard.pawnsN = counts
+            counts = list(self.kingsN)
+            counts[1 - pidx] -= kings
+            newboard.kingsN = counts
+
+        if not king:
+            # Advanced a pawn, note move number for draw detection
+            newboard.lastpawnadvance = movecount
+            if crowned:
+                counts = list(newboard.pawnsN)
+                counts[pidx] -= 1
+                newboard.pawnsN = counts
+                counts = list(newboard.kingsN)
+                counts[pidx] += 1
+                newboard.kingsN = counts
+
+        if pidx:
+            (newboard.blackmask, newboard.redmask) = (own, opponents)
+        else:
+            (newboard.redmask, newboard.blackmask) = (own, opponents)
+        newboard.kingmask = kingmask
+        newboard.key = key
+        return newboard
+
     def onboard(self, r, c):
         "onboard - Specified row and column on the board?"
         return r >= 0 and r < self.rows and c >= 0 and c < self.cols
@@ -532,134 +822,81 @@ class CheckerBoard(Board):
         Returns list of possible moves (see get_actions) and captures
         """
 
-        actions = self.__movehelper(r, c, movepaths, playeridx, [])
-        return actions
+        s = square(r, c)
+        (_own, opponents) = self.player_masks(playeridx)
+        empty = FULL & ~(self.redmask | self.blackmask)
 
-    def __movehelper(self, r, c, movepaths, playeridx, history):
-        """__movehelper - Helper finds possible moves from a given position.
-        Helper function for genmoves
-        r,c - position
+        buffer = [0] * MAXMOVES
+        count = self.__captures(s, s, movepaths, opponents, empty | (1 << s),
+                                0, buffer, 0)
+        for m in movepaths:
+            t = NEIGHBORS[m][s]
+            if t is not None and empty >> t & 1:
+                buffer[count] = s | t << 5
+                count += 1
+        return [action for code in buffer[:count]
+                for action in self.__decodings(code)]
+
+    def __captures(self, origin, s, movepaths, opponents, empty, captured,
+                   buffer, count):
+        """__captures - Helper that finds the capture sequences of a piece.
+        origin - square the piece started from
+        s - square the piece has reached
         movepaths - list of possible offsets for piece
-        playeridx - current playeridx 0|1
-        history - list of moves made along a path - [] on first call
-        Returns list of possible moves (see get_actions) and captures
-        which indicates if a capture has been produced by the moves
-        generated here or was already true.
-        
-        This function is called recursively to track move paths
+        opponents, empty - masks of opponent pieces and empty squares
+        captured - mask of the pieces captured so far, they stay on the
+            board until the move is over and cannot be captured twice
+        Writes the completed capture sequences as integer moves to buffer
+        from index count on (see generate_moves) and returns the new count.
+
+        As per WCDF rules, a multiple jump must be made to completion, so
+        a sequence is only complete when it cannot be extended.  A pawn
+        reaching the king row stops there as pawns only move forward.
         """
-
-        otherplayer = (playeridx + 1) % 2
-        actions = []
+        extended = False
         for m in movepaths:
-            rmove = r + m[0]
-            cmove = c + m[1]
-            # move only valid if it will be on the board
-            if self.onboard(rmove, cmove):
-
-                # check if blocked by opposing player, might be able to jump
-                if self.board[rmove][cmove] in self.players[otherplayer]:
-                    # Blocked See if capture possible by moving one more time
-                    rjump = rmove + m[0]
-                    cjump = cmove + m[1]
-                    if self.onboard(rjump, cjump) and \
-                            self.__valid_capture((rmove, cmove), (rjump, cjump),
-                                                 history):
-                        # Note jump
-                        if history:
-                            # append to a copy of previous jumps so far
-                            # We need to copy history as move sequences
-                            # can branch, resulting in different moves
-                            # with a common past.
-                            capture = copy(history)
-                            capture.append((rjump, cjump, (rmove, cmove)))
-                        else:
-                            # first jump
-                            capture = [(r, c), (rjump, cjump, (rmove, cmove))]
-
-                        # Crown a king?
-                        # As pawns can only move forward, just look if we have
-                        # moved to the first or last row. 
-                        if rjump == 0 or rjump == self.rows:
-                            # Piece has moved onto a first or last row
-                            # If this is a pawn, we stop even if there
-                            # is another capture available
-
-                            # Was this a pawn?
-                            (rstart, cstart) = (capture[0][0], capture[0][1])
-                            if self.get(rstart, cstart) == self.pawns[playeridx]:
-                                # Can't move any more
-                                return [capture]
-
-                        # We can make this move, but if we can continue
-                        # to capture, we are obligated to do so.
-                        # See if we can continue.
-                        # If no more moves are possible, will simply
-                        # return the current move as one possible action
-                        #
-                        # Note:  If we wanted to not force subsequent
-                        # available jumps after the first one, we could
-                        # append the current capture move, and remove the 
-                        # code that returns [history] when there are no
-                        # available actions.
-                        more = self.__movehelper(rjump, cjump, movepaths,
-                                                 playeridx, capture)
-                        for m in more:
-                            actions.append(m)
-
-                # Regular move possible if not blocked and no history
-                # of captures
-                elif not self.board[rmove][cmove] and not history:
-                    actions.append([(r, c), (rmove, cmove)])
-
-        if history and not actions:
-            # One or more captures have been made, but when we called
-            # __movehelper to see if there were any more, there were
-            # no valid actions.  We set actions to be a list containing
-            # the history that was required to arrive here.
-            actions = [history]
-
-        return actions
-
-    def __valid_capture(self, capturedpiece, moveto, history):
-        """__valid_capture
-            capturedpiece - (r,c) tuple to be captured
-            moveto - position to which we will jump
-            history - previous jumps
-        
-        already_captured - Prevent taking a piece more than once
-        helper function for __movehelper
-        """
-
-        valid = True  # Until we learn otherwise
-
-        # Verify that there's no piece at the destination.  
-        # If there is a piece, check to see if it was the starting
-        # position as it is possible to do a jump tour
-        if self.board[moveto[0]][moveto[1]]:
-            # Something's there.  If it's the starting piece, that's okay,
-            # otherwise not good.  Don't bother checking if there are
-            # not enough moves.
-            if len(history) >= self.shortest_tour:
-                valid = history[0] == moveto
-            else:
-                valid = False
-
-        if valid and len(history) > 1:
-            for move in history[1:]:
-                # Anything in the history is a capture as __movehelper
-                # recursively builds the history on multi-jump moves.
-                # All capture nodes consist of a 3-tuple:
-                #  (newrow, newcol, (capturedrow, capturedcol))
-                # First position in history is the starting one, anything
-                # afterwards is a capture move.
-
-                # If we already captured this piece, we cannot capture
-                # it again.
-                if move[2] == capturedpiece:
-                    valid = False
-
-        return valid
+            over = NEIGHBORS[m][s]
+            if over is None or not (opponents & ~captured) >> over & 1:
+                continue
+            land = NEIGHBORS[m][over]
+            if land is None or not empty >> land & 1:
+                continue
+            extended = True
+            count = self.__captures(origin, land, movepaths, opponents, empty,
+                                    captured | (1 << over), buffer, count)
+
+        if captured and not extended:
+            code = origin | s << 5 | captured << 10
+            # A king can take the same pieces in another order, it is the
+            # same move
+            if self.kingmask >> origin & 1 and code in buffer[:count]:
+                return count
+            try:
+                buffer[count] = code
+            except IndexError:
+                buffer.append(code)
+            count += 1
+        return count
+
+    def __capture_steps(self, s, target, captured, movepaths, empty):
+        """__capture_steps - Helper of decode_move, generate the steps of the
+        capture sequences from square s taking the pieces of captured and
+        ending on target, in the order of __captures"""
+        if not captured:
+            if s == target:
+                yield []
+            return
+        for m in movepaths:
+            over = NEIGHBORS[m][s]
+            if over is None or not captured >> over & 1:
+                continue
+            land = NEIGHBORS[m][over]
+            if land is None or not empty >> land & 1:
+                continue
+            for steps in self.__capture_steps(land, target,
+                                              captured & ~(1 << over),
+                                              movepaths, empty):
+                yield [SQUARES[land] + (SQUARES[over],)] + steps
 
     def recount_pieces(self):
         """recount_pieces() - Recount pawns and kings
@@ -668,11 +905,4 @@ class CheckerBoard(Board):
         (e.g. in boardlibary), the board counts will not longer be accurate.
         This resets the counters based on the current configuration.
         """
-        self.pawnsN = [0, 0]
-        self.kingsN = [0, 0]
-        for (r, c, piece) in self:
-            (playeridx, kingP) = self.identifypiece(piece)
-            if kingP:
-                self.kingsN[playeridx] += 1
-            else:
-                self.pawnsN[playeridx] += 1
+        self.update_counts()
@@ -10,19 +10,16 @@ import time
 import human
 import ai
 from checkerboard import *
-import imp
+import importlib.machinery
+import importlib.util
+import os
 import sys
-major = sys.version_info[0]
-minor = sys.version_info[1]
-modpath = "__pycache__/tonto.cpython-{}{}.pyc".format(major, minor)
-tonto = imp.load_compiled("tonto", modpath)
-
-# If the tonto import fails remember that the compiled file is ignored by git
 
 
 # tonto - Professor Roch's not too smart strategy
 # You are not given source code to this, but compiled .pyc files
-# are available for Python 3.5 and 3.6 (fails otherwise).
+# are available for Python 3.5 and 3.6 (fails otherwise),
+# load_tonto() imports it when it is wanted rather than on import.
 # This will let you test some of your game logic without having to worry
 # about whether or not your AI is working and let you pit your player
 # against another computer player.
@@ -30,6 +27,24 @@ tonto = imp.load_compiled("tonto", modpath)
 # Decompilation is cheating, don't do it.
 
 
+def load_tonto():
+    """load_tonto - Import tonto from its compiled file for this version of
+    Python.  Raises ImportError if there is none.
+    If the tonto import fails remember that the compiled file is ignored by git
+    """
+    modpath = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           "__pycache__", "tonto.cpython-{}{}.pyc".format(
+                               sys.version_info[0], sys.version_info[1]))
+    if not os.path.exists(modpath):
+        raise ImportError("No compiled tonto at " + modpath)
+    loader = importlib.machinery.SourcelessFileLoader("tonto", modpath)
+    spec = importlib.util.spec_from_loader("tonto", loader)
+    module = importlib.util.module_from_spec(spec)
+    loader.exec_module(module)
+    sys.modules["tonto"] = module
+    return module
+
+
 def elapsed(earlier, later):
     """elapsed - Convert elapsed time.time objects to duration string
     
@@ -58,6 +73,8 @@ def Game(red=human.Strategy, black=ai.Strategy,
     init - Start with given board (default None uses a brand new game)
     verbose - Show messages (default True)
     firstmove - Player N starts 0 (red) or 1 (black).  Default 0. 
+    Returns the winner, 'r' or 'b', or None for a draw
+    (see tournament.py to play many games without the prints)
     """
 
     # Don't forget to create instances of your strategy,
@@ -70,7 +87,7 @@ def Game(red=human.Strategy, black=ai.Strategy,
     board = CheckerBoard() if init is None else init
     winner = None
     while not board.is_terminal()[0]:
-        if turn is 0:
+        if turn == 0:
             if verbose:
                 print("Red Player's Turn")
                 print("Calculated Utility: {}".format(red_strategy.utility(board)))
@@ -103,12 +120,14 @@ def Game(red=human.Strategy, black=ai.Strategy,
 
     if board.is_terminal()[0]:
         winner = board.is_terminal()[1]
-        if winner is None:
-            print("Game Over! It was a draw")
-        else:
-            print("Game Over! - {} wins".format(winner))
-    else:
+        if verbose:
+            if winner is None:
+                print("Game Over! It was a draw")
+            else:
+                print("Game Over! - {} wins".format(winner))
+    elif verbose:
         print("The other player Forfeit - {} wins!".format(winner))
+    return winner
 
 
 if __name__ == "__main__":
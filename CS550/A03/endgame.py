@@ -0,0 +1,450 @@
+"""
+endgame - Endgame database of checkers positions with few pieces
+
+The database holds the value of every position with up to a few pieces
+with best play: a win or loss for the player to move and in how many
+plies the game ends, or a draw.  It is built by retrograde analysis:
+positions without moves are lost, positions with a move to a lost
+position are won and positions whose moves all lead to won positions are
+lost, worked backwards from the end of the game one ply at a time.
+Positions never decided are draws.  Distances ignore the draw rule of
+CheckerBoard.is_terminal, which ends games 40 plies after the last
+capture or pawn move.
+
+Positions are grouped into slices by their material, the numbers of red
+pawns, red kings, black pawns and black kings, e.g. slice (0, 2, 0, 1)
+holds two red kings against a black king.  Captures lead to slices with
+fewer pieces and crowning to slices with more kings, so slices are built
+in that order and moves that leave a slice read the slices built before.
+Each slice is a file of one byte per position, e.g. 0201.edb, indexed by
+the ranks of the squares of each kind of piece and the player to move
+(see position_index).  The byte is 0 for a draw and otherwise the number
+of plies to the end of the game plus one, odd plies being a win for the
+player to move.  Files are memory-mapped when probed.
+
+Building the 4 piece database takes several minutes (5 pieces take
+hours):
+    python endgame.py --pieces 4
+
+ai.Strategy probes the database in endgamedb next to this module when
+there is one.
+"""
+
+import argparse
+import array
+import itertools
+import math
+import mmap
+import os
+import time
+
+from checkerboard import (CheckerBoard, SQUARES, popcount, square)
+
+DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         "endgamedb")
+PIECES = 4  # default number of pieces of a database
+EXTENSION = ".edb"
+MAXPLIES = 254  # longest distance a byte holds
+WIN_SCORE = 10000  # utility of a win, less the plies to it
+
+# Results for the player to move
+LOSS, DRAW, WIN = -1, 0, 1
+
+# Squares on which pawns are crowned by player index, red moves to row 0
+CROWNS = [sum(1 << square(row, col) for (row, col) in SQUARES if row == kingrow)
+          for kingrow in (0, 7)]
+
+_RANKS = {0: 0}  # rank of a mask among the masks with as many squares
+_MASKS = {0: [0]}  # masks with k squares in order of rank, by k
+
+
+def _masks(k):
+    """_masks(k) - Masks of k squares, index of a mask is its rank"""
+    try:
+        return _MASKS[k]
+    except KeyError:
+        masks = _MASKS[k] = []
+        for chosen in itertools.combinations(range(len(SQUARES)), k):
+            mask = sum(1 << s for s in chosen)
+            _RANKS[mask] = len(masks)
+            masks.append(mask)
+        return masks
+
+
+def _rank(mask, k):
+    """_rank(mask, k) - Rank of a mask of k squares (see _masks), the masks
+    of k squares are listed the first time one is ranked"""
+    try:
+        return _RANKS[mask]
+    except KeyError:
+        _masks(k)
+        return _RANKS[mask]
+
+
+def signature(groups):
+    """signature(groups) - Slice of a position given as its masks of red
+    pawns, red kings, black pawns and black kings"""
+    return tuple(popcount(mask) for mask in groups)
+
+
+def board_groups(board):
+    """board_groups(board) - Masks of the red pawns, red kings, black pawns
+    and black kings of a CheckerBoard"""
+    kings = board.kingmask
+    return (board.redmask & ~kings, board.redmask & kings,
+            board.blackmask & ~kings, board.blackmask & kings)
+
+
+def slice_size(sig):
+    "slice_size(sig) - Number of positions of a slice, valid or not"
+    size = 2
+    for k in sig:
+        size *= math.comb(len(SQUARES), k)
+    return size
+
+
+def slice_name(sig):
+    "slice_name(sig) - File name of a slice"
+    return "".join(str(k) for k in sig) + EXTENSION
+
+
+def slices(pieces):
+    """slices(pieces) - Slices of positions with 2 to pieces pieces where
+    both players have a piece, in the order they must be built"""
+    result = []
+    for total in range(2, pieces + 1):
+        for sig in itertools.product(range(total + 1), repeat=4):
+            if sum(sig) == total and sig[0] + sig[1] and sig[2] + sig[3]:
+                result.append(sig)
+    # Crowning removes a pawn and adds a king
+    return sorted(result, key=lambda sig: (sum(sig), sig[0] + sig[2]))
+
+
+def position_index(sig, groups, pidx):
+    """position_index(sig, groups, pidx) - Index in slice sig of the
+    position of the masks groups (see board_groups) with player pidx to
+    move"""
+    index = 0
+    for (k, mask) in zip(sig, groups):
+        index = index * math.comb(len(SQUARES), k) + _rank(mask, k)
+    return 2 * index + pidx
+
+
+def positions(sig):
+    """positions(sig) - Generate (index, groups) of the valid positions of a
+    slice with red to move, index + 1 is the index with black to move.
+    Pieces do not share squares and pawns are not on their crowning row.
+    """
+    tables = [_masks(k) for k in sig]
+    (crownred, crownblack) = CROWNS
+    sizes = [len(table) for table in tables]
+    for (i0, redpawns) in enumerate(tables[0]):
+        if redpawns & crownred:
+            continue
+        for (i1, redkings) in enumerate(tables[1]):
+            if redkings & redpawns:
+                continue
+            red = redpawns | redkings
+            for (i2, blackpawns) in enumerate(tables[2]):
+                if blackpawns & (red | crownblack):
+                    continue
+                base = (i0 * sizes[1] + i1) * sizes[2] + i2
+                for (i3, blackkings) in enumerate(tables[3]):
+                    if blackkings & (red | blackpawns):
+                        continue
+                    yield (2 * (base * sizes[3] + i3),
+                           (redpawns, redkings, blackpawns, blackkings))
+
+
+def child_groups(groups, action, pidx):
+    """child_groups(groups, action, pidx) - Masks of the position after
+    player pidx makes a CheckerBoard action"""
+    (redpawns, redkings, blackpawns, blackkings) = groups
+    own = [(redpawns, redkings), (blackpawns, blackkings)]
+    (pawns, kings) = own[pidx]
+    (opawns, okings) = own[1 - pidx]
+    source = 1 << square(*action[0])
+    target = 1 << square(*action[-1][:2])
+    for step in action[1:]:
+        if len(step) > 2:
+            captured = ~(1 << square(*step[2]))
+            opawns &= captured
+            okings &= captured
+    if kings & source:
+        kings ^= source | target
+    elif target & CROWNS[pidx]:
+        pawns ^= source
+        kings |= target
+    else:
+        pawns ^= source | target
+    if pidx:
+        return (opawns, okings, pawns, kings)
+    return (pawns, kings, opawns, okings)
+
+
+def result(value):
+    """result(value) - (LOSS, DRAW or WIN, plies) of a database byte"""
+    if not value:
+        return (DRAW, 0)
+    plies = value - 1
+    return (WIN if plies % 2 else LOSS, plies)
+
+
+def _build_slice(sig, lookup, scratch):
+    """_build_slice(sig, lookup, scratch) - bytearray of the values of a
+    slice.  lookup(sig) returns the values of a slice built before,
+    scratch is a CheckerBoard whose masks are set to generate moves.
+    """
+    size = slice_size(sig)
+    pending = array.array('H', [0]) * size  # undecided moves in slice
+    longest = bytearray(size)  # most plies of a move to a win of opponent
+    drawn = bytearray(size)  # has a move to a draw out of the slice?
+    winning = bytearray(size)  # has a move to a loss out of the slice?
+    # Moves within the slice, parents are found by sorting them on child
+    children = array.array('I')
+    parents = array.array('I')
+    queues = [[] for _plies in range(MAXPLIES + 2)]  # positions by plies
+
+    for (base, groups) in positions(sig):
+        (redpawns, redkings, blackpawns, blackkings) = groups
+        scratch.redmask = redpawns | redkings
+        scratch.blackmask = blackpawns | blackkings
+        scratch.kingmask = redkings | blackkings
+        for pidx in (0, 1):
+            index = base + pidx
+            actions = scratch.get_actions(CheckerBoard.pawns[pidx])
+            if not actions:
+                queues[0].append(index)
+                continue
+            best = 0
+            for action in actions:
+                child = child_groups(groups, action, pidx)
+                childsig = signature(child)
+                if childsig == sig:
+                    children.append(position_index(sig, child, 1 - pidx))
+                    parents.append(index)
+                    pending[index] += 1
+                    continue
+                if not childsig[2 - 2 * pidx] + childsig[3 - 2 * pidx]:
+                    # Took the opponent's last piece
+                    value = 1
+                else:
+                    value = lookup(childsig)[
+                        position_index(childsig, child, 1 - pidx)]
+                if not value:
+                    drawn[index] = 1
+                elif value % 2:
+                    # Opponent loses in value - 1 plies
+                    best = value if not best else min(best, value)
+                else:
+                    longest[index] = max(longest[index], value - 1)
+            if best:
+                winning[index] = 1
+                queues[best].append(index)
+            elif not pending[index] and not drawn[index]:
+                # Every move leads to a win of the opponent
+                queues[longest[index] + 1].append(index)
+
+    # Parents of each position, ordered by child
+    offsets = array.array('I', [0]) * (size + 1)
+    for child in children:
+        offsets[child + 1] += 1
+    for index in range(size):
+        offsets[index + 1] += offsets[index]
+    fill = offsets[:-1]
+    byparent = array.array('I', [0]) * len(parents)
+    for (child, parent) in zip(children, parents):
+        byparent[fill[child]] = parent
+        fill[child] += 1
+    del children, parents, fill
+
+    values = bytearray(size)
+    decided = bytearray(size)
+    for plies in range(MAXPLIES + 1):
+        for index in queues[plies]:
+            if decided[index]:
+                continue
+            decided[index] = 1
+            values[index] = plies + 1
+            for parent in byparent[offsets[index]:offsets[index + 1]]:
+                if decided[parent]:
+                    continue
+                if plies % 2 == 0:
+                    # Lost position, its parents win
+                    queues[plies + 1].append(parent)
+                else:
+                    pending[parent] -= 1
+                    if plies > longest[parent]:
+                        longest[parent] = plies
+                    if not pending[parent] and not winning[parent] and \
+                            not drawn[parent]:
+                        queues[longest[parent] + 1].append(parent)
+        queues[plies] = None
+    if queues[MAXPLIES + 1]:
+        raise ValueError("Slice %s has wins longer than %d plies" % (
+            slice_name(sig), MAXPLIES))
+    return values
+
+
+def build(path=DIRECTORY, pieces=PIECES, verbose=True):
+    """build(path, pieces, verbose) - Build the database of positions with
+    up to pieces pieces in directory path.  Slices whose files exist are
+    kept, so a larger database can be built on a smaller one."""
+    os.makedirs(path, exist_ok=True)
+    built = dict()
+
+    def lookup(sig):
+        if sig not in built:
+            with open(os.path.join(path, slice_name(sig)), "rb") as handle:
+                built[sig] = handle.read()
+        return built[sig]
+
+    scratch = CheckerBoard()
+    for sig in slices(pieces):
+        filename = os.path.join(path, slice_name(sig))
+        if os.path.exists(filename):
+            continue
+        start = time.perf_counter()
+        values = _build_slice(sig, lookup, scratch)
+        # Written under another name first so that an interrupted build
+        # does not leave a partial slice
+        with open(filename + ".tmp", "wb") as handle:
+            handle.write(values)
+        os.replace(filename + ".tmp", filename)
+        built[sig] = values
+        if verbose:
+            counts = [0, 0, 0]
+            for value in values:
+                counts[result(value)[0] + 1] += 1
+            print("%s %d positions, %d won %d lost, %.1f s" % (
+                slice_name(sig), len(values), counts[2], counts[0],
+                time.perf_counter() - start))
+
+
+class EndgameDatabase:
+    """EndgameDatabase(path) - Memory-mapped endgame database files of a
+    directory, see build()
+
+    pieces - largest number of pieces of the positions held, 0 if the
+        directory holds no database
+    """
+
+    def __init__(self, path=DIRECTORY):
+        self.path = path
+        self.__files = dict()  # open (file, mmap) by slice
+        self.__slices = set()
+        try:
+            names = os.listdir(path)
+        except FileNotFoundError:
+            names = []
+        for name in names:
+            (stem, extension) = os.path.splitext(name)
+            if extension == EXTENSION and stem.isdigit() and len(stem) == 4:
+                self.__slices.add(tuple(int(k) for k in stem))
+        # Every slice up to pieces pieces must be there
+        self.pieces = 0
+        for pieces in itertools.count(2):
+            if not set(slices(pieces)) <= self.__slices:
+                break
+            self.pieces = pieces
+
+    def __table(self, sig):
+        "__table(sig) - Memory map of the file of a slice"
+        try:
+            return self.__files[sig][1]
+        except KeyError:
+            handle = open(os.path.join(self.path, slice_name(sig)), "rb")
+            table = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+            if len(table) != slice_size(sig):
+                table.close()
+                handle.close()
+                raise ValueError("%s is not a slice of %d positions" % (
+                    slice_name(sig), slice_size(sig)))
+            self.__files[sig] = (handle, table)
+            return table
+
+    def probe(self, board, player):
+        """probe(board, player) - Database byte of a board with player to
+        move (see result()), None if the board has too many pieces"""
+        if popcount(board.redmask | board.blackmask) > self.pieces:
+            return None
+        groups = board_groups(board)
+        sig = signature(groups)
+        pidx = CheckerBoard.playeridx(player)
+        if not sig[2 * pidx] + sig[2 * pidx + 1]:
+            return 1  # no pieces left, lost
+        if not sig[2 - 2 * pidx] + sig[3 - 2 * pidx]:
+            return None  # game over, not a position
+        return self.__table(sig)[position_index(sig, groups, pidx)]
+
+    def result(self, board, player):
+        """result(board, player) - (LOSS, DRAW or WIN, plies) of a board
+        with player to move, None if the board has too many pieces"""
+        value = self.probe(board, player)
+        return None if value is None else result(value)
+
+    def score(self, board, player, ply=0):
+        """score(board, player, ply) - Utility of a board for player to move,
+        None if the board has too many pieces.  Wins score WIN_SCORE less
+        the plies to the end of the game counting ply plies already played,
+        losses the opposite and draws 0."""
+        value = self.probe(board, player)
+        if value is None:
+            return None
+        if not value:
+            return 0
+        plies = value - 1
+        if plies % 2:
+            return WIN_SCORE - plies - ply
+        return plies + ply - WIN_SCORE
+
+    def best_action(self, board, player):
+        """best_action(board, player) - Action of a board with player to move
+        that wins soonest, draws or loses last.  None if the board has too
+        many pieces or no moves."""
+        if popcount(board.redmask | board.blackmask) > self.pieces:
+            return None
+        other = CheckerBoard.other_player(player)
+        best = None
+        for action in board.get_actions(player):
+            value = self.probe(board.move(action), other)
+            # Order the opponent's results from its shortest loss to its
+            # shortest win
+            if not value:
+                order = MAXPLIES + 1
+            elif value % 2:
+                order = value
+            else:
+                order = 3 * MAXPLIES - value
+            if best is None or order < best[0]:
+                best = (order, action)
+        return None if best is None else best[1]
+
+    def close(self):
+        for (handle, table) in self.__files.values():
+            table.close()
+            handle.close()
+        self.__files.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def load(path=DIRECTORY):
+    """load(path) - EndgameDatabase of a directory, None if there is no
+    database in it"""
+    database = EndgameDatabase(path)
+    return database if database.pieces else None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build a checkers endgame "
+                                                 "database")
+    parser.add_argument("--pieces", type=int, default=PIECES)
+    parser.add_argument("--path", default=DIRECTORY)
+    parser.add_argument("--quiet", action="store_true")
+    args = parser.parse_args()
+    build(args.path, args.pieces, verbose=not args.quiet)
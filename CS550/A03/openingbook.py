@@ -0,0 +1,252 @@
+"""
+openingbook - Opening moves of checkers from the results of played games
+
+The book maps positions, identified by the Zobrist key of the board and
+the player to move, to the moves played in them with how many games each
+was played in and how many points the player scored with it (a win is
+worth a point, a draw half).  It is built from the first depth plies of
+games, either self-play games of a strategy played with tournament.py or
+the games of PDN files (see pdn.py):
+    python openingbook.py --games 200 --depth 10 --budget 0.5
+    python openingbook.py --pdn games.pdn --depth 10
+
+A book file is a header followed by entries of three 64 bit words in
+native byte order, sorted by key:
+    key - board key ^ BLACK_TO_MOVE when black is to move
+    move - checkerboard.encode_action code of the move
+    stats - games << 32 | points doubled
+Files are memory-mapped and looked up by binary search.
+
+ai.Strategy plays a book move, chosen at random with probability
+proportional to its games and smoothed score, while the board has seen
+fewer moves than the depth of the book.
+"""
+
+import argparse
+import mmap
+import os
+import random
+import struct
+
+import tournament
+from checkerboard import (CheckerBoard, decode_action, encode_action)
+from pdn import read_records
+
+PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                    "openings.book")
+DEPTH = 10  # plies of a game recorded in the book
+MINGAMES = 1  # games a move must have been played in to be chosen
+
+# Key of the player to move, XORed into the board key when black moves
+BLACK_TO_MOVE = random.Random(20150302).getrandbits(64)
+
+# Header: magic, depth, number of entries
+HEADER = struct.Struct("=4sIQ")
+MAGIC = b"CKBK"
+ENTRY_WORDS = 3
+
+
+def position_key(board, player):
+    "position_key(board, player) - Book key of a board with player to move"
+    if CheckerBoard.playeridx(player):
+        return board.key ^ BLACK_TO_MOVE
+    return board.key
+
+
+class BookBuilder:
+    """BookBuilder(depth) - Move statistics of the first depth plies of
+    games, to be written as a book file"""
+
+    def __init__(self, depth=DEPTH):
+        self.depth = depth
+        # [games, points doubled] by move code by position key
+        self.positions = dict()
+
+    def add(self, board, player, action, points2, games=1):
+        """add(board, player, action, points2, games) - Count games in which
+        player made action from board and scored points2 half points"""
+        moves = self.positions.setdefault(position_key(board, player), {})
+        stats = moves.setdefault(encode_action(action), [0, 0])
+        stats[0] += games
+        stats[1] += points2
+
+    def add_record(self, record):
+        """add_record(record) - Add the moves of the first depth plies of a
+        finished pdn.GameRecord"""
+        if not record.finished:
+            return
+        board = record.board
+        player = record.first
+        for action in record.moves[:self.depth]:
+            if record.winner is None:
+                points2 = 1
+            else:
+                points2 = 2 if record.winner == player else 0
+            self.add(board, player, action, points2)
+            board = board.move(action)
+            player = CheckerBoard.other_player(player)
+
+    def __len__(self):
+        "Number of (position, move) entries"
+        return sum(len(moves) for moves in self.positions.values())
+
+    def write(self, path=PATH):
+        """write(path) - Write the book file"""
+        words = []
+        for key in sorted(self.positions):
+            for (code, (games, points2)) in sorted(
+                    self.positions[key].items()):
+                words.extend((key, code, games << 32 | points2))
+        with open(path, "wb") as handle:
+            handle.write(HEADER.pack(MAGIC, self.depth, len(words) // 3))
+            handle.write(struct.pack("=%dQ" % len(words), *words))
+
+
+class OpeningBook:
+    """OpeningBook(path, depth) - Memory-mapped book file
+
+    depth - plies of a game in which the book is used, at most the depth
+        the book was built with (the default)
+    """
+
+    def __init__(self, path=PATH, depth=None):
+        self.path = path
+        self.__words = None
+        self.__handle = open(path, "rb")
+        try:
+            self.__map = mmap.mmap(self.__handle.fileno(), 0,
+                                   access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            self.__handle.close()
+            raise ValueError("%s is not an opening book" % path)
+        (magic, built, self.entries) = HEADER.unpack_from(self.__map) \
+            if len(self.__map) >= HEADER.size else (None, 0, 0)
+        if magic != MAGIC or len(self.__map) != \
+                HEADER.size + 8 * ENTRY_WORDS * self.entries:
+            self.close()
+            raise ValueError("%s is not an opening book" % path)
+        self.depth = built if depth is None else min(depth, built)
+        self.__words = memoryview(self.__map)[HEADER.size:].cast("Q")
+
+    def __first(self, key):
+        "__first(key) - Index of the first entry with key or a larger one"
+        (low, high) = (0, self.entries)
+        words = self.__words
+        while low < high:
+            middle = (low + high) // 2
+            if words[ENTRY_WORDS * middle] < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def moves(self, board, player):
+        """moves(board, player) - List of (action, games, points) of the
+        book moves of player on board"""
+        key = position_key(board, player)
+        words = self.__words
+        result = []
+        index = self.__first(key)
+        while index < self.entries and words[ENTRY_WORDS * index] == key:
+            (code, stats) = words[ENTRY_WORDS * index + 1:
+                                  ENTRY_WORDS * index + 3]
+            result.append((decode_action(code), stats >> 32,
+                           (stats & 0xffffffff) / 2))
+            index += 1
+        return result
+
+    def choose(self, board, player, rng=random, mingames=MINGAMES):
+        """choose(board, player, rng, mingames) - Book move of player on
+        board at random, weighing each move by its games times its score
+        (smoothed by a won and a lost game), or None if the board is past
+        the depth of the book or not in it.  Moves played in fewer than
+        mingames games and moves that are not legal (key collisions) are
+        not chosen."""
+        if board.movecount >= self.depth:
+            return None
+        candidates = self.moves(board, player)
+        if not candidates:
+            return None
+        legal = board.get_actions(player)
+        actions = []
+        weights = []
+        for (action, games, points) in candidates:
+            if games >= mingames and action in legal:
+                actions.append(action)
+                weights.append(games * (points + 1) / (games + 2))
+        if not actions:
+            return None
+        return rng.choices(actions, weights)[0]
+
+    def close(self):
+        if self.__words is not None:
+            self.__words.release()
+            self.__words = None
+        if self.__map is not None:
+            self.__map.close()
+            self.__map = None
+        self.__handle.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def load(path=PATH):
+    """load(path) - OpeningBook of a file, None if there is no file"""
+    return OpeningBook(path) if os.path.exists(path) else None
+
+
+def selfplay(builder, strategy="ai", games=100, maxplies=4, budget=0.5,
+             maxnodes=None, workers=None, seed=tournament.SEED,
+             plies=tournament.OPENING_PLIES, verbose=True):
+    """selfplay(builder, strategy, games, maxplies, budget, maxnodes,
+    workers, seed, plies, verbose)
+    Add games of the named strategy against itself to a BookBuilder,
+    played by tournament.tournament from openings of plies random moves.
+    The random moves are recorded too, their results decide how often
+    they are chosen.  Returns the tournament results.
+    """
+    results = tournament.tournament(
+        strategy, strategy, games, maxplies, budget, maxnodes, workers,
+        seed, plies=plies, verbose=verbose)
+    for result in results:
+        builder.add_record(result["record"])
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build a checkers opening "
+                                                 "book")
+    parser.add_argument("--path", default=PATH)
+    parser.add_argument("--depth", type=int, default=DEPTH)
+    parser.add_argument("--pdn", action="append",
+                        help="add the games of a PDN file instead of "
+                             "self-play games, may be repeated")
+    parser.add_argument("--strategy", default="ai")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--maxplies", type=int, default=4)
+    parser.add_argument("--budget", type=float, default=0.5,
+                        help="seconds per move, 0 for no limit")
+    parser.add_argument("--maxnodes", type=int)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int, default=tournament.SEED)
+    parser.add_argument("--plies", type=int,
+                        default=tournament.OPENING_PLIES,
+                        help="random moves of the self-play openings")
+    parser.add_argument("--quiet", action="store_true")
+    args = parser.parse_args()
+    builder = BookBuilder(args.depth)
+    if args.pdn:
+        for path in args.pdn:
+            for record in read_records(path):
+                builder.add_record(record)
+    else:
+        selfplay(builder, args.strategy, args.games, args.maxplies,
+                 args.budget or None, args.maxnodes, args.workers,
+                 args.seed, args.plies, verbose=not args.quiet)
+    builder.write(args.path)
+    print("%d moves of %d positions in %s" % (
+        len(builder), len(builder.positions), args.path))
@@ -0,0 +1,342 @@
+"""
+parallelsearch - Alpha beta searches on several processes
+
+Two ways of using more than one core for an ai.AlphaBetaSearch:
+
+split - Root split in the manner of Young Brothers Wait:  the first root
+    move is searched to get a bound, then the other root moves are
+    searched by a pool of worker processes.  Workers share the best value
+    found so far and use it as alpha when they start.  Moves that fail low
+    against the shared value but may tie with the best are searched again,
+    so the move and value are those of a serial search.
+
+lazysmp - Lazy SMP:  every worker searches the whole tree, each starting
+    with the root moves in a different order, sharing a transposition
+    table in shared memory (SharedTranspositionTable).  Helpers fill the
+    table for the main worker, which searches in the serial order, and
+    are stopped when it is done.
+
+with ParallelSearch(strategy, 'r', 'b', 8, workers=4) as search:
+    best_move = search.search(some_checker_board)
+    print(search.report())
+"""
+
+import math
+import os
+import time
+from concurrent.futures import (ProcessPoolExecutor, wait)
+from multiprocessing import (Event, Value)
+from multiprocessing.shared_memory import SharedMemory
+
+import ai
+from checkerboard import CheckerBoard
+
+MODES = ("split", "lazysmp")
+
+# SharedTranspositionTable entries are three 64 bit words:
+#   check - key ^ data ^ move, detects entries torn by concurrent writes
+#   data - value + VALUE_OFFSET (32 bits), draft (8), bound (8) and
+#       generation (16)
+#   move - the best move, an integer move of CheckerBoard.generate_moves
+#       or 0 for none
+WORDS = 3
+VALUE_OFFSET = 1 << 31
+INFINITE = VALUE_OFFSET - 1  # stored for math.inf, negated for -math.inf
+
+
+def _encode_value(value):
+    if value == math.inf:
+        value = INFINITE
+    elif value == -math.inf:
+        value = -INFINITE
+    return int(value) + VALUE_OFFSET
+
+
+def _decode_value(code):
+    value = code - VALUE_OFFSET
+    if value == INFINITE:
+        return math.inf
+    if value == -INFINITE:
+        return -math.inf
+    return value
+
+
+class SharedTranspositionTable(ai.TranspositionTable):
+    """SharedTranspositionTable - ai.TranspositionTable kept in shared
+    memory so that processes can use it at the same time
+
+    The creating process passes name to the others, which attach to the
+    table with SharedTranspositionTable(size, name).  Entries are written
+    without locks; a torn entry fails the check word and reads as a miss.
+    Values must be integers or infinite and moves integer moves (see
+    CheckerBoard.generate_moves).  Statistics are per process.
+    The generation is kept in the first word of the memory so that
+    new_search() in one process applies to all of them.
+    """
+
+    def __init__(self, size=1 << 16, name=None):
+        self.size = size
+        words = 1 + 2 * size * WORDS
+        if name is None:
+            self.memory = SharedMemory(create=True, size=8 * words)
+            self.owner = True
+        else:
+            self.memory = SharedMemory(name=name)
+            self.owner = False
+        self.name = self.memory.name
+        self.words = self.memory.buf.cast("Q")
+        if self.owner:
+            self.clear()
+        self.probes = self.hits = self.cutoffs = 0
+        self.stores = self.overwrites = 0
+
+    @property
+    def generation(self):
+        return self.words[0]
+
+    def new_search(self):
+        """new_search() - Start a search, older deep entries may be replaced.
+        Only the creating process starts searches, this does nothing in
+        the others."""
+        if self.owner:
+            self.words[0] = (self.words[0] + 1) & 0xffff
+
+    def __slot(self, index):
+        "__slot - (key, data, move) of slot index, key None if torn or empty"
+        first = 1 + index * WORDS
+        (check, data, move) = self.words[first:first + WORDS]
+        if not data:
+            return None, 0, 0
+        return check ^ data ^ move, data, move
+
+    def __write(self, index, key, data, move):
+        first = 1 + index * WORDS
+        self.words[first + 1] = data
+        self.words[first + 2] = move
+        self.words[first] = key ^ data ^ move
+
+    def probe(self, key):
+        """probe(key) - Entry (key, draft, value, bound, move, generation)
+        stored for a key or None"""
+        self.probes += 1
+        bucket = 2 * (key % self.size)
+        for index in (bucket, bucket + 1):
+            (stored, data, move) = self.__slot(index)
+            if stored == key:
+                self.hits += 1
+                return (key, data >> 32 & 0xff, _decode_value(data & 0xffffffff),
+                        data >> 40 & 0xff, move or None, data >> 48)
+        return None
+
+    def store(self, key, draft, value, bound, move):
+        "store(key, draft, value, bound, move) - Record a search result"
+        self.stores += 1
+        bucket = 2 * (key % self.size)
+        generation = self.generation
+        data = _encode_value(value) | min(draft, 0xff) << 32 | \
+            bound << 40 | generation << 48
+        code = move or 0
+        (deepkey, deepdata, deepmove) = self.__slot(bucket)
+        if deepkey is None or deepkey == key or \
+                draft >= (deepdata >> 32 & 0xff) or \
+                deepdata >> 48 != generation:
+            if deepkey is not None and deepkey != key:
+                # Demote the deep entry rather than losing it
+                self.overwrites += self.__slot(bucket + 1)[0] is not None
+                self.__write(bucket + 1, deepkey, deepdata, deepmove)
+            self.__write(bucket, key, data, code)
+        else:
+            recent = self.__slot(bucket + 1)[0]
+            self.overwrites += recent is not None and recent != key
+            self.__write(bucket + 1, key, data, code)
+
+    def clear(self):
+        "clear() - Remove all entries and reset the statistics"
+        self.memory.buf[:] = bytes(len(self.memory.buf))
+        self.probes = self.hits = self.cutoffs = 0
+        self.stores = self.overwrites = 0
+
+    def __len__(self):
+        return sum(1 for index in range(2 * self.size)
+                   if self.words[2 + index * WORDS])
+
+    def close(self):
+        """close() - Detach from the shared memory, and free it if this
+        process created the table"""
+        if self.words is not None:
+            self.words.release()
+            self.words = None
+            self.memory.close()
+            if self.owner:
+                self.memory.unlink()
+
+
+# State of a worker process, set by _initialize
+_worker = dict()
+
+
+def _initialize(strategy_class, maxplayer, minplayer, maxplies, alpha, stop,
+                tablename, tablesize):
+    "_initialize - Set up a worker process of a ParallelSearch"
+    _worker.update(
+        strategy=strategy_class(maxplayer, CheckerBoard, maxplies),
+        maxplayer=maxplayer, minplayer=minplayer, maxplies=maxplies,
+        alpha=alpha, stop=stop,
+        table=None if tablename is None else
+        SharedTranspositionTable(tablesize, tablename))
+
+
+def _search_move(state, index, action):
+    """_search_move - Search a root move with the shared best value as
+    alpha.  Returns (index, value, alpha used, nodes)."""
+    shared = _worker["alpha"]
+    alpha = shared.value
+    search = ai.AlphaBetaSearch(_worker["strategy"], _worker["maxplayer"],
+                                _worker["minplayer"], _worker["maxplies"])
+    (value, _) = search.min_value(state.move(action), alpha, math.inf, 1)
+    with shared.get_lock():
+        if value > shared.value:
+            shared.value = value
+    return (index, value, alpha, search.nodes)
+
+
+def _search_tree(state, first):
+    """_search_tree - Lazy SMP search of the whole tree with the shared
+    table, root move first searched first.  Helpers (first is not None)
+    stop when the main search is done.  Returns (action, value, nodes),
+    action and value are None for a stopped helper."""
+    search = ai.AlphaBetaSearch(
+        _worker["strategy"], _worker["maxplayer"], _worker["minplayer"],
+        _worker["maxplies"], table=_worker["table"],
+        pv=None if first is None else [first],
+        stop=None if first is None else _worker["stop"])
+    try:
+        action = search.alphabeta(state)
+    except ai.SearchTimeout:
+        return (None, None, search.nodes)
+    return (action, search.value, search.nodes)
+
+
+class ParallelSearch:
+    """ParallelSearch
+    Alpha beta search to a fixed depth with a pool of worker processes,
+    see the module documentation for the modes.  Workers create their own
+    instance of the class of strategy.  Call close(), or use a with
+    statement, to stop the workers.
+    """
+
+    def __init__(self, strategy, maxplayer, minplayer, maxplies=8,
+                 workers=None, mode="split", tablesize=1 << 16):
+        """ParallelSearch - Arguments as for ai.AlphaBetaSearch
+        workers - number of worker processes, the number of cores if None
+        mode - "split" or "lazysmp"
+        tablesize - buckets of the shared transposition table of lazysmp
+        """
+        if mode not in MODES:
+            raise ValueError("Unknown parallel search mode %s" % mode)
+        self.strategy = strategy
+        self.maxplayer = maxplayer
+        self.minplayer = minplayer
+        self.maxplies = maxplies
+        self.mode = mode
+        self.workers = workers or os.cpu_count()
+        self.alpha = Value("d", -math.inf)
+        self.stop = Event()
+        self.table = None
+        if mode == "lazysmp":
+            self.table = SharedTranspositionTable(tablesize)
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers, initializer=_initialize,
+            initargs=(type(strategy), maxplayer, minplayer, maxplies,
+                      self.alpha, self.stop,
+                      None if self.table is None else self.table.name,
+                      tablesize))
+        # Statistics of the last search
+        self.nodes = 0
+        self.elapsed = 0.0
+        self.value = None
+
+    def search(self, state: CheckerBoard) -> tuple:
+        """search(state) - Best action from state, None if there is none"""
+        start = time.perf_counter()
+        if self.mode == "split":
+            action = self.__split(state)
+        else:
+            action = self.__lazysmp(state)
+        self.elapsed = time.perf_counter() - start
+        return action
+
+    def __split(self, state):
+        "__split - Root split search"
+        serial = ai.AlphaBetaSearch(self.strategy, self.maxplayer,
+                                    self.minplayer, self.maxplies)
+        self.nodes = 1  # root
+        if state.is_terminal()[0]:
+            self.value = self.strategy.utility(state)
+            return None
+        actions = serial.root_actions(state)
+        self.value = -math.inf
+        if not actions:
+            return None
+
+        # The eldest brother sets the bound for the others
+        self.alpha.value = -math.inf
+        results = [self.executor.submit(_search_move, state, 0,
+                                        actions[0]).result()]
+        futures = [self.executor.submit(_search_move, state, index, action)
+                   for (index, action) in enumerate(actions[1:], 1)]
+        results.extend(future.result() for future in futures)
+        self.nodes += sum(nodes for (_i, _v, _a, nodes) in results)
+
+        # Values above the alpha a move was searched with are exact, the
+        # others are upper bounds.  A serial search picks the first move
+        # of the best value, so bounds equal to it are searched again.
+        exact = [alpha == -math.inf or value > alpha
+                 for (_i, value, alpha, _n) in results]
+        best = max(value for ((_i, value, _a, _n), known)
+                   in zip(results, exact) if known)
+        for ((index, value, _alpha, _nodes), known) in zip(results, exact):
+            if value == best and not known:
+                (value, _) = serial.min_value(state.move(actions[index]),
+                                              -math.inf, math.inf, 1)
+            if value == best:
+                self.nodes += serial.nodes
+                self.value = best
+                return actions[index]
+
+    def __lazysmp(self, state):
+        "__lazysmp - Lazy SMP search"
+        self.stop.clear()
+        self.table.new_search()
+        actions = state.get_actions(self.maxplayer)
+        main = self.executor.submit(_search_tree, state, None)
+        helpers = [self.executor.submit(_search_tree, state,
+                                        actions[helper % len(actions)])
+                   for helper in range(1, self.workers) if actions]
+        (action, self.value, self.nodes) = main.result()
+        self.stop.set()
+        wait(helpers)
+        self.nodes += sum(helper.result()[2] for helper in helpers)
+        return action
+
+    def nps(self):
+        "nps() - Nodes per second of the last search"
+        return self.nodes / self.elapsed if self.elapsed else 0.0
+
+    def report(self):
+        "report() - Summary of the last search"
+        return "{} with {} workers: {} nodes in {:.2f} s ({:.0f} nodes/s)".format(
+            self.mode, self.workers, self.nodes, self.elapsed, self.nps())
+
+    def close(self):
+        "close() - Stop the workers and free the shared table"
+        self.stop.set()
+        self.executor.shutdown()
+        if self.table is not None:
+            self.table.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
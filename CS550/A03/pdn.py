@@ -0,0 +1,198 @@
+"""
+pdn - Game records in a PDN (Portable Draughts Notation) like format
+
+A record is a few tag lines followed by the moves, e.g.
+
+    [Red "ai.Strategy"]
+    [Black "lucky.Strategy"]
+    [Result "1-0"]
+    [FEN "W:W21,22,23,24,25,26,27,28,29,30,31,32:B1,2,3,4,5,6,7,8,9,10,11,12"]
+    1. 22-17 9-13 2. 17x10 6x15 3. ...
+
+Squares are numbered 1 to 32 as in standard notation, left to right from
+the top row of the board (see checkerboard.SQUARES).  Red plays the role
+of PDN's White (W).  A simple move is written from-to and a capture lists
+every square the piece lands on, from x to x to ..., so moves decode to
+CheckerBoard actions without ambiguity.  The FEN tag gives the starting
+position and the player to move first, K marks kings.  Results are
+"1-0" red won, "0-1" black won, "1/2-1/2" drawn and "*" unfinished.
+"""
+
+import re
+
+from checkerboard import (CheckerBoard, SQUARES, square)
+
+RESULTS = {'r': "1-0", 'b': "0-1", None: "1/2-1/2"}
+# FEN colors by player
+COLORS = {'r': "W", 'b': "B"}
+PLAYERS = {color: player for (player, color) in COLORS.items()}
+
+_TAG = re.compile(r'\[(\w+)\s+"([^"]*)"\]')
+_MOVE_NUMBER = re.compile(r'^\d+\.$')
+
+
+def move_text(action):
+    """move_text(action) - Text of a CheckerBoard action, 11-15 or 15x24x31"""
+    separator = "x" if len(action[1]) > 2 else "-"
+    return separator.join(str(square(position[0], position[1]) + 1)
+                          for position in action)
+
+
+def parse_move(text):
+    """parse_move(text) - CheckerBoard action of a move written by
+    move_text.  Raises ValueError if it is not a move."""
+    try:
+        path = [SQUARES[int(number) - 1]
+                for number in re.split("[-x]", text)]
+    except (ValueError, IndexError):
+        raise ValueError("Bad move %s" % text)
+    if len(path) < 2 or "-" in text and len(path) != 2:
+        raise ValueError("Bad move %s" % text)
+    action = [path[0]]
+    for ((r, c), (nr, nc)) in zip(path, path[1:]):
+        if "x" in text:
+            action.append((nr, nc, ((r + nr) // 2, (c + nc) // 2)))
+        else:
+            action.append((nr, nc))
+    return action
+
+
+def fen(board, player):
+    """fen(board, player) - FEN text of a board with player to move"""
+    fields = [COLORS[player]]
+    for (color, pieces) in (("W", CheckerBoard.players[0]),
+                            ("B", CheckerBoard.players[1])):
+        squares = ["%s%d" % ("K" if board.isking(piece) else "",
+                             square(r, c) + 1)
+                   for (r, c, piece) in board if piece in pieces]
+        fields.append(color + ",".join(squares))
+    return ":".join(fields)
+
+
+def parse_fen(text):
+    """parse_fen(text) - (board, player to move) of FEN text.
+    Raises ValueError if it is not a position."""
+    try:
+        (turn, *sides) = text.strip().split(":")
+        board = CheckerBoard()
+        board.clearboard()
+        for side in sides:
+            (pawn, king) = CheckerBoard.piece_types(PLAYERS[side[0]])
+            for field in filter(None, side[1:].split(",")):
+                piece = king if field.startswith("K") else pawn
+                (r, c) = SQUARES[int(field.lstrip("K")) - 1]
+                board.place(r, c, piece)
+        board.update_counts()
+        return board, PLAYERS[turn]
+    except (KeyError, IndexError, ValueError):
+        raise ValueError("Bad FEN %s" % text)
+
+
+class GameRecord:
+    """GameRecord - Players, starting position, moves and result of a game
+
+    tags - dict of other PDN tags (e.g. Opening), kept in order
+    """
+
+    def __init__(self, red, black, board=None, first='r', moves=None,
+                 winner=None, finished=True, tags=None):
+        """GameRecord(red, black, board, first, moves, winner, finished,
+        tags)
+        red, black - names of the players
+        board - starting position, a new game if None
+        first - player moving first
+        moves - list of CheckerBoard actions
+        winner - 'r', 'b' or None for a draw
+        finished - False if the game was not played to its end
+        """
+        self.red = red
+        self.black = black
+        self.board = CheckerBoard() if board is None else board
+        self.first = first
+        self.moves = [] if moves is None else moves
+        self.winner = winner
+        self.finished = finished
+        self.tags = dict() if tags is None else tags
+
+    @property
+    def result(self):
+        "result - PDN result text"
+        return RESULTS[self.winner] if self.finished else "*"
+
+    def text(self):
+        """text() - The record as PDN text, ending with a blank line"""
+        lines = ['[Red "%s"]' % self.red,
+                 '[Black "%s"]' % self.black,
+                 '[Result "%s"]' % self.result,
+                 '[FEN "%s"]' % fen(self.board, self.first)]
+        lines.extend('[%s "%s"]' % item for item in self.tags.items())
+        words = []
+        for (ply, action) in enumerate(self.moves):
+            if ply % 2 == 0:
+                words.append("%d." % (ply // 2 + 1))
+            words.append(move_text(action))
+        words.append(self.result)
+        lines.append(" ".join(words))
+        return "\n".join(lines) + "\n\n"
+
+    @classmethod
+    def from_text(cls, text):
+        """from_text(text) - GameRecord of the PDN text of one game.
+        Raises ValueError if the text cannot be read."""
+        tags = dict()
+        words = []
+        for line in text.strip().splitlines():
+            match = _TAG.match(line.strip())
+            if match:
+                tags[match.group(1)] = match.group(2)
+            else:
+                words.extend(line.split())
+        try:
+            (red, black, result) = (tags.pop("Red"), tags.pop("Black"),
+                                    tags.pop("Result"))
+        except KeyError as missing:
+            raise ValueError("Game record without %s tag" % missing)
+        (board, first) = parse_fen(tags.pop("FEN")) if "FEN" in tags \
+            else (CheckerBoard(), 'r')
+        if words and words[-1] == result:
+            words.pop()
+        moves = [parse_move(word) for word in words
+                 if not _MOVE_NUMBER.match(word)]
+        winners = {text: player for (player, text) in RESULTS.items()}
+        if result != "*" and result not in winners:
+            raise ValueError("Bad result %s" % result)
+        return cls(red, black, board, first, moves, winners.get(result),
+                   result != "*", tags)
+
+    def boards(self):
+        """boards() - Generate the board before each move and after the last
+        one.  Raises ValueError if a move is not legal."""
+        board = self.board
+        player = self.first
+        yield board
+        for action in self.moves:
+            board = board.move(action, validate=board.get_actions(player))
+            player = CheckerBoard.other_player(player)
+            yield board
+
+
+def write_records(path, records, mode="w"):
+    """write_records(path, records, mode) - Write GameRecords to a file,
+    mode "a" appends to it"""
+    with open(path, mode) as handle:
+        for record in records:
+            handle.write(record.text())
+
+
+def read_records(path):
+    """read_records(path) - Generate the GameRecords of a file"""
+    with open(path) as handle:
+        game = []
+        for line in handle:
+            if line.strip():
+                game.append(line)
+            elif game:
+                yield GameRecord.from_text("".join(game))
+                game = []
+        if game:
+            yield GameRecord.from_text("".join(game))
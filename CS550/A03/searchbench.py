@@ -0,0 +1,121 @@
+"""
+searchbench - Measurements of the checkers searches
+
+Effective branching factor of iterative deepening searches with different
+move ordering heuristics (see ai.ORDERING) on the boardlibrary positions:
+    python searchbench.py --maxplies 6
+
+Speedup of the parallel searches (see parallelsearch) over a serial
+search for 1, 2 and 4 workers:
+    python searchbench.py --maxplies 8 --workers 1 2 4
+"""
+
+import argparse
+import time
+
+import ai
+import boardlibrary
+import checkerboard
+import parallelsearch
+
+# Move orderings compared by default
+ORDERINGS = {"none": (),
+             "tt": ("tt",),
+             "pv+tt": ("pv", "tt"),
+             "all": ai.ORDERING}
+
+
+def ordering_benchmark(maxplies=6, orderings=ORDERINGS, boards=None,
+                       verbose=True):
+    """ordering_benchmark(maxplies, orderings, boards, verbose)
+    Search every board of a dict (boardlibrary.boards by default) for both
+    players to maxplies with each named ordering.  Returns a dict of
+    (board name, player, ordering name) to (nodes, effective branching
+    factor).  The depth of the effective branching factor is maxplies + 1,
+    AlphaBetaSearch evaluates positions below maxplies.
+    """
+    if boards is None:
+        boards = boardlibrary.boards
+    results = dict()
+    for (name, board) in boards.items():
+        for player in checkerboard.CheckerBoard.pawns:
+            strategy = ai.Strategy(player, checkerboard.CheckerBoard,
+                                   maxplies, budget=None)
+            for (label, ordering) in orderings.items():
+                search = ai.IterativeDeepeningSearch(
+                    strategy, strategy.maxplayer, strategy.minplayer,
+                    maxplies, budget=None, table=ai.TranspositionTable(),
+                    ordering=ordering)
+                search.search(board)
+                ebf = ai.effective_branching_factor(search.nodes, maxplies + 1)
+                results[(name, player, label)] = (search.nodes, ebf)
+                if verbose:
+                    print("%-16s %s %-6s %8d nodes  EBF %.2f" % (
+                        name, player, label, search.nodes, ebf))
+    return results
+
+
+def summarize(results, orderings=ORDERINGS):
+    """summarize(results, orderings) - Print the total nodes and mean
+    effective branching factor of each ordering"""
+    for label in orderings:
+        values = [value for (key, value) in results.items() if key[2] == label]
+        nodes = sum(n for (n, _ebf) in values)
+        ebf = sum(ebf for (_n, ebf) in values) / len(values)
+        print("%-6s %9d nodes  mean EBF %.2f" % (label, nodes, ebf))
+
+
+def parallel_benchmark(maxplies=6, workers=(1, 2, 4),
+                       modes=parallelsearch.MODES, boards=None, player='r'):
+    """parallel_benchmark(maxplies, workers, modes, boards, player)
+    Time the parallel searches of each mode and number of workers against
+    a serial ai.AlphaBetaSearch on every board of a dict (boardlibrary
+    positions by default) and print the speedups.  Returns a dict of
+    (mode, workers) to speedup over all boards.  Raises RuntimeError if a
+    parallel search finds a different value than the serial one.
+    """
+    if boards is None:
+        boards = boardlibrary.boards
+    strategy = ai.Strategy(player, checkerboard.CheckerBoard, maxplies,
+                           budget=None)
+    serial = dict()
+    for (name, board) in boards.items():
+        search = ai.AlphaBetaSearch(strategy, strategy.maxplayer,
+                                    strategy.minplayer, maxplies)
+        start = time.perf_counter()
+        search.alphabeta(board)
+        serial[name] = (search.value, time.perf_counter() - start)
+    total = sum(elapsed for (_value, elapsed) in serial.values())
+    print("serial %.2f s" % total)
+
+    speedups = dict()
+    for mode in modes:
+        for count in workers:
+            elapsed = 0.0
+            with parallelsearch.ParallelSearch(
+                    strategy, strategy.maxplayer, strategy.minplayer,
+                    maxplies, workers=count, mode=mode) as search:
+                for (name, board) in boards.items():
+                    search.search(board)
+                    if search.value != serial[name][0]:
+                        raise RuntimeError("%s found %s for %s, serial %s" % (
+                            mode, search.value, name, serial[name][0]))
+                    elapsed += search.elapsed
+            speedups[(mode, count)] = total / elapsed
+            print("%-7s %2d workers %.2f s  speedup %.2f" % (
+                mode, count, elapsed, speedups[(mode, count)]))
+    return speedups
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure checkers searches")
+    parser.add_argument("--maxplies", type=int, default=6)
+    parser.add_argument("--workers", type=int, nargs="+",
+                        help="compare parallel searches with these numbers "
+                             "of workers instead of move orderings")
+    parser.add_argument("--quiet", action="store_true")
+    args = parser.parse_args()
+    if args.workers:
+        parallel_benchmark(args.maxplies, args.workers)
+    else:
+        summarize(ordering_benchmark(args.maxplies, verbose=not args.quiet))
@@ -0,0 +1,241 @@
+"""
+tournament - Headless matches between checkers strategies
+
+Plays games between two abstractstrategy.Strategy subclasses, named
+module.Class (a bare module name means module.Strategy), in worker
+processes without the prints of checkers.Game.  Games are played in
+pairs: both games of a pair start from the same opening, a boardlibrary
+position followed by a few seeded random moves, with the colors swapped,
+so neither strategy profits from an easy opening.  Strategies with budget
+and/or maxnodes attributes (e.g. ai.Strategy) are limited to the given
+seconds and nodes per move.
+
+The match is reported as the first strategy's wins, losses and draws with
+its score, and the Elo difference it implies, with 95% confidence
+intervals.  Games are written to a PDN-like file (see pdn.py) as they
+finish.
+
+Example, 100 games of ai against lucky at 0.5 s per move:
+    python tournament.py ai lucky --games 100 --budget 0.5 --pdn games.pdn
+"""
+
+import argparse
+import importlib
+import math
+import os
+import random
+import time
+from concurrent.futures import (ProcessPoolExecutor, as_completed)
+
+import boardlibrary
+from checkerboard import CheckerBoard
+from pdn import (GameRecord, write_records)
+
+SEED = 550
+OPENING_PLIES = 4  # random moves of an opening
+Z95 = 1.959964  # normal quantile of 95% confidence intervals
+
+
+def load_strategy(name):
+    """load_strategy(name) - Strategy class of a module.Class name, a module
+    name alone means its Strategy class"""
+    (module, _, cls) = name.partition(".")
+    return getattr(importlib.import_module(module), cls or "Strategy")
+
+
+def opening(seed, plies=OPENING_PLIES, start="Pristine"):
+    """opening(seed, plies, start) - List of plies random moves from the
+    named boardlibrary board with red to move, the same for the same seed.
+    Fewer moves are returned if the game ends first."""
+    rng = random.Random(seed)
+    board = boardlibrary.boards[start]
+    player = 'r'
+    moves = []
+    for _ply in range(plies):
+        actions = board.get_actions(player)
+        if board.is_terminal()[0] or not actions:
+            break
+        action = rng.choice(actions)
+        moves.append(action)
+        board = board.move(action)
+        player = CheckerBoard.other_player(player)
+    return moves
+
+
+def play_game(game, red, black, moves=(), start="Pristine", maxplies=4,
+              budget=None, maxnodes=None, seed=SEED):
+    """play_game(game, red, black, moves, start, maxplies, budget, maxnodes,
+    seed)
+    Play game number game between the named red and black strategies from
+    the named boardlibrary board after the opening moves.  random is
+    seeded with seed so that strategies using it play the same game again.
+    Returns a dict of the game, red, black, winner ('r', 'b' or None for a
+    draw), plies, elapsed seconds and the pdn.GameRecord.
+    """
+    random.seed(seed)
+    strategies = dict()
+    for (player, name) in (('r', red), ('b', black)):
+        strategy = load_strategy(name)(player, CheckerBoard, maxplies)
+        if hasattr(strategy, "budget"):
+            strategy.budget = budget
+        if hasattr(strategy, "maxnodes"):
+            strategy.maxnodes = maxnodes
+        strategies[player] = strategy
+
+    record = GameRecord(red, black, boardlibrary.boards[start],
+                        moves=list(moves),
+                        tags={"Game": game, "Opening": start, "Seed": seed})
+    board = boardlibrary.boards[start]
+    player = 'r'
+    for action in moves:
+        board = board.move(action)
+        player = CheckerBoard.other_player(player)
+
+    startclock = time.perf_counter()
+    (terminal, winner) = board.is_terminal()
+    while not terminal:
+        (board, action) = strategies[player].play(board)
+        if action is None:
+            # Forfeit
+            winner = CheckerBoard.other_player(player)
+            break
+        record.moves.append(action)
+        player = CheckerBoard.other_player(player)
+        (terminal, winner) = board.is_terminal()
+    record.winner = winner
+    return {"game": game,
+            "red": red,
+            "black": black,
+            "winner": winner,
+            "plies": len(record.moves),
+            "elapsed": time.perf_counter() - startclock,
+            "record": record}
+
+
+def tournament(first, second, games=10, maxplies=4, budget=1.0,
+               maxnodes=None, workers=None, seed=SEED, start="Pristine",
+               plies=OPENING_PLIES, pdn_path=None, verbose=True):
+    """tournament(first, second, games, maxplies, budget, maxnodes, workers,
+    seed, start, plies, pdn_path, verbose)
+    Play games between the named strategies in worker processes, first
+    is red in even numbered games and black in odd ones.  Each pair of
+    games starts from an opening of plies random moves from the named
+    boardlibrary board.  Games are written to pdn_path as they finish if
+    given.  Returns the play_game dicts in game order.
+    """
+    rng = random.Random(seed)
+    seeds = [rng.getrandbits(32) for _game in range(games)]
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = []
+        for game in range(games):
+            (red, black) = (first, second) if game % 2 == 0 else \
+                (second, first)
+            moves = opening(seeds[game - game % 2], plies, start)
+            futures.append(executor.submit(
+                play_game, game, red, black, moves, start, maxplies, budget,
+                maxnodes, seeds[game]))
+        if pdn_path:
+            # Truncate, games are appended as they finish
+            write_records(pdn_path, [])
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            if pdn_path:
+                write_records(pdn_path, [result["record"]], "a")
+            if verbose:
+                print("Game #%d %s vs %s: %s in %d plies, %.1f s" % (
+                    result["game"] + 1, result["red"], result["black"],
+                    result["record"].result, result["plies"],
+                    result["elapsed"]))
+    results.sort(key=lambda result: result["game"])
+    return results
+
+
+def score(results):
+    """score(results) - (wins, losses, draws) of the first strategy of a
+    tournament, red in even numbered games, so that a strategy can play
+    itself"""
+    (wins, losses, draws) = (0, 0, 0)
+    for result in results:
+        if result["winner"] is None:
+            draws += 1
+        elif (result["winner"] == 'r') == (result["game"] % 2 == 0):
+            wins += 1
+        else:
+            losses += 1
+    return (wins, losses, draws)
+
+
+def elo_difference(fraction):
+    """elo_difference(fraction) - Elo rating difference at which a player
+    expects to score fraction of the points, infinite at 0 and 1"""
+    if fraction <= 0.0:
+        return -math.inf
+    if fraction >= 1.0:
+        return math.inf
+    return -400.0 * math.log10(1.0 / fraction - 1.0)
+
+
+def win_rate(wins, losses, draws, z=Z95):
+    """win_rate(wins, losses, draws, z) - (score, low, high), the fraction of
+    the points scored, draws counting half, and its confidence interval by
+    the normal approximation (z = 1.96 for 95%)"""
+    games = wins + losses + draws
+    if not games:
+        return (0.5, 0.0, 1.0)
+    fraction = (wins + draws / 2) / games
+    variance = (wins * (1 - fraction) ** 2 + losses * fraction ** 2 +
+                draws * (0.5 - fraction) ** 2) / games
+    error = z * math.sqrt(variance / games)
+    return (fraction, max(0.0, fraction - error), min(1.0, fraction + error))
+
+
+def elo(wins, losses, draws, z=Z95):
+    """elo(wins, losses, draws, z) - (difference, low, high), the Elo
+    difference of a player's results and its confidence interval"""
+    return tuple(elo_difference(fraction)
+                 for fraction in win_rate(wins, losses, draws, z))
+
+
+def summarize(results, first, second):
+    """summarize(results, first, second) - Print the match result from the
+    first strategy's point of view"""
+    (wins, losses, draws) = score(results)
+    (fraction, low, high) = win_rate(wins, losses, draws)
+    (difference, elolow, elohigh) = elo(wins, losses, draws)
+    plies = sum(result["plies"] for result in results)
+    elapsed = sum(result["elapsed"] for result in results)
+    print("%s vs %s: +%d -%d =%d" % (first, second, wins, losses, draws))
+    print("Score %.1f%% [%.1f%%, %.1f%%]" % (
+        100 * fraction, 100 * low, 100 * high))
+    print("Elo %+.0f [%+.0f, %+.0f]" % (difference, elolow, elohigh))
+    print("%d plies, %.3f s per ply" % (plies, elapsed / max(plies, 1)))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Play checkers strategies "
+                                                 "against each other")
+    parser.add_argument("first", help="strategy, module or module.Class")
+    parser.add_argument("second", help="strategy, module or module.Class")
+    parser.add_argument("--games", type=int, default=10)
+    parser.add_argument("--maxplies", type=int, default=4)
+    parser.add_argument("--budget", type=float, default=1.0,
+                        help="seconds per move, 0 for no limit")
+    parser.add_argument("--maxnodes", type=int,
+                        help="nodes searched per move")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--start", default="Pristine",
+                        choices=sorted(boardlibrary.boards),
+                        help="boardlibrary board the openings start from")
+    parser.add_argument("--plies", type=int, default=OPENING_PLIES,
+                        help="random moves of the openings")
+    parser.add_argument("--pdn", help="write the games to a PDN file")
+    parser.add_argument("--quiet", action="store_true")
+    args = parser.parse_args()
+    results = tournament(args.first, args.second, args.games, args.maxplies,
+                         args.budget or None, args.maxnodes, args.workers,
+                         args.seed, args.start, args.plies, args.pdn,
+                         verbose=not args.quiet)
+    summarize(results, args.first, args.second)
@@ -3,9 +3,22 @@ Created on Mar 1, 2015
 
 @author: mroch
 '''
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
 import unittest
 
+import ai
 import boardlibrary
+import checkerboard
+import endgame
+import openingbook
+import parallelsearch
+import pdn
+import tournament
 
 
 # Unit tests for verifying functionality of checkerboard class
@@ -166,6 +179,509 @@ class testBoard(unittest.TestCase):
         ]))
         self.assertEqual(actions, redexpected)
 
+    def test_zobrist(self):
+        "Zobrist keys follow moves and identify positions"
+
+        b = boardlibrary.boards["Pristine"]
+        self.assertEqual(b.key, b.zobrist_key())
+
+        # Same position reached by two move orders
+        first = b.move([(5, 0), (4, 1)]).move([(2, 1), (3, 2)])
+        first = first.move([(5, 4), (4, 5)])
+        second = b.move([(5, 4), (4, 5)]).move([(2, 1), (3, 2)])
+        second = second.move([(5, 0), (4, 1)])
+        self.assertEqual(first.key, second.key)
+        self.assertEqual(first, second)
+        self.assertEqual(len({first, second, b}), 2)
+        self.assertNotEqual(first, b)
+
+        # Captures, multiple jumps and crowning
+        for (name, player) in [("SingleHopsRed", 'r'), ("multihop", 'b'),
+                               ("KingBlack", 'b'), ("BlackKingTour", 'b')]:
+            b = boardlibrary.boards[name]
+            self.assertEqual(b.key, b.zobrist_key(), name)
+            for action in b.get_actions(player):
+                newb = b.move(action)
+                self.assertEqual(newb.key, newb.zobrist_key(), name)
+                self.assertNotEqual(newb.key, b.key, name)
+
+    def test_bitboards(self):
+        "Mask shifts agree with the square geometry"
+
+        b = checkerboard.CheckerBoard()
+        for direction in checkerboard.DIRECTIONS:
+            for (s, (r, c)) in enumerate(checkerboard.SQUARES):
+                expected = 0
+                if b.onboard(r + direction[0], c + direction[1]):
+                    expected = 1 << checkerboard.square(r + direction[0],
+                                                        c + direction[1])
+                self.assertEqual(checkerboard.neighbors(1 << s, direction),
+                                 expected)
+
+        # The grid view matches get and survives a round trip
+        b = boardlibrary.boards["multihop"]
+        grid = b.board
+        self.assertEqual(grid[1][2], 'r')
+        self.assertEqual(grid[1][1], ' ')
+        self.assertIsNone(grid[3][0])
+        copy = checkerboard.CheckerBoard()
+        copy.board = grid
+        self.assertEqual(copy, b)
+
+    def test_crowningcaptures(self):
+        "Every capture that crowns a pawn is offered"
+
+        b = checkerboard.CheckerBoard()
+        b.clearboard()
+        b.place(4, 1, 'r')
+        b.place(3, 2, 'b')
+        b.place(1, 2, 'b')
+        b.place(1, 4, 'b')
+        b.recount_pieces()
+        actions = set(self.tupleize_list(b.get_actions('r')))
+        redexpected = set(self.tupleize_list([
+            [(4, 1), (2, 3, (3, 2)), (0, 1, (1, 2))],
+            [(4, 1), (2, 3, (3, 2)), (0, 5, (1, 4))]
+        ]))
+        self.assertEqual(actions, redexpected)
+        newb = b.move([(4, 1), (2, 3, (3, 2)), (0, 5, (1, 4))])
+        self.assertEqual(newb.get(0, 5), 'R')
+        self.assertEqual((newb.get_pawnsN(), newb.get_kingsN()),
+                         ([0, 1], [1, 0]))
+
+    def test_integermoves(self):
+        "Integer moves agree with actions"
+
+        rng = random.Random(25)
+        for name in ["Pristine", "multihop", "KingBlack", "BlackKingTour",
+                     "RedKingTour", "SingleHopsRed"]:
+            b = boardlibrary.boards[name]
+            player = 'b' if "Black" in name or name == "multihop" else 'r'
+            for _ply in range(30):
+                actions = b.get_actions(player)
+                # A short buffer is extended
+                buffer = [0]
+                count = b.generate_moves(player, buffer)
+                moves = buffer[:count]
+                self.assertEqual(len(moves), len(set(moves)), name)
+                self.assertEqual(set(moves), {checkerboard.encode_move(action)
+                                              for action in actions}, name)
+                (pawns, kings) = (list(b.get_pawnsN()), list(b.get_kingsN()))
+                for action in actions:
+                    move = checkerboard.encode_move(action)
+                    self.assertIn(b.decode_move(move), actions, name)
+                    self.assertEqual(
+                        checkerboard.encode_move(b.decode_move(move)), move)
+                    newb = b.make_move(move)
+                    self.assertEqual(newb, b.move(action), name)
+                    self.assertEqual(newb.key, newb.zobrist_key(), name)
+                    recounted = checkerboard.CheckerBoard()
+                    recounted.board = newb.board
+                    recounted.recount_pieces()
+                    self.assertEqual(
+                        (newb.get_pawnsN(), newb.get_kingsN()),
+                        (recounted.get_pawnsN(), recounted.get_kingsN()), name)
+                    self.assertEqual(newb.movecount, b.movecount + 1)
+                # Counts are not changed by the boards made from b
+                self.assertEqual((b.get_pawnsN(), b.get_kingsN()),
+                                 (pawns, kings), name)
+                if not actions or b.is_terminal()[0]:
+                    break
+                b = b.move(rng.choice(actions))
+                player = checkerboard.CheckerBoard.other_player(player)
+
+        b = boardlibrary.boards["Pristine"]
+        with self.assertRaises(ValueError):
+            b.decode_move(checkerboard.encode_move([(5, 0), (3, 2, (4, 1))]))
+
+    def test_pdn(self):
+        "Game records read back and replay"
+        self.assertEqual(pdn.move_text([(5, 0), (4, 1)]), "21-17")
+        capture = [(5, 0), (3, 2, (4, 1)), (1, 4, (2, 3))]
+        self.assertEqual(pdn.move_text(capture), "21x14x7")
+        self.assertEqual(pdn.parse_move("21x14x7"), capture)
+        self.assertRaises(ValueError, pdn.parse_move, "21-14-7")
+
+        for (name, b) in boardlibrary.boards.items():
+            for player in ['r', 'b']:
+                (other, turn) = pdn.parse_fen(pdn.fen(b, player))
+                self.assertEqual(other, b, name)
+                self.assertEqual(turn, player)
+                self.assertEqual(other.pawnsN, b.pawnsN, name)
+                self.assertEqual(other.kingsN, b.kingsN, name)
+
+        rng = random.Random(7)
+        b = boardlibrary.boards["multihop"]
+        moves = []
+        for player in ['r', 'b', 'r', 'b']:
+            action = rng.choice(b.get_actions(player))
+            moves.append(action)
+            b = b.move(action)
+        record = pdn.GameRecord("ai", "lucky", boardlibrary.boards["multihop"],
+                                moves=moves, finished=False)
+        other = pdn.GameRecord.from_text(record.text())
+        self.assertEqual(other.text(), record.text())
+        self.assertEqual(other.moves, moves)
+        self.assertEqual(list(other.boards())[-1], b)
+
+        # Illegal move, red cannot move black's pieces
+        record.moves = [[(2, 1), (3, 0)]]
+        self.assertRaises(ValueError, list, record.boards())
+
+        # Unknown results are not read as draws
+        for winner in ('r', 'b', None):
+            record = pdn.GameRecord("ai", "lucky", moves=moves[:1],
+                                    winner=winner)
+            other = pdn.GameRecord.from_text(record.text())
+            self.assertEqual((other.winner, other.finished), (winner, True))
+        text = record.text().replace(record.result, "2-0")
+        self.assertRaises(ValueError, pdn.GameRecord.from_text, text)
+
+
+class testAlphaBeta(unittest.TestCase):
+
+    def test_transpositiontable(self):
+        "Depth-preferred and always-replace entries"
+
+        table = ai.TranspositionTable(size=1)
+        table.store(1, 5, 10, ai.EXACT, None)
+        table.store(2, 2, 20, ai.LOWER, None)
+        self.assertEqual(table.probe(1)[2], 10)
+        self.assertEqual(table.probe(2)[2], 20)
+        # Shallow results replace the always-replace entry
+        table.store(3, 1, 30, ai.UPPER, None)
+        self.assertIsNone(table.probe(2))
+        self.assertEqual(table.probe(1)[2], 10)
+        # Deep entries of an earlier search give way, but are kept
+        table.new_search()
+        table.store(4, 1, 40, ai.EXACT, None)
+        self.assertEqual(table.probe(4)[2], 40)
+        self.assertEqual(table.probe(1)[2], 10)
+        self.assertIsNone(table.probe(3))
+        self.assertEqual(len(table), 2)
+
+    def test_transpositionvalues(self):
+        "Searches with a transposition table find the same values"
+
+        for (name, b) in boardlibrary.boards.items():
+            for player in checkerboard.CheckerBoard.pawns:
+                strategy = ai.Strategy(player, checkerboard.CheckerBoard, 3)
+                values = []
+                for table in (None, ai.TranspositionTable()):
+                    search = ai.AlphaBetaSearch(
+                        strategy, strategy.maxplayer, strategy.minplayer, 3,
+                        table=table)
+                    action = search.alphabeta(b)
+                    values.append(search.value)
+                    if action is not None:
+                        self.assertIn(action, b.get_actions(player))
+                self.assertEqual(values[0], values[1], name)
+                self.assertGreater(table.stores, 0)
+
+    def test_iterativedeepening(self):
+        "Iterative deepening matches a fixed depth search and keeps time"
+
+        b = boardlibrary.boards["StrategyTest1"]
+        strategy = ai.Strategy('r', checkerboard.CheckerBoard, 4)
+        fixed = ai.AlphaBetaSearch(strategy, 'r', 'b', 4)
+        action = fixed.alphabeta(b)
+
+        search = ai.IterativeDeepeningSearch(strategy, 'r', 'b', 4,
+                                             budget=None)
+        self.assertEqual(search.search(b), action)
+        self.assertEqual((search.depth, search.value), (4, fixed.value))
+        self.assertEqual(search.pv[0], action)
+        self.assertGreater(search.nps(), 0)
+
+        # A budget too small for the deeper searches still gives the move
+        # of the first depth
+        search = ai.IterativeDeepeningSearch(strategy, 'r', 'b', 20,
+                                             budget=0.0)
+        action = search.search(b)
+        self.assertEqual(search.depth, 1)
+        self.assertIn(action, b.get_actions('r'))
+        self.assertLess(search.elapsed, 5.0)
+
+    def test_moveordering(self):
+        "Move ordering changes the nodes searched, not the values"
+
+        self.assertAlmostEqual(ai.effective_branching_factor(14, 3), 2.0,
+                               places=4)
+        strategy = ai.Strategy('b', checkerboard.CheckerBoard, 4)
+        with self.assertRaises(ValueError):
+            ai.AlphaBetaSearch(strategy, 'b', 'r', 4, ordering=("random",))
+
+        for name in ("Pristine", "StrategyTest1", "multihop"):
+            b = boardlibrary.boards[name]
+            values = set()
+            for ordering in [(), ("captures",), ("killers", "history"),
+                             ai.ORDERING]:
+                search = ai.IterativeDeepeningSearch(
+                    strategy, 'b', 'r', 4, budget=None,
+                    table=ai.TranspositionTable(), ordering=ordering)
+                search.search(b)
+                values.add(search.value)
+            self.assertEqual(len(values), 1, name)
+
+        # History scores are kept per player, pawns of black move down
+        history = [dict(), dict()]
+        search = ai.AlphaBetaSearch(strategy, 'b', 'r', 4, history=history,
+                                    ordering=("killers", "history"))
+        search.alphabeta(boardlibrary.boards["Pristine"])
+        for player in ('r', 'b'):
+            scores = history[checkerboard.CheckerBoard.playeridx(player)]
+            self.assertTrue(scores, player)
+            for fromto in scores:
+                down = fromto >> 5 & 0x1f > fromto & 0x1f
+                self.assertEqual(down, player == 'b', (player, fromto))
+
+    def test_utility(self):
+        "Table driven utility matches scoring every piece"
+
+        def utility(board, player):
+            # Pieces, kings and positions weighted 100, 10 and 1.  The
+            # distance to the king row is measured along the column.
+            score = 0
+            for (r, c, piece) in board:
+                (pidx, king) = board.identifypiece(piece)
+                edge = r in (0, 7) or c in (0, 7)
+                value = 100 + 10 * king + (5 if edge else 3) + \
+                    board.disttoking(board.pawns[pidx], c)
+                score += value if board.pawns[pidx] == player else -value
+            return score
+
+        rng = random.Random(550)
+        strategies = [ai.Strategy(player, checkerboard.CheckerBoard, 2)
+                      for player in checkerboard.CheckerBoard.pawns]
+        for b in boardlibrary.boards.values():
+            for turn in range(30):
+                for strategy in strategies:
+                    self.assertEqual(strategy.utility(b),
+                                     utility(b, strategy.maxplayer))
+                actions = b.get_actions(b.pawns[turn % 2])
+                if not actions:
+                    break
+                b = b.move(rng.choice(actions))
+
+    def test_parallel(self):
+        "Parallel searches match a serial search"
+
+        for b in boardlibrary.boards.values():
+            for player in checkerboard.CheckerBoard.pawns:
+                for action in b.get_actions(player):
+                    code = checkerboard.encode_action(action)
+                    self.assertEqual(checkerboard.decode_action(code),
+                                     action)
+
+        table = parallelsearch.SharedTranspositionTable(size=4)
+        other = parallelsearch.SharedTranspositionTable(4, table.name)
+        try:
+            move = checkerboard.encode_move([(5, 0), (4, 1)])
+            table.store(12345, 3, -17, ai.LOWER, move)
+            table.store(54321, 2, math.inf, ai.EXACT, None)
+            self.assertEqual(other.probe(12345)[1:5], (3, -17, ai.LOWER, move))
+            self.assertEqual(other.probe(54321)[2], math.inf)
+            self.assertIsNone(other.probe(99999))
+        finally:
+            other.close()
+            table.close()
+
+        strategy = ai.Strategy('r', checkerboard.CheckerBoard, 3)
+        for mode in parallelsearch.MODES:
+            with parallelsearch.ParallelSearch(strategy, 'r', 'b', 3,
+                                               workers=2, mode=mode) as search:
+                for name in ("Pristine", "StrategyTest1", "multihop"):
+                    b = boardlibrary.boards[name]
+                    serial = ai.AlphaBetaSearch(strategy, 'r', 'b', 3)
+                    action = serial.alphabeta(b)
+                    self.assertEqual(search.search(b), action, name)
+                    self.assertEqual(search.value, serial.value, name)
+
+    def test_endgame(self):
+        "Endgame database values and their use by the searches"
+        def board_of(pieces):
+            b = checkerboard.CheckerBoard()
+            b.clearboard()
+            for (r, c, piece) in pieces:
+                b.place(r, c, piece)
+            b.update_counts()
+            return b
+
+        with tempfile.TemporaryDirectory() as path:
+            self.assertIsNone(endgame.load(path))
+            endgame.build(path, pieces=3, verbose=False)
+            with endgame.EndgameDatabase(path) as database:
+                self.assertEqual(database.pieces, 3)
+                # Every position has the value of its best move
+                for sig in endgame.slices(2):
+                    for (index, groups) in endgame.positions(sig):
+                        b = board_of([checkerboard.SQUARES[s] + (piece,)
+                                      for (mask, piece) in zip(groups, "rRbB")
+                                      for s in checkerboard.squares(mask)])
+                        for player in ['r', 'b']:
+                            other = b.other_player(player)
+                            values = [database.probe(b.move(action), other)
+                                      for action in b.get_actions(player)]
+                            wins = [value for value in values if value % 2]
+                            if not values:
+                                expected = 1
+                            elif wins:
+                                expected = min(wins) + 1
+                            elif 0 in values:
+                                expected = 0
+                            else:
+                                expected = max(values) + 1
+                            self.assertEqual(database.probe(b, player),
+                                             expected, (sig, index, player))
+
+                # Red king takes the last black piece
+                b = board_of([(4, 3, 'R'), (3, 2, 'b')])
+                self.assertEqual(database.result(b, 'r'), (endgame.WIN, 1))
+                self.assertEqual(database.best_action(b, 'r'),
+                                 [(4, 3), (2, 1, (3, 2))])
+                self.assertIsNone(database.result(
+                    boardlibrary.boards["Pristine"], 'r'))
+                # Probing does not rely on the ranks listed by the build
+                probe = subprocess.run(
+                    [sys.executable, "-c",
+                     "import checkerboard, endgame\n"
+                     "b = checkerboard.CheckerBoard()\n"
+                     "b.clearboard()\n"
+                     "b.place(4, 3, 'R')\n"
+                     "b.place(3, 2, 'b')\n"
+                     "b.update_counts()\n"
+                     "with endgame.EndgameDatabase(%r) as database:\n"
+                     "    print(database.result(b, 'r'))\n" % path],
+                    cwd=os.path.dirname(os.path.abspath(__file__)),
+                    capture_output=True, text=True, check=True)
+                self.assertEqual(probe.stdout.strip(),
+                                 str((endgame.WIN, 1)))
+
+                # Positions of the database are valued exactly by the search
+                b = board_of([(5, 2, 'r'), (4, 1, 'b'), (0, 7, 'B')])
+                search = ai.AlphaBetaSearch(ai.Strategy('r', b, 1, endgame=None),
+                                            'r', 'b', 1, endgame=database)
+                action = search.alphabeta(b)
+                self.assertEqual(search.value,
+                                 -database.score(b.move(action), 'b', 1))
+                # Ending the game beats moving to a win of the database
+                b = board_of([(7, 0, 'R'), (5, 4, 'R'), (6, 1, 'b'),
+                              (4, 3, 'b')])
+                search = ai.AlphaBetaSearch(ai.Strategy('r', b, 1, endgame=None),
+                                            'r', 'b', 3, endgame=database)
+                self.assertEqual(search.alphabeta(b),
+                                 [(7, 0), (5, 2, (6, 1)), (3, 4, (4, 3))])
+                self.assertEqual(search.value, endgame.WIN_SCORE - 1)
+                # Wins stored by the search of a later position are as far
+                # from the earlier one as without the table
+                b = board_of([(2, 3, 'R'), (6, 3, 'R'), (4, 3, 'b'),
+                              (2, 7, 'B')])
+                later = b.move([(2, 3), (3, 4)]).move([(2, 7), (3, 6)])
+                shared = ai.TranspositionTable()
+                values = []
+                for (board, table) in ((b, None), (later, shared), (b, shared)):
+                    search = ai.AlphaBetaSearch(
+                        ai.Strategy('r', board, 1, endgame=None), 'r', 'b', 4,
+                        table=table, endgame=database)
+                    search.alphabeta(board)
+                    values.append(search.value)
+                self.assertGreater(values[0], ai.WON)
+                self.assertEqual(values[1], values[0] + 2)
+                self.assertEqual(values[2], values[0])
+                strategy = ai.Strategy('r', checkerboard.CheckerBoard, 6,
+                                       budget=None, endgame=path)
+                b = board_of([(6, 1, 'r'), (1, 6, 'b')])
+                (after, action) = strategy.play(b)
+                self.assertEqual(action, database.best_action(b, 'r'))
+                self.assertEqual(strategy.search.depth, 0)
+                strategy.endgame.close()
+
+    def test_openingbook(self):
+        "Opening book statistics, lookups and use by ai.Strategy"
+        first = [(5, 2), (4, 3)]
+        second = [(5, 0), (4, 1)]
+        reply = [(2, 1), (3, 2)]
+        builder = openingbook.BookBuilder(depth=2)
+        # first wins twice and draws, second loses
+        for (action, winner) in ((first, 'r'), (first, 'r'), (first, None),
+                                 (second, 'b')):
+            builder.add_record(pdn.GameRecord(
+                "ai", "ai", moves=[action, reply, [(5, 6), (4, 5)]],
+                winner=winner))
+        builder.add_record(pdn.GameRecord("ai", "ai", moves=[second],
+                                          finished=False))
+        self.assertEqual(len(builder.positions), 3)
+        self.assertEqual(len(builder), 4)
+
+        with tempfile.TemporaryDirectory() as path:
+            filename = path + "/test.book"
+            builder.write(filename)
+            with openingbook.OpeningBook(filename) as book:
+                self.assertEqual(book.depth, 2)
+                b = checkerboard.CheckerBoard()
+                self.assertEqual(sorted(book.moves(b, 'r')),
+                                 [(second, 1, 0.0), (first, 3, 2.5)])
+                self.assertEqual(book.moves(b, 'b'), [])
+                after = b.move(first)
+                self.assertEqual(book.moves(after, 'b'), [(reply, 3, 0.5)])
+                self.assertIsNone(book.choose(after.move(reply), 'r'))
+
+                rng = random.Random(3)
+                choices = [book.choose(b, 'r', rng) for _ in range(200)]
+                # weights 3 * 3.5 / 5 and 1 * 1 / 3
+                self.assertGreater(choices.count(first), 150)
+                self.assertIn(second, choices)
+                self.assertEqual(book.choose(b, 'r', rng, mingames=2), first)
+
+                strategy = ai.Strategy('r', checkerboard.CheckerBoard, 2,
+                                       budget=None, endgame=None, book=book)
+                self.assertIn(strategy.play(b)[1], (first, second))
+                self.assertIsNone(strategy.search)
+                # Past the book
+                strategy.play(after.move(reply))
+                self.assertIsNotNone(strategy.search)
+
+            with open(filename, "wb") as handle:
+                handle.write(b"not a book")
+            self.assertRaises(ValueError, openingbook.OpeningBook, filename)
+        self.assertIsNone(openingbook.load(path + "/test.book"))
+
+    def test_tournament(self):
+        "Headless games between strategies and their Elo"
+        self.assertEqual(tournament.elo_difference(0.5), 0.0)
+        self.assertAlmostEqual(tournament.elo_difference(0.75), 190.85, 2)
+        self.assertEqual(tournament.elo_difference(1.0), math.inf)
+        (fraction, low, high) = tournament.win_rate(60, 30, 10)
+        self.assertAlmostEqual(fraction, 0.65)
+        self.assertLess(low, fraction)
+        self.assertGreater(high, fraction)
+        self.assertAlmostEqual(high - fraction, fraction - low)
+        self.assertEqual(tournament.elo(5, 5, 0)[0], 0.0)
+
+        results = tournament.tournament("ai", "lucky", games=4, maxplies=2,
+                                        budget=None, maxnodes=200,
+                                        workers=1, verbose=False)
+        self.assertEqual([result["game"] for result in results],
+                         list(range(4)))
+        self.assertEqual(sum(tournament.score(results)), 4)
+        for result in results:
+            record = result["record"]
+            self.assertEqual(record.red, "ai" if result["game"] % 2 == 0
+                             else "lucky")
+            self.assertEqual(record.winner, result["winner"])
+            # Both games of a pair start with the same opening
+            opening = results[result["game"] - result["game"] % 2]
+            self.assertEqual(record.moves[:tournament.OPENING_PLIES],
+                             opening["record"].moves[:tournament.OPENING_PLIES])
+            record = pdn.GameRecord.from_text(record.text())
+            self.assertEqual(len(list(record.boards())), result["plies"] + 1)
+
+        again = tournament.play_game(0, "ai", "lucky", results[0]["record"]
+                                     .moves[:tournament.OPENING_PLIES],
+                                     maxplies=2, maxnodes=200,
+                                     seed=results[0]["record"].tags["Seed"])
+        self.assertEqual(again["record"].moves, results[0]["record"].moves)
+
 
 # Run test cases if invoked as main module
 if __name__ == "__main__":